@@ -179,17 +179,22 @@ class ScanHistorySerializer(serializers.ModelSerializer):
 		fields = '__all__'
 		depth = 1
 
+	# counts are annotated by annotate_scan_history_counts when available
+
 	def get_subdomain_count(self, scan_history):
-		if scan_history.get_subdomain_count:
-			return scan_history.get_subdomain_count()
+		if hasattr(scan_history, 'subdomain_count'):
+			return scan_history.subdomain_count
+		return scan_history.get_subdomain_count()
 
 	def get_endpoint_count(self, scan_history):
-		if scan_history.get_endpoint_count:
-			return scan_history.get_endpoint_count()
+		if hasattr(scan_history, 'endpoint_count'):
+			return scan_history.endpoint_count
+		return scan_history.get_endpoint_count()
 
 	def get_vulnerability_count(self, scan_history):
-		if scan_history.get_vulnerability_count:
-			return scan_history.get_vulnerability_count()
+		if hasattr(scan_history, 'vulnerability_count'):
+			return scan_history.vulnerability_count
+		return scan_history.get_vulnerability_count()
 
 	def get_progress(self, scan_history):
 		return scan_history.get_progress()
@@ -204,7 +209,8 @@ class ScanHistorySerializer(serializers.ModelSerializer):
 		return scan_history.get_completed_ago()
 
 	def get_organizations(self, scan_history):
-		return [org.name for org in scan_history.domain.get_organization()]
+		# same as domain.get_organization() but can be prefetched
+		return [org.name for org in scan_history.domain.domains.all()]
 
 
 class OrganizationSerializer(serializers.ModelSerializer):
@@ -337,7 +343,7 @@ class VisualiseSubdomainSerializer(serializers.ModelSerializer):
 		return subdomain.name
 
 	def get_title(self, subdomain):
-		if get_interesting_subdomains(subdomain.scan_history.id).filter(name=subdomain.name).exists():
+		if subdomain.is_interesting:
 			return "Interesting"
 
 	def get_children(self, subdomain_name):
@@ -611,8 +617,6 @@ class SubdomainChangesSerializer(serializers.ModelSerializer):
 
 	change = serializers.SerializerMethodField('get_change')
 
-	is_interesting = serializers.SerializerMethodField('get_is_interesting')
-
 	class Meta:
 		model = Subdomain
 		fields = '__all__'
@@ -620,11 +624,6 @@ class SubdomainChangesSerializer(serializers.ModelSerializer):
 	def get_change(self, Subdomain):
 		return Subdomain.change
 
-	def get_is_interesting(self, Subdomain):
-		return get_interesting_subdomains(
-			Subdomain.scan_history.id).filter(
-			name=Subdomain.name).exists()
-
 
 class EndPointChangesSerializer(serializers.ModelSerializer):
 
@@ -759,8 +758,6 @@ class SubdomainSerializer(serializers.ModelSerializer):
 
 	vuln_count = serializers.SerializerMethodField('get_vuln_count')
 
-	is_interesting = serializers.SerializerMethodField('get_is_interesting')
-
 	endpoint_count = serializers.SerializerMethodField('get_endpoint_count')
 	info_count = serializers.SerializerMethodField('get_info_count')
 	low_count = serializers.SerializerMethodField('get_low_count')
@@ -780,36 +777,51 @@ class SubdomainSerializer(serializers.ModelSerializer):
 		model = Subdomain
 		fields = '__all__'
 
-	def get_is_interesting(self, subdomain):
-		return get_interesting_subdomains(
-			subdomain.scan_history.id).filter(
-			name=subdomain.name).exists()
+	# counts are annotated by annotate_subdomain_counts when available
 
 	def get_endpoint_count(self, subdomain):
+		if hasattr(subdomain, 'endpoint_count'):
+			return subdomain.endpoint_count
 		return subdomain.get_endpoint_count
 
 	def get_info_count(self, subdomain):
+		if hasattr(subdomain, 'info_count'):
+			return subdomain.info_count
 		return subdomain.get_info_count
 
 	def get_low_count(self, subdomain):
+		if hasattr(subdomain, 'low_count'):
+			return subdomain.low_count
 		return subdomain.get_low_count
 
 	def get_medium_count(self, subdomain):
+		if hasattr(subdomain, 'medium_count'):
+			return subdomain.medium_count
 		return subdomain.get_medium_count
 
 	def get_high_count(self, subdomain):
+		if hasattr(subdomain, 'high_count'):
+			return subdomain.high_count
 		return subdomain.get_high_count
 
 	def get_critical_count(self, subdomain):
+		if hasattr(subdomain, 'critical_count'):
+			return subdomain.critical_count
 		return subdomain.get_critical_count
 
 	def get_directories_count(self, subdomain):
+		if hasattr(subdomain, 'directories_count'):
+			return subdomain.directories_count
 		return subdomain.get_directories_count
 
 	def get_subscan_count(self, subdomain):
+		if hasattr(subdomain, 'subscan_count'):
+			return subdomain.subscan_count
 		return subdomain.get_subscan_count
 
 	def get_todos_count(self, subdomain):
+		if hasattr(subdomain, 'todos_count'):
+			return subdomain.todos_count
 		return len(subdomain.get_todos)
 
 	def get_vuln_count(self, obj):
@@ -35,7 +35,7 @@ from targetApp.models import *
 from recon_note.models import *
 
 from reNgine.utilities import is_safe_path
-from reNgine.tasks import run_system_commands, initiate_subtask, create_scan_activity
+from reNgine.tasks import run_system_commands, initiate_subtask, create_scan_activity, get_scan_task_ids
 from packaging import version
 from reNgine.celery import app
 from django.utils import timezone
@@ -576,8 +576,9 @@ class StopScan(APIView):
 		if scan_id:
 			try:
 				scan_history = get_object_or_404(ScanHistory, id=scan_id)
+				# stages of a scan run as separate celery tasks
 				app.control.revoke(
-					scan_history.celery_id,
+					get_scan_task_ids(scan_history.celery_id),
 					terminate=True,
 					signal='SIGKILL'
 				)
@@ -585,12 +586,10 @@ class StopScan(APIView):
 				scan_history.stop_scan_date = timezone.now()
 				scan_history.save()
 
-				if ScanActivity.objects.filter(scan_of=scan_history).exists():
-					last_activity = ScanActivity.objects.filter(
-					scan_of=scan_history).order_by('-pk')[0]
-					last_activity.status = 0
-					last_activity.time = timezone.now()
-					last_activity.save()
+				ScanActivity.objects.filter(
+					scan_of=scan_history,
+					status=1
+				).update(status=0, time=timezone.now())
 				create_scan_activity(scan_history, "Scan aborted", 0)
 				response['status'] = True
 			except Exception as e:
@@ -1089,7 +1088,9 @@ class ListScanHistory(APIView):
 	def get(self, request, format=None):
 		req = self.request
 		scan_history = ScanHistory.objects.all().order_by('-start_scan_date')
-		scan_history = ScanHistorySerializer(scan_history, many=True)
+		scan_history = ScanHistorySerializer(
+			annotate_scan_history_counts(scan_history),
+			many=True)
 		return Response(scan_history.data)
 
 
@@ -1289,7 +1290,9 @@ class ListSubdomains(APIView):
 		if 'no_lookup_interesting' in req.query_params:
 			serializer = OnlySubdomainNameSerializer(subdomain_query, many=True)
 		else:
-			serializer = SubdomainSerializer(subdomain_query, many=True)
+			serializer = SubdomainSerializer(
+				annotate_subdomain_counts(subdomain_query),
+				many=True)
 		return Response({"subdomains": serializer.data})
 
 	def post(self, req):
@@ -1690,7 +1693,8 @@ class SubdomainDatatableViewSet(viewsets.ModelViewSet):
 					qs = self.special_lookup(search_value)
 			else:
 				qs = self.general_lookup(search_value)
-		return qs.order_by(order_col)
+		# annotated last, combined querysets must not carry annotations
+		return annotate_subdomain_counts(qs.order_by(order_col))
 
 	def general_lookup(self, search_value):
 		qs = self.queryset.filter(
@@ -0,0 +1,77 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:13
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def create_scan_stats(apps, schema_editor):
+    '''
+    Backfills the counters of existing scans with one grouped query per model
+    '''
+    ScanHistory = apps.get_model('startScan', 'ScanHistory')
+    Subdomain = apps.get_model('startScan', 'Subdomain')
+    EndPoint = apps.get_model('startScan', 'EndPoint')
+    Vulnerability = apps.get_model('startScan', 'Vulnerability')
+    ScanStats = apps.get_model('dashboard', 'ScanStats')
+
+    stats = {
+        scan_id: {'scan_history_id': scan_id}
+        for scan_id in ScanHistory.objects.values_list('id', flat=True)
+    }
+    grouped_counts = [
+        Subdomain.objects.values('scan_history').annotate(
+            subdomain_count=Count('id'),
+            alive_count=Count('id', filter=~Q(http_status=0))),
+        Subdomain.objects.filter(ip_addresses__isnull=False).values(
+            'scan_history').annotate(subdomain_with_ip_count=Count('id')),
+        EndPoint.objects.values('scan_history').annotate(
+            endpoint_count=Count('id'),
+            endpoint_alive_count=Count('id', filter=Q(http_status=200))),
+        Vulnerability.objects.values('scan_history').annotate(
+            info_count=Count('id', filter=Q(severity=0)),
+            low_count=Count('id', filter=Q(severity=1)),
+            medium_count=Count('id', filter=Q(severity=2)),
+            high_count=Count('id', filter=Q(severity=3)),
+            critical_count=Count('id', filter=Q(severity=4)),
+            unknown_count=Count('id', filter=Q(severity=-1))),
+    ]
+    for counts in grouped_counts:
+        for row in counts:
+            scan_id = row.pop('scan_history')
+            if scan_id in stats:
+                stats[scan_id].update(row)
+    ScanStats.objects.bulk_create(
+        [ScanStats(**scan_stats) for scan_stats in stats.values()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0032_lookup_indexes'),
+        ('dashboard', '0002_rename_name_searchhistory_query'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subdomain_count', models.IntegerField(default=0)),
+                ('subdomain_with_ip_count', models.IntegerField(default=0)),
+                ('alive_count', models.IntegerField(default=0)),
+                ('endpoint_count', models.IntegerField(default=0)),
+                ('endpoint_alive_count', models.IntegerField(default=0)),
+                ('info_count', models.IntegerField(default=0)),
+                ('low_count', models.IntegerField(default=0)),
+                ('medium_count', models.IntegerField(default=0)),
+                ('high_count', models.IntegerField(default=0)),
+                ('critical_count', models.IntegerField(default=0)),
+                ('unknown_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('scan_history', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='startScan.scanhistory')),
+            ],
+        ),
+        migrations.RunPython(create_scan_stats, migrations.RunPython.noop),
+    ]
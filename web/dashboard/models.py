@@ -6,3 +6,29 @@ class SearchHistory(models.Model):
 
     def __str__(self):
         return self.query
+
+
+class ScanStats(models.Model):
+    '''
+    Counters of a scan, refreshed whenever a stage of the scan finishes so
+    that the dashboard only has to sum one row per scan
+    '''
+    scan_history = models.OneToOneField(
+        'startScan.ScanHistory',
+        on_delete=models.CASCADE,
+        related_name='stats')
+    subdomain_count = models.IntegerField(default=0)
+    subdomain_with_ip_count = models.IntegerField(default=0)
+    alive_count = models.IntegerField(default=0)
+    endpoint_count = models.IntegerField(default=0)
+    endpoint_alive_count = models.IntegerField(default=0)
+    info_count = models.IntegerField(default=0)
+    low_count = models.IntegerField(default=0)
+    medium_count = models.IntegerField(default=0)
+    high_count = models.IntegerField(default=0)
+    critical_count = models.IntegerField(default=0)
+    unknown_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.scan_history_id)
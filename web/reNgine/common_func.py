@@ -1,13 +1,21 @@
 import os
+import asyncio
 import re
+import csv
 import json
+import time
+import hashlib
 import random
 import requests
+import redis
 import tldextract
+import validators
 import logging
 import shutil
 import subprocess
 import asyncwhois
+import ipaddress
+import pygeoip
 
 from threading import Thread
 from urllib.parse import urlparse
@@ -15,126 +23,225 @@ from bs4 import BeautifulSoup
 from lxml import html
 from datetime import datetime, date
 from discord_webhook import DiscordWebhook
-from functools import reduce
+from functools import reduce, lru_cache
 from rest_framework import serializers
 
-from django.db.models import Q
+from django.db.models import Q, Count, Max, Sum, OuterRef, Subquery, IntegerField
+from django.conf import settings
+from django.core.cache import cache
+from django.forms.models import model_to_dict
+from django.utils import timezone
 from scanEngine.models import *
 from startScan.models import *
 from targetApp.models import *
+from dashboard.models import ScanStats
+from recon_note.models import TodoNote
 from reNgine.definitions import *
 from reNgine.common_serializers import *
 
-def get_lookup_keywords():
-    default_lookup_keywords = [
-        key.strip() for key in InterestingLookupModel.objects.get(
-            id=1).keywords.split(',')]
-    custom_lookup_keywords = []
-    if InterestingLookupModel.objects.filter(custom_type=True):
-        custom_lookup_keywords = [
-            key.strip() for key in InterestingLookupModel.objects.filter(
-                custom_type=True).order_by('-id')[0].keywords.split(',')]
-    lookup_keywords = default_lookup_keywords + custom_lookup_keywords
-    # remove empty strings from list, if any
-    lookup_keywords = list(filter(None, lookup_keywords))
-
-    return lookup_keywords
+def get_interesting_lookup(refresh=False):
+    '''
+    Returns the interesting lookup settings, keywords are the default lookup
+    keywords followed by the custom ones. Cached until InterestingLookupModel
+    is saved again, refresh reads them from the database regardless.
+    '''
+    lookup = None if refresh else cache.get(INTERESTING_LOOKUP_CACHE_KEY)
+    if lookup is not None:
+        return lookup
+
+    default_lookup = InterestingLookupModel.objects.filter(id=1).first()
+    custom_lookup = InterestingLookupModel.objects.filter(
+        custom_type=True).order_by('-id').first()
+
+    lookup_keywords = []
+    for lookup_model in (default_lookup, custom_lookup):
+        if lookup_model and lookup_model.keywords:
+            lookup_keywords += [
+                key.strip() for key in lookup_model.keywords.split(',')]
+
+    lookup = {
+        # remove empty strings from list, if any
+        'keywords': tuple(filter(None, lookup_keywords)),
+        'url_lookup': custom_lookup.url_lookup if custom_lookup else True,
+        'title_lookup': custom_lookup.title_lookup if custom_lookup else True,
+        'condition_200_http_lookup':
+            custom_lookup.condition_200_http_lookup if custom_lookup else False,
+    }
+    cache.set(
+        INTERESTING_LOOKUP_CACHE_KEY,
+        lookup,
+        INTERESTING_LOOKUP_CACHE_TIMEOUT)
+    return lookup
 
 
-def get_interesting_subdomains(scan_history=None, target=None):
-    lookup_keywords = get_lookup_keywords()
+def get_lookup_keywords():
+    return list(get_interesting_lookup()['keywords'])
+
+
+@lru_cache(maxsize=8)
+def compile_interesting_matcher(
+        keywords,
+        url_lookup,
+        title_lookup,
+        condition_200_http_lookup):
+    '''
+    Compiles the lookup keywords into two regexes, so that matching a url
+    and a title is a single scan each whatever the number of keywords.
+    Urls match keywords anywhere like icontains, titles on word boundaries.
+    '''
+    url_regex = title_regex = None
+    alternation = '|'.join(re.escape(key) for key in keywords)
+    if alternation and url_lookup:
+        url_regex = re.compile(alternation, re.IGNORECASE)
+    if alternation and title_lookup:
+        title_regex = re.compile(
+            r'\b(?:{})\b'.format(alternation), re.IGNORECASE)
+
+    def is_interesting(url, page_title=None, http_status=None):
+        if condition_200_http_lookup and http_status != 200:
+            return False
+        if url_regex and url and url_regex.search(url):
+            return True
+        if title_regex and page_title and title_regex.search(page_title):
+            return True
+        return False
+
+    return is_interesting
+
+
+def get_interesting_matcher():
+    '''
+    Returns is_interesting(url, page_title, http_status) for the current
+    lookup settings, used to flag subdomains and endpoints when saving them
+    '''
+    return compile_interesting_matcher(**get_interesting_lookup())
+
+
+def get_interesting_lookup_query(url_field, refresh=False):
+    '''
+    Same lookup as get_interesting_matcher() expressed as a Q object, used to
+    flag rows already in the database in a single UPDATE
+    '''
+    lookup = get_interesting_lookup(refresh)
 
-    subdomain_lookup_query = Q()
+    url_lookup_query = Q()
     page_title_lookup_query = Q()
-
-    for key in lookup_keywords:
-        if InterestingLookupModel.objects.filter(custom_type=True).exists():
-            if InterestingLookupModel.objects.filter(
-                    custom_type=True).order_by('-id')[0].url_lookup:
-                subdomain_lookup_query |= Q(name__icontains=key)
-            if InterestingLookupModel.objects.filter(
-                    custom_type=True).order_by('-id')[0].title_lookup:
-                page_title_lookup_query |= Q(
-                    page_title__iregex="\\y{}\\y".format(key))
-        else:
-            subdomain_lookup_query |= Q(name__icontains=key)
+    for key in lookup['keywords']:
+        if lookup['url_lookup']:
+            url_lookup_query |= Q(**{url_field + '__icontains': key})
+        if lookup['title_lookup']:
             page_title_lookup_query |= Q(
-                page_title__iregex="\\y{}\\y".format(key))
+                page_title__iregex="\\y{}\\y".format(re.escape(key)))
+
+    query = url_lookup_query | page_title_lookup_query
+    if not query:
+        return None
+    if lookup['condition_200_http_lookup']:
+        query &= Q(http_status__exact=200)
+    return query
+
+
+def update_interesting_flags():
+    '''
+    Recomputes Subdomain and EndPoint is_interesting after the lookup
+    settings have changed, the settings are read from the database as the
+    cache may not have been invalidated yet for this worker
+    '''
+    for model, url_field in ((Subdomain, 'name'), (EndPoint, 'http_url')):
+        query = get_interesting_lookup_query(url_field, refresh=True)
+        if query is None:
+            model.objects.filter(is_interesting=True).update(
+                is_interesting=False)
+            continue
+        model.objects.filter(is_interesting=True).exclude(query).update(
+            is_interesting=False)
+        model.objects.filter(query, is_interesting=False).update(
+            is_interesting=True)
 
-    if InterestingLookupModel.objects.filter(
-            custom_type=True) and InterestingLookupModel.objects.filter(
-            custom_type=True).order_by('-id')[0].condition_200_http_lookup:
-        subdomain_lookup_query &= Q(http_status__exact=200)
-        page_title_lookup_query &= Q(http_status__exact=200)
-
-    subdomain_lookup = Subdomain.objects.none()
-    title_lookup = Subdomain.objects.none()
 
+def get_interesting_subdomains(scan_history=None, target=None):
+    subdomains = Subdomain.objects.filter(is_interesting=True)
     if target:
-        subdomains = Subdomain.objects.filter(target_domain__id=target)
-        if subdomain_lookup_query:
-            subdomain_lookup = subdomains.filter(subdomain_lookup_query)
-        if page_title_lookup_query:
-            title_lookup = subdomains.filter(page_title_lookup_query)
+        return subdomains.filter(target_domain__id=target)
     elif scan_history:
-        subdomains = Subdomain.objects.filter(scan_history__id=scan_history)
-        if subdomain_lookup_query:
-            subdomain_lookup = subdomains.filter(subdomain_lookup_query)
-        if page_title_lookup_query:
-            title_lookup = subdomains.filter(page_title_lookup_query)
-    else:
-        if subdomain_lookup_query:
-            subdomain_lookup = Subdomain.objects.filter(subdomain_lookup_query)
-        if page_title_lookup_query:
-            title_lookup = Subdomain.objects.filter(page_title_lookup_query)
-    lookup = subdomain_lookup | title_lookup
-    return lookup
+        return subdomains.filter(scan_history__id=scan_history)
+    return subdomains
+
+
+class SubqueryCount(Subquery):
+    '''
+    Number of rows returned by a correlated subquery
+    '''
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = IntegerField()
+
+
+def annotate_subdomain_counts(subdomains):
+    '''
+    Annotates the counters read by SubdomainSerializer and prefetches its
+    nested relations, so that a page of subdomains is serialized with a
+    fixed number of queries instead of a dozen queries per row
+    '''
+    vulnerabilities = Vulnerability.objects.filter(
+        subdomain=OuterRef('pk')).values('id')
+
+    return subdomains.annotate(
+        endpoint_count=SubqueryCount(
+            EndPoint.objects.filter(subdomain=OuterRef('pk')).values('id')),
+        info_count=SubqueryCount(vulnerabilities.filter(severity=0)),
+        low_count=SubqueryCount(vulnerabilities.filter(severity=1)),
+        medium_count=SubqueryCount(vulnerabilities.filter(severity=2)),
+        high_count=SubqueryCount(vulnerabilities.filter(severity=3)),
+        critical_count=SubqueryCount(vulnerabilities.filter(severity=4)),
+        directories_count=SubqueryCount(
+            DirectoryFile.objects.filter(
+                directory_files__directories=OuterRef('pk')).values('id').distinct()),
+        subscan_count=SubqueryCount(
+            SubScan.objects.filter(subdomain=OuterRef('pk')).values('id')),
+        todos_count=SubqueryCount(
+            TodoNote.objects.filter(
+                scan_history=OuterRef('scan_history'),
+                subdomain=OuterRef('pk')).values('id')),
+    ).prefetch_related(
+        'ip_addresses__ports',
+        'ip_addresses__ip_subscan_ids',
+        'waf',
+        'technologies',
+        'directories__directory_files',
+        'directories__dir_subscan_ids')
+
+
+def annotate_scan_history_counts(scan_histories):
+    '''
+    Annotates the counters read by ScanHistorySerializer and prefetches the
+    relations it serializes
+    '''
+    return scan_histories.annotate(
+        subdomain_count=SubqueryCount(
+            Subdomain.objects.filter(scan_history=OuterRef('pk')).values('id')),
+        endpoint_count=SubqueryCount(
+            EndPoint.objects.filter(scan_history=OuterRef('pk')).values('id')),
+        vulnerability_count=SubqueryCount(
+            Vulnerability.objects.filter(scan_history=OuterRef('pk')).values('id')),
+    ).select_related(
+        'domain',
+        'scan_type'
+    ).prefetch_related(
+        'scanactivity_set',
+        'domain__domains',
+        'emails',
+        'employees',
+        'dorks')
 
 
 def get_interesting_endpoint(scan_history=None, target=None):
-    lookup_keywords = get_lookup_keywords()
-
-    url_lookup_query = Q()
-    page_title_lookup_query = Q()
-
-    for key in lookup_keywords:
-        if InterestingLookupModel.objects.filter(custom_type=True).exists():
-            if InterestingLookupModel.objects.filter(custom_type=True).order_by('-id')[0].url_lookup:
-                url_lookup_query |= Q(http_url__icontains=key)
-            if InterestingLookupModel.objects.filter(custom_type=True).order_by('-id')[0].title_lookup:
-                page_title_lookup_query |= Q(page_title__iregex="\\y{}\\y".format(key))
-
-        else:
-            url_lookup_query |= Q(http_url__icontains=key)
-            page_title_lookup_query |= Q(page_title__iregex="\\y{}\\y".format(key))
-
-    if InterestingLookupModel.objects.filter(custom_type=True) and InterestingLookupModel.objects.filter(custom_type=True).order_by('-id')[0].condition_200_http_lookup:
-        url_lookup_query &= Q(http_status__exact=200)
-        page_title_lookup_query &= Q(http_status__exact=200)
-
-    url_lookup = EndPoint.objects.none()
-    title_lookup = EndPoint.objects.none()
-
+    endpoints = EndPoint.objects.filter(is_interesting=True)
     if target:
-        urls = EndPoint.objects.filter(target_domain__id=target).distinct('http_url')
-        if url_lookup_query:
-            url_lookup = urls.filter(url_lookup_query)
-        if page_title_lookup_query:
-            title_lookup = urls.filter(page_title_lookup_query)
+        return endpoints.filter(
+            target_domain__id=target).distinct('http_url')
     elif scan_history:
-        urls = EndPoint.objects.filter(scan_history__id=scan_history)
-        if url_lookup_query:
-            url_lookup = urls.filter(url_lookup_query)
-        if page_title_lookup_query:
-            title_lookup = urls.filter(page_title_lookup_query)
-
-    else:
-        if url_lookup_query:
-            url_lookup = EndPoint.objects.filter(url_lookup_query)
-        if page_title_lookup_query:
-            title_lookup = EndPoint.objects.filter(page_title_lookup_query)
-
-    return url_lookup | title_lookup
+        return endpoints.filter(scan_history__id=scan_history)
+    return endpoints
 
 def check_keyword_exists(keyword_list, subdomain):
     return any(sub in subdomain for sub in keyword_list)
@@ -150,53 +257,139 @@ def get_domain_from_subdomain(subdomain):
     ext = tldextract.extract(subdomain)
     return '.'.join(ext[1:3])
 
+def get_cached_setting(model):
+    '''
+    Returns the settings row of a singleton settings model, None if it has
+    not been saved yet. Cached until the model is saved again.
+    '''
+    key = SETTINGS_CACHE_KEY.format(model._meta.db_table)
+    # the row is wrapped so that a missing row is cached too
+    setting = cache.get(key)
+    if setting is None:
+        setting = (model.objects.order_by('id').first(),)
+        cache.set(key, setting, SETTINGS_CACHE_TIMEOUT)
+    return setting[0]
+
+def get_notification_settings():
+    '''
+    Returns the Notification settings or None
+    '''
+    return get_cached_setting(Notification)
+
+def get_proxy_settings():
+    '''
+    Returns the Proxy settings or None
+    '''
+    return get_cached_setting(Proxy)
+
+def get_hackerone_settings():
+    '''
+    Returns the Hackerone settings or None
+    '''
+    return get_cached_setting(Hackerone)
+
+@lru_cache(maxsize=None)
+def get_redis_connection():
+    '''
+    Redis connection of the celery broker, shared by the notification
+    queue to coalesce messages and rate limit the channels across workers
+    '''
+    return redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+@lru_cache(maxsize=None)
+def get_notification_session():
+    '''
+    HTTP session reused by a worker for all the notifications it sends
+    '''
+    return requests.Session()
+
+def queue_notification(channel, message):
+    from reNgine.tasks import send_notification_message
+    send_notification_message.delay(channel, message)
+
 def send_telegram_message(message):
-    notification = Notification.objects.all()
-    if notification and notification[0].send_to_telegram \
-    and notification[0].telegram_bot_token \
-    and notification[0].telegram_bot_chat_id:
-        telegram_bot_token = notification[0].telegram_bot_token
-        telegram_bot_chat_id = notification[0].telegram_bot_chat_id
-        send_text = 'https://api.telegram.org/bot' + telegram_bot_token \
-            + '/sendMessage?chat_id=' + telegram_bot_chat_id \
-            + '&parse_mode=Markdown&text=' + message
-        thread = Thread(target=requests.get, args = (send_text, ))
-        thread.start()
+    notification = get_notification_settings()
+    if notification and notification.send_to_telegram \
+    and notification.telegram_bot_token \
+    and notification.telegram_bot_chat_id:
+        queue_notification('telegram', message)
 
 def send_slack_message(message):
-    headers = {'content-type': 'application/json'}
-    message = {'text': message}
-    notification = Notification.objects.all()
-    if notification and notification[0].send_to_slack \
-    and notification[0].slack_hook_url:
-        hook_url = notification[0].slack_hook_url
-        thread = Thread(
-            target=requests.post,
-            kwargs = {
-                'url': hook_url,
-                'data': json.dumps(message),
-                'headers': headers,
-            })
-        thread.start()
+    notification = get_notification_settings()
+    if notification and notification.send_to_slack \
+    and notification.slack_hook_url:
+        queue_notification('slack', message)
 
 def send_discord_message(message):
-    notification = Notification.objects.all()
-    if notification and notification[0].send_to_discord \
-    and notification[0].discord_hook_url:
-        webhook = DiscordWebhook(
-            url=notification[0].discord_hook_url,
-            content=message,
-            rate_limit_retry=True
-            )
-        thread = Thread(target=webhook.execute)
-        thread.start()
+    notification = get_notification_settings()
+    if notification and notification.send_to_discord \
+    and notification.discord_hook_url:
+        queue_notification('discord', message)
+
+def post_notification(channel, message):
+    '''
+    Sends message to channel and returns the response
+    '''
+    notification = get_notification_settings()
+    if not notification:
+        return None
+    session = get_notification_session()
+    if channel == 'telegram':
+        return session.get(
+            'https://api.telegram.org/bot{}/sendMessage'.format(notification.telegram_bot_token),
+            params={
+                'chat_id': notification.telegram_bot_chat_id,
+                'parse_mode': 'Markdown',
+                'text': message,
+            },
+            timeout=NOTIFICATION_TIMEOUT)
+    elif channel == 'slack':
+        return session.post(
+            notification.slack_hook_url,
+            json={'text': message},
+            timeout=NOTIFICATION_TIMEOUT)
+    elif channel == 'discord':
+        return session.post(
+            notification.discord_hook_url,
+            json={'content': message},
+            timeout=NOTIFICATION_TIMEOUT)
+
+def acquire_notification_slot(channel):
+    '''
+    Returns False if channel has already been sent its rate limit of
+    messages during the current second
+    '''
+    key = 'notification_rate:{}:{}'.format(channel, int(time.time()))
+    pipeline = get_redis_connection().pipeline()
+    pipeline.incr(key)
+    pipeline.expire(key, 2)
+    count, _ = pipeline.execute()
+    return count <= NOTIFICATION_RATE_LIMITS.get(channel, 1)
+
+def get_digest_messages(messages):
+    '''
+    Joins messages in as few digest messages as the channels accept
+    '''
+    if len(messages) <= 1:
+        return messages
+    digests = []
+    digest = '*Digest of {} notifications*'.format(len(messages))
+    for message in messages:
+        message = message[:NOTIFICATION_MAX_LENGTH]
+        if len(digest) + len(message) + 2 > NOTIFICATION_MAX_LENGTH:
+            digests.append(digest)
+            digest = message
+        else:
+            digest += '\n\n' + message
+    digests.append(digest)
+    return digests
 
 def send_files_to_discord(file_path):
-    notification = Notification.objects.all()
-    if notification and notification[0].send_to_discord \
-    and notification[0].discord_hook_url:
+    notification = get_notification_settings()
+    if notification and notification.send_to_discord \
+    and notification.discord_hook_url:
         webhook = DiscordWebhook(
-            url=notification[0].discord_hook_url,
+            url=notification.discord_hook_url,
             rate_limit_retry=True,
             username="Scan Results - File"
         )
@@ -206,19 +399,156 @@ def send_files_to_discord(file_path):
         thread = Thread(target=webhook.execute)
         thread.start()
 
-def send_notification(message):
+def send_notification(message, digest_key=None):
+    '''
+    Queues message for the enabled channels, the scan does not wait for it
+    to be sent. Messages queued with the same digest_key within
+    NOTIFICATION_DIGEST_WINDOW seconds are sent together as digests.
+    '''
+    if digest_key:
+        from reNgine.tasks import flush_notification_digest
+        connection = get_redis_connection()
+        connection.rpush('notification_digest:{}'.format(digest_key), message)
+        # the first message of a window schedules the digest
+        if connection.set(
+                'notification_digest_window:{}'.format(digest_key),
+                1,
+                nx=True,
+                ex=NOTIFICATION_DIGEST_WINDOW):
+            flush_notification_digest.apply_async(
+                args=[digest_key],
+                countdown=NOTIFICATION_DIGEST_WINDOW)
+        return
     send_slack_message(message)
     send_discord_message(message)
     send_telegram_message(message)
 
+@lru_cache(maxsize=8)
+def parse_proxy_list(proxies):
+    '''
+    Returns the proxies of the Proxy settings text, one per line
+    '''
+    return tuple(filter(None, (proxy.strip() for proxy in proxies.splitlines())))
+
+def get_proxy_list():
+    '''
+    Returns the configured proxies, empty if proxies are not used
+    '''
+    proxy = get_proxy_settings()
+    if not proxy or not proxy.use_proxy or not proxy.proxies:
+        return ()
+    return parse_proxy_list(proxy.proxies)
+
+def get_proxy_stats(proxies):
+    '''
+    Returns the {proxy: stats} health stats shared by all the workers
+    '''
+    pipeline = get_redis_connection().pipeline()
+    for proxy in proxies:
+        pipeline.hgetall(PROXY_POOL_KEY.format(proxy))
+    return {
+        proxy: {key.decode(): float(value) for key, value in stats.items()}
+        for proxy, stats in zip(proxies, pipeline.execute())
+    }
+
+def get_proxy_weight(stats):
+    '''
+    Weight of a proxy in the rotation, fast proxies with a low error rate
+    and few running tools are chosen more often, evicted ones never
+    '''
+    if stats.get('evicted_until', 0) > time.time():
+        return 0
+    successes = stats.get('successes', 0)
+    failures = stats.get('failures', 0)
+    success_rate = (successes + 1) / (successes + failures + 2)
+    latency = stats.get('latency', PROXY_DEFAULT_LATENCY)
+    return success_rate / latency / (1 + max(stats.get('leases', 0), 0))
+
+def choose_proxy():
+    '''
+    Returns a proxy chosen by weight among the healthy ones, False if
+    proxies are not used
+    '''
+    proxies = get_proxy_list()
+    if not proxies:
+        return False
+    stats = get_proxy_stats(proxies)
+    weights = [get_proxy_weight(stats[proxy]) for proxy in proxies]
+    if not any(weights):
+        # every proxy failed, keep rotating rather than leaking the real ip
+        logger.warning('All the proxies are evicted, choosing one at random')
+        return random.choice(proxies)
+    return random.choices(proxies, weights=weights)[0]
+
 def get_random_proxy():
-    if Proxy.objects.all().exists():
-        proxy = Proxy.objects.all()[0]
-        if proxy.use_proxy:
-            proxy_name = random.choice(proxy.proxies.splitlines())
-            print('Using proxy: ' + proxy_name)
-            return proxy_name
-    return False
+    proxy_name = choose_proxy()
+    if proxy_name:
+        print('Using proxy: ' + proxy_name)
+    return proxy_name
+
+def lease_proxy():
+    '''
+    Returns a proxy for the duration of a tool run, it must be given back
+    with release_proxy once the tool has exited
+    '''
+    proxy = choose_proxy()
+    if proxy:
+        get_redis_connection().hincrby(PROXY_POOL_KEY.format(proxy), 'leases', 1)
+        logger.info('Leased proxy ' + proxy)
+    return proxy
+
+def release_proxy(proxy, success=True, latency=None):
+    '''
+    Gives back a leased proxy and reports the outcome of the tool run
+    '''
+    if not proxy:
+        return
+    get_redis_connection().hincrby(PROXY_POOL_KEY.format(proxy), 'leases', -1)
+    report_proxy_outcome(proxy, success, latency)
+
+def report_proxy_outcome(proxy, success, latency=None):
+    '''
+    Updates the health stats of proxy, it is evicted for
+    PROXY_EVICTION_TIME seconds after PROXY_MAX_FAILURES failures in a row
+    '''
+    key = PROXY_POOL_KEY.format(proxy)
+    connection = get_redis_connection()
+    if success:
+        pipeline = connection.pipeline()
+        pipeline.hincrby(key, 'successes', 1)
+        pipeline.hset(key, 'consecutive_failures', 0)
+        pipeline.execute()
+        if latency is not None:
+            previous = connection.hget(key, 'latency')
+            if previous is not None:
+                latency = (1 - PROXY_LATENCY_SMOOTHING) * float(previous) \
+                    + PROXY_LATENCY_SMOOTHING * latency
+            connection.hset(key, 'latency', latency)
+        return
+    pipeline = connection.pipeline()
+    pipeline.hincrby(key, 'failures', 1)
+    pipeline.hincrby(key, 'consecutive_failures', 1)
+    _, consecutive_failures = pipeline.execute()
+    if consecutive_failures >= PROXY_MAX_FAILURES:
+        logger.warning('Evicting proxy {} after {} failures'.format(
+            proxy, consecutive_failures))
+        connection.hset(key, 'evicted_until', time.time() + PROXY_EVICTION_TIME)
+
+def probe_proxy(proxy):
+    '''
+    Requests PROXY_CHECK_URL through proxy and reports the outcome
+    '''
+    start = time.time()
+    try:
+        response = requests.get(
+            settings.PROXY_CHECK_URL,
+            proxies={'http': proxy, 'https': proxy},
+            timeout=PROXY_CHECK_TIMEOUT)
+        success = response.status_code < 500
+    except requests.RequestException:
+        success = False
+    report_proxy_outcome(proxy, success, time.time() - start if success else None)
+    return success
 
 def send_hackerone_report(vulnerability_id):
     headers = {
@@ -229,8 +559,8 @@ def send_hackerone_report(vulnerability_id):
     vulnerability = Vulnerability.objects.get(id=vulnerability_id)
     # can only send vulnerability report if team_handle exists
     if len(vulnerability.target_domain.h1_team_handle) !=0:
-        if Hackerone.objects.all().exists():
-            hackerone = Hackerone.objects.all()[0]
+        hackerone = get_hackerone_settings()
+        if hackerone:
             if vulnerability.severity == 0:
                 severity_value = 'none'
             elif vulnerability.severity == 1:
@@ -654,255 +984,228 @@ def calculate_age(created):
 def return_zeorth_if_list(variable):
     return variable[0] if type(variable) == list else variable
 
-def get_whois(ip_domain, save_db=False, fetch_from_db=True):
-    if ip_domain and not fetch_from_db:
+WHOIS_CONTACT_FIELDS = [
+    ('name', 'name', DomainRegisterName),
+    ('organization', 'organization', DomainRegisterOrganization),
+    ('address', 'address', DomainAddress),
+    ('city', 'city', DomainCity),
+    ('state', 'state', DomainState),
+    ('zip_code', 'zipcode', DomainZipCode),
+    ('country', 'country', DomainCountry),
+    ('email', 'email', DomainEmail),
+    ('phone', 'phone', DomainPhone),
+    ('fax', 'fax', DomainFax),
+]
+
+# (DomainInfo field, get_whois section, get_whois key, lookup model)
+WHOIS_LOOKUP_FIELDS = [('registrar', 'domain', 'registrar', DomainRegistrar)] + [
+    ('{}_{}'.format(prefix, field), section, key, model)
+    for prefix, section in (
+        ('registrant', 'registrant'),
+        ('admin', 'admin'),
+        ('tech', 'technical_contact'))
+    for field, key, model in WHOIS_CONTACT_FIELDS + (
+        [] if prefix == 'registrant' else [('id', 'id', DomainRegistrarID)])
+]
+
+def get_whois_email(value):
+    email = re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(value))
+    return email.group() if email else None
+
+def parse_whois_result(ip_domain, result):
+    '''
+    Returns the get_whois response of an asyncwhois lookup
+    '''
+    whois = result.parser_output
+    if not whois.get('domain_name'):
+        raise Exception('No WHOIS record found for {}'.format(ip_domain))
+
+    def get_contact(prefix, with_id=True):
+        contact = {
+            key: whois.get('{}_{}'.format(prefix, key))
+            for _, key, _ in WHOIS_CONTACT_FIELDS
+        }
+        contact['email'] = get_whois_email(contact['email'])
+        if with_id:
+            contact['id'] = whois.get('{}_id'.format(prefix))
+        return contact
+
+    return {
+        'status': True,
+        'ip_domain': ip_domain,
+        'domain': {
+            'created': whois.get('created'),
+            'updated': whois.get('updated'),
+            'expires': whois.get('expires'),
+            'registrar': whois.get('registrar'),
+            'geolocation_iso': whois.get('registrant_country'),
+            'dnssec': whois.get('dnssec'),
+            'status': whois.get('status') or [],
+        },
+        'registrant': get_contact('registrant', with_id=False),
+        'admin': get_contact('admin'),
+        'technical_contact': get_contact('tech'),
+        'nameservers': whois.get('name_servers') or [],
+        'raw_text': result.query_output.strip()
+    }
 
-        try:
-            result = asyncwhois.whois_domain(ip_domain)
-            whois = result.parser_output
-            if not whois.get('domain_name'):
-                raise Exception
-        except Exception as e:
-            logger.error(e)
-            return {
-            'status': False,
-            'ip_domain': ip_domain,
-            'result': 'Invalid Domain/IP, WHOIS could not be fetched from WHOIS database'
-            }
+def lookup_whois_many(domains):
+    '''
+    Returns the {domain: get_whois response} of domains. Lookups run
+    concurrently and are cached for WHOIS_CACHE_TIMEOUT seconds.
+    '''
+    results = {}
+    missing = []
+    for domain in set(domains):
+        whois = cache.get(WHOIS_CACHE_KEY.format(domain))
+        if whois is not None:
+            results[domain] = whois
+        else:
+            missing.append(domain)
+    if missing:
+        results.update(asyncio.run(aio_lookup_whois_many(missing)))
+    return results
+
+async def aio_lookup_whois_many(domains):
+    '''
+    Looks domains up with at most WHOIS_CONCURRENCY queries in flight,
+    queries for a same registry are spaced by WHOIS_REGISTRY_INTERVAL
+    seconds so that its whois server does not throttle us
+    '''
+    semaphore = asyncio.Semaphore(WHOIS_CONCURRENCY)
+    registry_locks = {}
+    registry_last_query = {}
+
+    async def lookup(domain):
+        registry = tldextract.extract(domain).suffix
+        async with registry_locks.setdefault(registry, asyncio.Lock()):
+            wait = registry_last_query.get(registry, 0) + WHOIS_REGISTRY_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            registry_last_query[registry] = time.monotonic()
+        async with semaphore:
+            try:
+                result = await asyncwhois.aio_whois_domain(domain, timeout=WHOIS_TIMEOUT)
+                whois = parse_whois_result(domain, result)
+            except Exception as e:
+                logger.error(e)
+                return domain, {
+                    'status': False,
+                    'ip_domain': domain,
+                    'result': 'Invalid Domain/IP, WHOIS could not be fetched from WHOIS database'
+                }
+        cache.set(WHOIS_CACHE_KEY.format(domain), whois, WHOIS_CACHE_TIMEOUT)
+        return domain, whois
+
+    return dict(await asyncio.gather(*(lookup(domain) for domain in domains)))
+
+def bulk_get_or_create_ids(model, values, field='name'):
+    '''
+    Returns the {value: id} map of a whois lookup table, missing values
+    are inserted with one bulk_create
+    '''
+    if not values:
+        return {}
+    lookup = '{}__in'.format(field)
+    ids = dict(model.objects.filter(**{lookup: values}).values_list(field, 'id'))
+    missing = set(values) - ids.keys()
+    if missing:
+        model.objects.bulk_create(
+            [model(**{field: value}) for value in missing],
+            ignore_conflicts=True)
+        ids.update(model.objects.filter(
+            **{lookup: missing}).values_list(field, 'id'))
+    return ids
+
+def save_whois_results(whois_results):
+    '''
+    Saves the get_whois responses of targets as their DomainInfo, lookup
+    tables are upserted once for all the responses
+    '''
+    domains = {
+        domain.name: domain
+        for domain in Domain.objects.filter(
+            name__in=[whois['ip_domain'] for whois in whois_results])
+    }
+    whois_results = [
+        whois for whois in whois_results
+        if whois['status'] and whois['ip_domain'] in domains]
+    if not whois_results:
+        return
+
+    def get_value(whois, section, key, model, field='name'):
+        value = whois[section].get(key) if section else whois.get(key)
+        if not value:
+            return None
+        # longer values would fail the whole batch
+        return str(value)[:model._meta.get_field(field).max_length]
+
+    values = {}
+    for whois in whois_results:
+        for _, section, key, model in WHOIS_LOOKUP_FIELDS:
+            value = get_value(whois, section, key, model)
+            if value:
+                values.setdefault(model, set()).add(value)
+    ids = {
+        model: bulk_get_or_create_ids(model, model_values)
+        for model, model_values in values.items()
+    }
+    status_ids = bulk_get_or_create_ids(
+        DomainWhoisStatus,
+        set(str(status)[:500] for whois in whois_results for status in whois['domain']['status']),
+        field='status')
+    name_server_ids = bulk_get_or_create_ids(
+        NameServers,
+        set(str(name_server)[:500] for whois in whois_results for name_server in whois['nameservers']))
+
+    domain_infos = []
+    for whois in whois_results:
+        domain_info = DomainInfo(
+            raw_text=whois['raw_text'][:15000],
+            dnssec=get_value(whois, 'domain', 'dnssec', DomainInfo, 'dnssec'),
+            created=whois['domain']['created'],
+            updated=whois['domain']['updated'],
+            expires=whois['domain']['expires'])
+        for field, section, key, model in WHOIS_LOOKUP_FIELDS:
+            value = get_value(whois, section, key, model)
+            setattr(domain_info, '{}_id'.format(field), ids[model][value] if value else None)
+        domain_infos.append(domain_info)
+    DomainInfo.objects.bulk_create(domain_infos)
+
+    status_rows = []
+    name_server_rows = []
+    for whois, domain_info in zip(whois_results, domain_infos):
+        for status in set(str(status)[:500] for status in whois['domain']['status']):
+            status_rows.append(DomainInfo.status.through(
+                domaininfo_id=domain_info.id,
+                domainwhoisstatus_id=status_ids[status]))
+        for name_server in set(str(name_server)[:500] for name_server in whois['nameservers']):
+            name_server_rows.append(DomainInfo.name_servers.through(
+                domaininfo_id=domain_info.id,
+                nameservers_id=name_server_ids[name_server]))
+        domains[whois['ip_domain']].domain_info = domain_info
+    DomainInfo.status.through.objects.bulk_create(status_rows, ignore_conflicts=True)
+    DomainInfo.name_servers.through.objects.bulk_create(name_server_rows, ignore_conflicts=True)
+    Domain.objects.bulk_update(
+        [domains[whois['ip_domain']] for whois in whois_results],
+        ['domain_info'])
+
+def enqueue_whois_enrichment(domain_names):
+    '''
+    Queues the WHOIS lookup of domain_names in batches of WHOIS_BATCH_SIZE
+    '''
+    from reNgine.tasks import enrich_whois
+    domain_names = list(domain_names)
+    for index in range(0, len(domain_names), WHOIS_BATCH_SIZE):
+        enrich_whois.delay(domain_names[index:index + WHOIS_BATCH_SIZE])
 
-        created = whois.get('created')
-        expires = whois.get('expires')
-        updated = whois.get('updated')
-
-        registrar = whois.get('registrar')
-        dnssec = whois.get('dnssec')
-        status = whois.get('status')
-
-        registrant_name = whois.get('registrant_name')
-        registrant_organization = whois.get('registrant_organization')
-        registrant_address = whois.get('registrant_address')
-        registrant_city = whois.get('registrant_city')
-        registrant_state = whois.get('registrant_state')
-        registrant_zipcode = whois.get('registrant_zipcode')
-        registrant_country = whois.get('registrant_country')
-        registrant_email = whois.get('registrant_email')
-        registrant_phone = whois.get('registrant_phone')
-        registrant_fax = whois.get('registrant_fax')
-
-        name_servers = whois.get('name_servers')
-
-        admin_name = whois.get('admin_name')
-        admin_id = whois.get('admin_id')
-        admin_organization = whois.get('admin_organization')
-        admin_city = whois.get('admin_city')
-        admin_address = whois.get('admin_address')
-        admin_state = whois.get('admin_state')
-        admin_zipcode = whois.get('admin_zipcode')
-        admin_country = whois.get('admin_country')
-        admin_phone = whois.get('admin_phone')
-        admin_fax = whois.get('admin_fax')
-        admin_email = whois.get('admin_email')
-
-        tech_name = whois.get('tech_name')
-        tech_id = whois.get('tech_id')
-        tech_organization = whois.get('tech_organization')
-        tech_city = whois.get('tech_city')
-        tech_address = whois.get('tech_address')
-        tech_state = whois.get('tech_state')
-        tech_zipcode = whois.get('tech_zipcode')
-        tech_country = whois.get('tech_country')
-        tech_phone = whois.get('tech_phone')
-        tech_fax = whois.get('tech_fax')
-        tech_email = whois.get('tech_email')
-
-        if save_db and Domain.objects.filter(name=ip_domain).exists():
+def get_whois(ip_domain, save_db=False, fetch_from_db=True):
+    if ip_domain and not fetch_from_db:
+        whois = lookup_whois_many([ip_domain])[ip_domain]
+        if save_db and whois['status']:
             logger.info('Saving in DB!')
-            domain = Domain.objects.get(name=ip_domain)
-
-            domain_info = DomainInfo()
-            domain_info.raw_text = result.query_output.strip()
-            domain_info.dnsec = dnssec
-            domain_info.created = created
-            domain_info.updated = updated
-            domain_info.expires = expires
-
-            # registrant
-            domain_info.registrar = DomainRegistrar.objects.get_or_create(
-                name=registrar
-            )[0] if registrar else None
-
-            domain_info.registrant_name = DomainRegisterName.objects.get_or_create(
-                name=registrant_name
-            )[0] if registrant_name else None
-            domain_info.registrant_organization = DomainRegisterOrganization.objects.get_or_create(
-                name=registrant_organization
-            )[0] if registrant_organization else None
-            domain_info.registrant_address = DomainAddress.objects.get_or_create(
-                name=registrant_address
-            )[0] if registrant_address else None
-            domain_info.registrant_city = DomainCity.objects.get_or_create(
-                name=registrant_city
-            )[0] if registrant_city else None
-            domain_info.registrant_state = DomainState.objects.get_or_create(
-                name=registrant_state
-            )[0] if registrant_state else None
-            domain_info.registrant_zip_code = DomainZipCode.objects.get_or_create(
-                name=registrant_zipcode
-            )[0] if registrant_zipcode else None
-            domain_info.registrant_country = DomainCountry.objects.get_or_create(
-                name=registrant_country
-            )[0] if registrant_country else None
-            domain_info.registrant_email = DomainEmail.objects.get_or_create(
-                name=re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(registrant_email)).group()
-            )[0] if re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(registrant_email)) else None
-            domain_info.registrant_phone = DomainPhone.objects.get_or_create(
-                name=registrant_phone
-            )[0] if registrant_phone else None
-            domain_info.registrant_fax = DomainFax.objects.get_or_create(
-                name=registrant_fax
-            )[0] if registrant_fax else None
-
-            # admin
-            domain_info.admin_name = DomainRegisterName.objects.get_or_create(
-                name=admin_name
-            )[0] if admin_name else None
-            domain_info.admin_id = DomainRegistrarID.objects.get_or_create(
-                name=admin_id
-            )[0] if admin_id else None
-            domain_info.admin_organization = DomainRegisterOrganization.objects.get_or_create(
-                name=admin_organization
-            )[0] if admin_organization else None
-            domain_info.admin_address = DomainAddress.objects.get_or_create(
-                name=admin_address
-            )[0] if admin_address else None
-            domain_info.admin_city = DomainCity.objects.get_or_create(
-                name=admin_city
-            )[0] if admin_city else None
-            domain_info.admin_state = DomainState.objects.get_or_create(
-                name=admin_state
-            )[0] if admin_state else None
-            domain_info.admin_zip_code = DomainZipCode.objects.get_or_create(
-                name=admin_zipcode
-            )[0] if admin_zipcode else None
-            domain_info.admin_country = DomainCountry.objects.get_or_create(
-                name=admin_country
-            )[0] if admin_country else None
-            domain_info.admin_email = DomainEmail.objects.get_or_create(
-                name=re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(admin_email)).group()
-            )[0] if re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(admin_email)) else None
-            domain_info.admin_phone = DomainPhone.objects.get_or_create(
-                name=admin_phone
-            )[0] if admin_phone else None
-            domain_info.admin_fax = DomainFax.objects.get_or_create(
-                name=admin_fax
-            )[0] if admin_fax else None
-
-            # tech
-            domain_info.tech_name = DomainRegisterName.objects.get_or_create(
-                name=tech_name
-            )[0] if tech_name else None
-            domain_info.tech_id = DomainRegistrarID.objects.get_or_create(
-                name=tech_id
-            )[0] if tech_id else None
-            domain_info.tech_organization = DomainRegisterOrganization.objects.get_or_create(
-                name=tech_organization
-            )[0] if tech_organization else None
-            domain_info.tech_address = DomainAddress.objects.get_or_create(
-                name=tech_address
-            )[0] if tech_address else None
-            domain_info.tech_city = DomainCity.objects.get_or_create(
-                name=tech_city
-            )[0] if tech_city else None
-            domain_info.tech_state = DomainState.objects.get_or_create(
-                name=tech_state
-            )[0] if tech_state else None
-            domain_info.tech_zip_code = DomainZipCode.objects.get_or_create(
-                name=tech_zipcode
-            )[0] if tech_zipcode else None
-            domain_info.tech_country = DomainCountry.objects.get_or_create(
-                name=tech_country
-            )[0] if tech_country else None
-            domain_info.tech_email = DomainEmail.objects.get_or_create(
-                name=re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(tech_email)).group()
-            )[0] if re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(tech_email)) else None
-            domain_info.tech_phone = DomainPhone.objects.get_or_create(
-                name=tech_phone
-            )[0] if tech_phone else None
-            domain_info.tech_fax = DomainFax.objects.get_or_create(
-                name=tech_fax
-            )[0] if tech_fax else None
-
-            domain_info.save()
-
-            # status
-            for _status in status:
-                domain_info.status.add(
-                    DomainWhoisStatus.objects.get_or_create(
-                        status=_status
-                )[0])
-
-            # name servers
-            for name_server in name_servers:
-                domain_info.name_servers.add(
-                    NameServers.objects.get_or_create(
-                        name=name_server
-                )[0])
-
-            domain.domain_info = domain_info
-            domain.save()
-        return {
-            'status': True,
-            'ip_domain': ip_domain,
-            'domain': {
-                'created': created,
-                'updated': updated,
-                'expires': expires,
-                'registrar': registrar,
-                'geolocation_iso': registrant_country,
-                'dnssec': dnssec,
-                'status': status,
-            },
-            'registrant': {
-                'name': registrant_name,
-                'organization': registrant_organization,
-                'address': registrant_address,
-                'city': registrant_city,
-                'state': registrant_state,
-                'zipcode': registrant_zipcode,
-                'country': registrant_country,
-                'phone': registrant_phone,
-                'fax': registrant_fax,
-                'email': re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(registrant_email)).group() if re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(registrant_email)) else None,
-            },
-            'admin': {
-                'name': admin_name,
-                'id': admin_id,
-                'organization': admin_organization,
-                'city': admin_city,
-                'address': admin_address,
-                'state': admin_state,
-                'zipcode': admin_zipcode,
-                'country': admin_country,
-                'phone': admin_phone,
-                'fax': admin_fax,
-                'email': re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(admin_email)).group() if re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(admin_email)) else None,
-            },
-            'technical_contact': {
-                'name': tech_name,
-                'id': tech_id,
-                'organization': tech_organization,
-                'city': tech_city,
-                'address': tech_address,
-                'state': tech_state,
-                'zipcode': tech_zipcode,
-                'country': tech_country,
-                'phone': tech_phone,
-                'fax': tech_fax,
-                'email': re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(tech_email)).group() if re.search(r"[a-z0-9\.\-+_]+@[a-z0-9\.\-+_]+\.[a-z]+", str(tech_email)) else None,
-            },
-            'nameservers': name_servers,
-            'raw_text': result.query_output.strip()
-        }
+            save_whois_results([whois])
+        return whois
 
     elif ip_domain and fetch_from_db:
         domain = Domain.objects.get(name=ip_domain) if Domain.objects.filter(name=ip_domain).exists() else None
@@ -1022,3 +1325,342 @@ def remove_cmd_injection_chars(command):
     for chrs in remove_chars:
         command = command.replace(chrs, '')
     return command
+
+
+def update_scan_stats(scan_history_id):
+    '''
+    Recomputes the dashboard counters of a single scan, each query only
+    touches the rows of this scan through the scan_history indexes
+    '''
+    subdomains = Subdomain.objects.filter(
+        scan_history__id=scan_history_id).aggregate(
+            subdomain_count=Count('id'),
+            alive_count=Count('id', filter=~Q(http_status=0)))
+    endpoints = EndPoint.objects.filter(
+        scan_history__id=scan_history_id).aggregate(
+            endpoint_count=Count('id'),
+            endpoint_alive_count=Count('id', filter=Q(http_status=200)))
+    vulnerabilities = Vulnerability.objects.filter(
+        scan_history__id=scan_history_id).aggregate(
+            info_count=Count('id', filter=Q(severity=0)),
+            low_count=Count('id', filter=Q(severity=1)),
+            medium_count=Count('id', filter=Q(severity=2)),
+            high_count=Count('id', filter=Q(severity=3)),
+            critical_count=Count('id', filter=Q(severity=4)),
+            unknown_count=Count('id', filter=Q(severity=-1)))
+    subdomain_with_ip_count = Subdomain.objects.filter(
+        scan_history__id=scan_history_id,
+        ip_addresses__isnull=False).count()
+    ScanStats.objects.update_or_create(
+        scan_history_id=scan_history_id,
+        defaults={
+            **subdomains,
+            **endpoints,
+            **vulnerabilities,
+            'subdomain_with_ip_count': subdomain_with_ip_count,
+        })
+
+
+def get_report_path(scan_history, report_type):
+    '''
+    Returns the path of the pdf report of scan_history inside its results
+    directory. The file name holds a hash of the report type, the report
+    settings, the scan stop date and the freshness of the scan results, so
+    a generated report is served again until one of them changes.
+    '''
+    report_setting = VulnerabilityReportSetting.objects.first()
+    settings_hash = hashlib.md5(json.dumps(
+        [
+            report_type,
+            model_to_dict(report_setting) if report_setting else None,
+            scan_history.stop_scan_date,
+            get_report_freshness(scan_history),
+        ],
+        sort_keys=True,
+        default=str).encode()).hexdigest()
+    return os.path.join(
+        '/usr/src/scan_results',
+        scan_history.results_dir or str(scan_history.id),
+        'reports',
+        '{}_{}_{}.pdf'.format(scan_history.id, report_type, settings_hash))
+
+
+def get_report_freshness(scan_history):
+    '''
+    Returns a marker of the results a report of scan_history is rendered
+    from, it changes when results are added or deleted, when a subscan ends
+    and when the status of a vulnerability is changed
+    '''
+    return [
+        Subdomain.objects.filter(scan_history=scan_history).aggregate(
+            count=Count('id'),
+            last_id=Max('id')),
+        EndPoint.objects.filter(scan_history=scan_history).aggregate(
+            count=Count('id'),
+            last_id=Max('id')),
+        Vulnerability.objects.filter(scan_history=scan_history).aggregate(
+            count=Count('id'),
+            last_id=Max('id'),
+            # toggling the status of any vulnerability changes the sum
+            open_ids=Sum('id', filter=Q(open_status=True))),
+        SubScan.objects.filter(scan_history=scan_history).aggregate(
+            count=Count('id'),
+            last_stop=Max('stop_scan_date')),
+    ]
+
+
+def is_report_cacheable(scan_history):
+    '''
+    Reports of scans still running, or with subscans still running, are
+    generated again on each request as their results keep changing
+    '''
+    return scan_history.stop_scan_date is not None and \
+        scan_history.scan_status not in (INITIATED_TASK, RUNNING_TASK) and \
+        not SubScan.objects.filter(
+            scan_history=scan_history,
+            status__in=[INITIATED_TASK, RUNNING_TASK]).exists()
+
+
+def get_report_status(report_path):
+    '''
+    Returns completed, failed, running or None when the report has never
+    been generated, from the files left next to report_path by the job
+    '''
+    if os.path.isfile(report_path):
+        return 'completed'
+    if os.path.isfile(report_path + '.failed'):
+        return 'failed'
+    pending_path = report_path + '.pending'
+    if os.path.isfile(pending_path) and \
+            time.time() - os.path.getmtime(pending_path) < REPORT_JOB_TIMEOUT:
+        return 'running'
+    return None
+
+
+def claim_report_job(report_path):
+    '''
+    Creates the pending marker of report_path, returns False if another
+    request already started the job
+    '''
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    pending_path = report_path + '.pending'
+    if get_report_status(report_path) != 'running' and \
+            os.path.isfile(pending_path):
+        # left by a dead job
+        os.remove(pending_path)
+    if os.path.isfile(report_path + '.failed'):
+        os.remove(report_path + '.failed')
+    try:
+        os.close(os.open(pending_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+GEOIP_DATABASES = {}
+COUNTRY_ISO_CACHE = {}
+
+
+def get_geoip_database(version):
+    '''
+    Opens the GeoIP country database of the ip version once per process,
+    memory mapped so that lookups do not touch the disk. Returns None when
+    the database is not installed.
+    '''
+    if version not in GEOIP_DATABASES:
+        path = GEOIP_DATABASE if version == 4 else GEOIP_V6_DATABASE
+        try:
+            GEOIP_DATABASES[version] = pygeoip.GeoIP(path, pygeoip.MMAP_CACHE)
+        except (IOError, OSError) as exception:
+            logger.error('Unable to load GeoIP database {}: {}'.format(path, exception))
+            GEOIP_DATABASES[version] = None
+    return GEOIP_DATABASES[version]
+
+
+@lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def geoip_lookup(ip_address):
+    '''
+    Returns the (iso, name) country of an ip address, None if unknown
+    '''
+    try:
+        version = ipaddress.ip_address(ip_address).version
+    except ValueError:
+        return None
+    database = get_geoip_database(version)
+    if not database:
+        return None
+    try:
+        iso = database.country_code_by_addr(ip_address)
+        name = database.country_name_by_addr(ip_address)
+    except (pygeoip.GeoIPError, OSError) as exception:
+        logger.error(exception)
+        return None
+    if not iso or not name:
+        return None
+    return (iso, name)
+
+
+def geoip_lookup_many(ip_addresses):
+    '''
+    Batch version of geoip_lookup, returns {ip_address: (iso, name)} for the
+    addresses whose country is known
+    '''
+    countries = {}
+    for ip_address in set(ip_addresses):
+        country = geoip_lookup(ip_address)
+        if country:
+            countries[ip_address] = country
+    return countries
+
+
+def get_country_isos(countries):
+    '''
+    Returns {(iso, name): CountryISO} for countries, rows are created in
+    bulk the first time a country is seen and kept in memory afterwards
+    '''
+    missing = set(countries) - COUNTRY_ISO_CACHE.keys()
+    if missing:
+        CountryISO.objects.bulk_create(
+            [CountryISO(iso=iso, name=name) for iso, name in missing],
+            ignore_conflicts=True)
+        for country_iso in CountryISO.objects.filter(
+                iso__in={iso for iso, _ in missing}):
+            COUNTRY_ISO_CACHE[(country_iso.iso, country_iso.name)] = country_iso
+    return {
+        country: COUNTRY_ISO_CACHE[country]
+        for country in countries if country in COUNTRY_ISO_CACHE}
+
+def read_target_rows(lines, file_type='txt'):
+    '''
+    Yields the (name, description, organization) rows of a target list,
+    csv lines are name[,description[,organization]]
+    '''
+    if file_type == 'csv':
+        for column in csv.reader(lines, delimiter=','):
+            if column:
+                yield (
+                    column[0],
+                    column[1] if len(column) > 1 else None,
+                    column[2] if len(column) > 2 else None)
+    else:
+        for line in lines:
+            yield line.rstrip('\n').rstrip('\r'), None, None
+
+def set_target_import_progress(import_id, **progress):
+    if import_id:
+        key = TARGET_IMPORT_KEY.format(import_id)
+        connection = get_redis_connection()
+        connection.hset(key, mapping=progress)
+        connection.expire(key, TARGET_IMPORT_TIMEOUT)
+
+def get_target_import_progress(import_id):
+    '''
+    Returns the status and the counts of a background target import
+    '''
+    progress = get_redis_connection().hgetall(TARGET_IMPORT_KEY.format(import_id))
+    return {key.decode(): value.decode() for key, value in progress.items()}
+
+def import_targets(
+        rows,
+        description=None,
+        h1_team_handle=None,
+        ip_address_cidr=None,
+        import_id=None):
+    '''
+    Adds the valid targets of rows not present yet, rows are
+    (name, description, organization) tuples. Rows are imported by chunks
+    of TARGET_IMPORT_CHUNK_SIZE with a fixed number of queries each.
+    Returns the processed, added, existing and invalid counts. The WHOIS of
+    the added targets is looked up in the background.
+    '''
+    counts = {'processed': 0, 'added': 0, 'existing': 0, 'invalid': 0}
+    seen = set()
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= TARGET_IMPORT_CHUNK_SIZE:
+            enqueue_whois_enrichment(import_target_chunk(
+                chunk, seen, counts, description, h1_team_handle, ip_address_cidr))
+            set_target_import_progress(import_id, **counts)
+            chunk = []
+    if chunk:
+        enqueue_whois_enrichment(import_target_chunk(
+            chunk, seen, counts, description, h1_team_handle, ip_address_cidr))
+        set_target_import_progress(import_id, **counts)
+    return counts
+
+def import_target_chunk(
+        rows,
+        seen,
+        counts,
+        description=None,
+        h1_team_handle=None,
+        ip_address_cidr=None):
+    '''
+    Imports a chunk of import_targets and returns the names of the added
+    targets
+    '''
+    targets = {}
+    for name, row_description, organization in rows:
+        name = name.strip()
+        if not name:
+            continue
+        counts['processed'] += 1
+        if name in seen:
+            counts['existing'] += 1
+            continue
+        seen.add(name)
+        targets[name] = (row_description, organization)
+
+    valid_names = set(filter(validators.domain, targets))
+    counts['invalid'] += len(targets) - len(valid_names)
+
+    existing_names = set(Domain.objects.filter(
+        name__in=valid_names).values_list('name', flat=True))
+    counts['existing'] += len(existing_names)
+
+    insert_date = timezone.now()
+    new_domains = [
+        Domain(
+            name=name,
+            description=targets[name][0] if targets[name][0] is not None else description,
+            h1_team_handle=h1_team_handle,
+            ip_address_cidr=ip_address_cidr,
+            insert_date=insert_date)
+        for name in valid_names - existing_names
+    ]
+    Domain.objects.bulk_create(new_domains, ignore_conflicts=True)
+    counts['added'] += len(new_domains)
+
+    # domains listed with an organization are attached to it, existing or not
+    organization_names = {
+        name: targets[name][1].strip()
+        for name in valid_names
+        if targets[name][1] and targets[name][1].strip()
+    }
+    if not organization_names:
+        return [domain.name for domain in new_domains]
+    organization_values = set(organization_names.values())
+    existing_organizations = set(Organization.objects.filter(
+        name__in=organization_values).values_list('name', flat=True))
+    Organization.objects.bulk_create(
+        [
+            Organization(name=name, insert_date=insert_date)
+            for name in organization_values - existing_organizations
+        ],
+        ignore_conflicts=True)
+    organization_ids = dict(Organization.objects.filter(
+        name__in=organization_values).values_list('name', 'id'))
+    domain_ids = dict(Domain.objects.filter(
+        name__in=organization_names).values_list('name', 'id'))
+    Through = Organization.domains.through
+    Through.objects.bulk_create(
+        [
+            Through(
+                organization_id=organization_ids[organization],
+                domain_id=domain_ids[name])
+            for name, organization in organization_names.items()
+            if name in domain_ids and organization in organization_ids
+        ],
+        ignore_conflicts=True)
+    return [domain.name for domain in new_domains]
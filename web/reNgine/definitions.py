@@ -26,8 +26,13 @@ INTENSITY = 'intensity'
 
 USES_TOOLS = 'uses_tools'
 THREADS = 'threads'
+TOOL_CONCURRENCY = 'tool_concurrency'
+TOOL_TIMEOUT = 'tool_timeout'
 AMASS_WORDLIST = 'amass_wordlist'
 NAABU_RATE = 'rate'
+NAABU_SHARDS = 'shards'
+FFUF_PARALLELISM = 'parallelism'
+FFUF_RATE = 'rate'
 PORT = 'Port'
 PORTS = 'ports'
 EXCLUDE_PORTS = 'exclude_ports'
@@ -51,12 +56,16 @@ EXCLUDED_SUBDOMAINS = 'excluded_subdomains'
 EXCLUDE_TEXT = 'exclude_text'
 IGNORE_FILE_EXTENSION = 'ignore_file_extension'
 GF_PATTERNS = 'gf_patterns'
+URLS_PER_SHAPE = 'urls_per_shape'
 
 VULNERABILITY_SCAN = 'vulnerability_scan'
 CUSTOM_NUCLEI_TEMPLATE = 'custom_templates'
 NUCLEI_TEMPLATE = 'templates'
 NUCLEI_SEVERITY = 'severity'
 NUCLEI_CONCURRENCY = 'concurrency'
+NUCLEI_BULK_SIZE = 'bulk_size'
+NUCLEI_SINGLE_PASS = 'single_pass'
+NUCLEI_TEMPLATE_UPDATE_INTERVAL = 'template_update_interval'
 RATE_LIMIT = 'rate_limit'
 RETRIES = 'retries'
 
@@ -72,6 +81,47 @@ USE_NAABU_CONFIG = 'use_naabu_config'
 
 CUSTOM_HEADER = 'custom_header'
 
+HTTP_CRAWLER = 'http_crawler'
+BATCH_SIZE = 'batch_size'
+
+###############################################################################
+# Scan stage DEFINITIONS
+###############################################################################
+# stages that run after the http crawler, each inner list is one branch of the
+# scan graph, stages of a branch run one after another, branches in parallel
+SCAN_STAGE_BRANCHES = [
+    ['waf_detection'],
+    ['screenshot'],
+    ['port_scan'],
+    ['osint'],
+    ['dir_file_fuzz'],
+    ['fetch_url', 'vulnerability_scan'],
+]
+
+###############################################################################
+# Subdomain discovery DEFINITIONS
+###############################################################################
+# number of subdomain gathering tools running at the same time
+DEFAULT_SUBDOMAIN_TOOL_CONCURRENCY = 4
+
+# files the subdomain gathering tools write their results into
+SUBDOMAIN_TOOL_OUTPUT_FILES = {
+    'amass-passive': 'from_amass.txt',
+    'amass-active': 'from_amass_active.txt',
+    'assetfinder': 'from_assetfinder.txt',
+    'sublist3r': 'from_sublister.txt',
+    'subfinder': 'from_subfinder.txt',
+    'oneforall': 'from_oneforall.txt',
+}
+
+###############################################################################
+# Result ingestion DEFINITIONS
+###############################################################################
+# number of tool output rows persisted per round of bulk queries
+DEFAULT_INGEST_BATCH_SIZE = 500
+# seconds after which results read from a running tool are saved anyway
+DEFAULT_STREAM_FLUSH_INTERVAL = 5
+
 ###############################################################################
 # Wordlist DEFINITIONS
 ###############################################################################
@@ -99,6 +149,156 @@ XLARGE = '500px'
 MATCHED_SUBDOMAIN = 'Subdomain'
 MATCHED_PAGE_TITLE = 'Page Title'
 
+###############################################################################
+# Interesting lookup DEFINITIONS
+###############################################################################
+INTERESTING_LOOKUP_CACHE_KEY = 'interesting_lookup'
+# seconds before workers reload the lookup settings, saving them invalidates
+# the shared cache straight away
+INTERESTING_LOOKUP_CACHE_TIMEOUT = 300
+
+###############################################################################
+# Settings cache DEFINITIONS
+###############################################################################
+# formatted with the db table of Notification, Proxy or Hackerone
+SETTINGS_CACHE_KEY = 'settings_{}'
+# seconds before workers reload the settings, saving them invalidates the
+# shared cache straight away
+SETTINGS_CACHE_TIMEOUT = 60
+
+###############################################################################
+# Proxy pool DEFINITIONS
+###############################################################################
+# redis hash of the health stats of a proxy
+PROXY_POOL_KEY = 'proxy_pool:{}'
+# seconds, latency of the proxies not probed yet
+PROXY_DEFAULT_LATENCY = 1
+# weight of the last latency in the moving average of a proxy latency
+PROXY_LATENCY_SMOOTHING = 0.3
+# failures in a row after which a proxy is evicted from the rotation
+PROXY_MAX_FAILURES = 3
+# seconds before an evicted proxy is used again
+PROXY_EVICTION_TIME = 600
+PROXY_CHECK_TIMEOUT = 10
+PROXY_CHECK_CONCURRENCY = 20
+
+###############################################################################
+# Target import DEFINITIONS
+###############################################################################
+# targets validated and inserted per round of bulk queries
+TARGET_IMPORT_CHUNK_SIZE = 1000
+# imports of more targets run as a background job
+TARGET_IMPORT_BACKGROUND_THRESHOLD = 1000
+TARGET_IMPORT_DIRECTORY = '/usr/src/scan_results/imports'
+# redis hash of the progress of a background import
+TARGET_IMPORT_KEY = 'target_import:{}'
+# seconds the progress of an import is kept
+TARGET_IMPORT_TIMEOUT = 86400
+
+###############################################################################
+# WHOIS DEFINITIONS
+###############################################################################
+WHOIS_CACHE_KEY = 'whois_{}'
+# seconds a WHOIS lookup is served from cache
+WHOIS_CACHE_TIMEOUT = 86400
+# WHOIS queries in flight at the same time
+WHOIS_CONCURRENCY = 10
+# seconds between two queries to the whois server of a same registry
+WHOIS_REGISTRY_INTERVAL = 1
+WHOIS_TIMEOUT = 10
+# domains looked up by one enrich_whois task
+WHOIS_BATCH_SIZE = 100
+
+###############################################################################
+# Dashboard DEFINITIONS
+###############################################################################
+DASHBOARD_CACHE_KEY = 'dashboard_context'
+# seconds the dashboard numbers are served from cache
+DASHBOARD_CACHE_TIMEOUT = 60
+
+###############################################################################
+# Port scan DEFINITIONS
+###############################################################################
+# most naabu shards of a sharded port scan, their task ids are fixed so that
+# aborting the scan revokes them
+NAABU_MAX_SHARDS = 32
+NAABU_SHARD_STAGE = 'port_scan_shard_{}'
+
+###############################################################################
+# Fetch url DEFINITIONS
+###############################################################################
+# urls kept for each host, path template and parameter names, 0 keeps all
+DEFAULT_URLS_PER_SHAPE = 10
+# path segments replaced by a placeholder in url shapes
+URL_PATH_TEMPLATES = [
+    (r'^\d+$', '{int}'),
+    (r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', '{uuid}'),
+    (r'^[0-9a-f]{16,}$', '{hash}'),
+]
+# gf pattern definitions, installed by celery-entrypoint.sh
+GF_PATTERNS_DIRECTORY = '/root/.gf'
+
+###############################################################################
+# Directory fuzz DEFINITIONS
+###############################################################################
+# hosts fuzzed at the same time by ffuf
+DEFAULT_FFUF_PARALLELISM = 1
+
+###############################################################################
+# Notification DEFINITIONS
+###############################################################################
+# messages sent per second to each channel
+NOTIFICATION_RATE_LIMITS = {
+    'slack': 1,
+    'discord': 2,
+    'telegram': 1,
+}
+# seconds during which the messages of a digest key are coalesced
+NOTIFICATION_DIGEST_WINDOW = 30
+# discord refuses messages longer than 2000 characters
+NOTIFICATION_MAX_LENGTH = 1900
+NOTIFICATION_TIMEOUT = 10
+NOTIFICATION_MAX_RETRIES = 5
+
+###############################################################################
+# Nuclei DEFINITIONS
+###############################################################################
+# nuclei severity name to Vulnerability.severity
+NUCLEI_SEVERITY_MAP = {
+    'info': 0,
+    'low': 1,
+    'medium': 2,
+    'high': 3,
+    'critical': 4,
+    'unknown': -1,
+}
+NUCLEI_REVERSE_SEVERITY_MAP = {
+    value: key for key, value in NUCLEI_SEVERITY_MAP.items()}
+
+# hours between two nuclei template updates, 0 updates before every scan
+DEFAULT_NUCLEI_TEMPLATE_UPDATE_INTERVAL = 24
+NUCLEI_TEMPLATE_UPDATE_LOCK = '/tmp/nuclei_template_update.lock'
+
+###############################################################################
+# Report DEFINITIONS
+###############################################################################
+REPORT_TYPES = ['full', 'recon', 'vulnerability']
+# rows rendered per template chunk, bounds the memory used by report jobs
+REPORT_CHUNK_SIZE = 500
+# seconds after which a report job still pending is considered dead
+REPORT_JOB_TIMEOUT = 3600
+# placeholders of report/template.html replaced by the chunked sections
+REPORT_CHUNK_PATTERN = r'<!-- report-chunk:(\w+) -->'
+
+###############################################################################
+# GeoIP DEFINITIONS
+###############################################################################
+# legacy country databases shipped by the geoip-database package
+GEOIP_DATABASE = '/usr/share/GeoIP/GeoIP.dat'
+GEOIP_V6_DATABASE = '/usr/share/GeoIP/GeoIPv6.dat'
+# number of ip addresses whose country is kept in memory per process
+GEOIP_CACHE_SIZE = 65536
+
 ###############################################################################
 # Celery Task Status CODES
 ###############################################################################
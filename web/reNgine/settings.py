@@ -162,6 +162,18 @@ LOGOUT_REDIRECT_URL = 'login'
 # Tool Location
 TOOL_LOCATION = '/usr/src/app/tools/'
 
+'''
+Cache settings
+'''
+# shared by the web and celery workers, so that a value cached or invalidated
+# by one process is seen by all the others
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://redis:6379/1'),
+    }
+}
+
 '''
 CELERY settings
 '''
@@ -169,6 +181,22 @@ CELERY_BROKER_URL = os.environ.get("CELERY_BROKER", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_BROKER", "redis://redis:6379/0")
 CELERY_ENABLE_UTC = False
 CELERY_TIMEZONE = 'UTC'
+# notifications are sent by their own worker, see docker-compose.yml
+CELERY_TASK_ROUTES = {
+    'reNgine.tasks.send_notification_message': {'queue': 'notifications'},
+    'reNgine.tasks.flush_notification_digest': {'queue': 'notifications'},
+}
+CELERY_BEAT_SCHEDULE = {
+    'check-proxies': {
+        'task': 'reNgine.tasks.check_proxies',
+        'schedule': int(os.environ.get('PROXY_CHECK_INTERVAL', 300)),
+    },
+}
+
+# url requested through each proxy by the proxy health checks, there is no
+# default so that reNgine never calls a third party on its own, proxies are
+# then only rated on the outcome of the scans using them
+PROXY_CHECK_URL = os.environ.get('PROXY_CHECK_URL')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
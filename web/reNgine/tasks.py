@@ -1,24 +1,33 @@
 import os
+import re
 import traceback
 import yaml
 import json
 import csv
+import fcntl
+import shutil
 import validators
 import random
 import requests
 import time
 import logging
 import metafinder.extractor as metadata_extractor
-import whatportis
 import subprocess
-
-from random import randint
+import queue
+import hashlib
+import threading
+import markdown
+
+from functools import lru_cache
+from whatportis.db import get_database as get_whatportis_database
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from time import sleep
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium import webdriver
+from weasyprint import HTML
 from emailfinder.extractor import *
 from dotted_dict import DottedDict
-from celery import shared_task
+from celery import shared_task, chain, chord, group
 from discord_webhook import DiscordWebhook
 from reNgine.celery import app
 from startScan.models import *
@@ -28,13 +37,15 @@ from django.conf import settings
 from django.shortcuts import get_object_or_404
 
 from celery import shared_task
-from datetime import datetime
+from datetime import datetime, timedelta
 from degoogle import degoogle
 
 from django.conf import settings
 from django.utils import timezone, dateformat
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.functions import MD5
+from django.template.loader import get_template
 
 from reNgine.celery import app
 from reNgine.definitions import *
@@ -42,7 +53,7 @@ from reNgine.settings import *
 
 from startScan.models import *
 from targetApp.models import Domain
-from scanEngine.models import EngineType, Configuration, Wordlist
+from scanEngine.models import EngineType, Configuration, Wordlist, NucleiTemplateUpdate
 
 from .common_func import *
 
@@ -59,6 +70,59 @@ def run_system_commands(system_command):
 	os.system(system_command)
 
 
+@app.task
+def refresh_interesting_flags():
+	'''
+		Recomputes is_interesting of subdomains and endpoints once the
+		interesting lookup settings have been saved
+	'''
+	update_interesting_flags()
+
+
+@app.task
+def enrich_whois(domain_names):
+	'''
+		Looks up and saves the WHOIS of a batch of targets
+	'''
+	whois_results = lookup_whois_many(domain_names)
+	save_whois_results(list(whois_results.values()))
+	logger.info('WHOIS saved for {} of {} targets'.format(
+		sum(whois['status'] for whois in whois_results.values()),
+		len(domain_names)))
+
+
+@app.task
+def import_targets_file(
+		file_path,
+		file_type,
+		import_id,
+		description=None,
+		h1_team_handle=None,
+		ip_address_cidr=None
+	):
+	'''
+		Imports a large target list uploaded by add_target, the progress is
+		reported with set_target_import_progress
+	'''
+	set_target_import_progress(import_id, status='running')
+	try:
+		with open(file_path, newline='') as target_file:
+			counts = import_targets(
+				read_target_rows(target_file, file_type),
+				description=description,
+				h1_team_handle=h1_team_handle,
+				ip_address_cidr=ip_address_cidr,
+				import_id=import_id)
+		logger.info('Imported targets: {}'.format(counts))
+		set_target_import_progress(import_id, status='completed')
+	except Exception as exception:
+		logger.error(exception)
+		set_target_import_progress(import_id, status='failed', error=str(exception))
+		raise exception
+	finally:
+		os.remove(file_path)
+
+
 @app.task
 def initiate_subtask(
 		subdomain_id,
@@ -216,6 +280,7 @@ def initiate_subtask(
 		sub_scan.stop_scan_date = timezone.now()
 		sub_scan.status = task_status
 		sub_scan.save()
+		update_scan_stats(scan_history.id)
 
 
 @app.task
@@ -262,9 +327,9 @@ def initiate_scan(
 	results_dir = '/usr/src/scan_results/'
 	os.chdir(results_dir)
 
-	notification = Notification.objects.all()
+	notification = get_notification_settings()
 
-	if notification and notification[0].send_scan_status_notif:
+	if notification and notification.send_scan_status_notif:
 		send_notification('reNgine has initiated recon for target {} with engine type {}'.format(domain.name, engine_object.engine_name))
 
 	try:
@@ -350,84 +415,123 @@ def initiate_scan(
 		results_dir,
 		activity_id)
 	update_last_activity(activity_id, 2)
+	update_scan_stats(task.id)
+
+	'''
+	Remaining stages only depend on the subdomains and alive.txt gathered
+	above, dispatch them as parallel branches and compute the final scan
+	status in the chord callback once every branch has finished
+	'''
+	branches = []
+	for stages in build_scan_graph(task):
+		branches.append(chain(*[
+			run_scan_stage.si(
+				stage,
+				task.id,
+				domain.id,
+				results_dir,
+				passive_only_flag
+			).set(task_id=get_scan_stage_task_id(task.celery_id, stage))
+			for stage in stages
+		]))
+
+	callback = finalize_scan.si(task.id, domain.id).set(
+		task_id=get_scan_stage_task_id(task.celery_id, 'finalize'))
+	# the callback is skipped when a branch fails outside of its stage, on a
+	# lost worker or a time limit for instance, the scan is then ended here
+	callback.on_error(finalize_failed_scan.si(task.id))
+	if branches:
+		chord(group(branches))(callback)
+	else:
+		callback.delay()
+	return {"status": True}
 
-	# start wafw00f
-	if(task.waf_detection):
-		try:
-			activity_id = create_scan_activity(task, "Detecting WAF", 1)
-			if passive_only_flag:
-				check_waf(task, results_dir)
-			else:
-				check_waf(task, results_dir)
-			update_last_activity(activity_id, 2)
-		except Exception as e:
-			logger.error(e)
-			update_last_activity(activity_id, 0, error_message=str(e))
 
+def build_scan_graph(task):
+	'''
+	Returns the branches of stages enabled for the scan, see SCAN_STAGE_BRANCHES
+	'''
+	branches = []
+	for branch in SCAN_STAGE_BRANCHES:
+		stages = [stage for stage in branch if getattr(task, stage)]
+		if stages:
+			branches.append(stages)
+	return branches
+
+
+def get_scan_stage_task_id(celery_id, stage):
+	return '{}-{}'.format(celery_id, stage)
+
+
+def get_scan_task_ids(celery_id):
+	'''
+	All the celery task ids belonging to a scan, used to revoke the scan
+	'''
+	task_ids = [celery_id]
+	for branch in SCAN_STAGE_BRANCHES:
+		task_ids += [get_scan_stage_task_id(celery_id, stage) for stage in branch]
+	task_ids += [
+		get_scan_stage_task_id(celery_id, NAABU_SHARD_STAGE.format(index))
+		for index in range(NAABU_MAX_SHARDS)]
+	task_ids.append(get_scan_stage_task_id(celery_id, 'finalize'))
+	return task_ids
+
+
+@app.task(bind=True)
+def run_scan_stage(self, stage, scan_history_id, domain_id, results_dir, passive_only_flag=False):
+	task = ScanHistory.objects.get(pk=scan_history_id)
+	if task.scan_status == ABORTED_TASK:
+		return {"status": False}
+
+	activity_id = None
+	sharded_port_scan = None
 	try:
-		if task.screenshot:
+		domain = Domain.objects.get(pk=domain_id)
+		yaml_configuration = yaml.load(
+			task.scan_type.yaml_configuration,
+			Loader=yaml.FullLoader)
+		# screenshots are taken relative to the scan results root
+		os.chdir('/usr/src/scan_results/')
+		current_scan_dir = task.results_dir
+
+		if stage == 'waf_detection':
+			activity_id = create_scan_activity(task, "Detecting WAF", 1)
+			check_waf(task, results_dir)
+			update_last_activity(activity_id, 2)
+		elif stage == 'screenshot':
 			activity_id = create_scan_activity(
 				task, "Visual Recon - Screenshot", 1)
-			if passive_only_flag:
-				grab_screenshot(
-					task,
-					domain,
-					yaml_configuration,
-					current_scan_dir,
-					activity_id)
-			else:
-				grab_screenshot(
-					task,
-					domain,
-					yaml_configuration,
-					current_scan_dir,
-					activity_id)
-				
+			grab_screenshot(
+				task,
+				domain,
+				yaml_configuration,
+				current_scan_dir,
+				activity_id)
 			update_last_activity(activity_id, 2)
-	except Exception as e:
-		logger.error(e)
-		update_last_activity(activity_id, 0, error_message=str(e))
-		task.error_message = str(e)
-		task.save()
-
-	try:
-		if(task.port_scan):
+		elif stage == 'port_scan':
 			activity_id = create_scan_activity(task, "Port Scanning", 1)
 			if passive_only_flag:
 				passive_port_scanning(task, activity_id, yaml_configuration, results_dir, domain)
 			else:
-				port_scanning(task, activity_id, yaml_configuration, results_dir, domain)
-			update_last_activity(activity_id, 2)
-	except Exception as e:
-		logger.error(e)
-		update_last_activity(activity_id, 0, error_message=str(e))
-		task.error_message = str(e)
-		task.save()
-
-	try:
-		if task.osint:
+				sharded_port_scan = port_scanning(task, activity_id, yaml_configuration, results_dir, domain)
+			# a sharded port scan is ended by its chord callback
+			if not sharded_port_scan:
+				update_last_activity(activity_id, 2)
+		elif stage == 'osint':
 			activity_id = create_scan_activity(task, "OSINT Running", 1)
 			perform_osint(task, domain, yaml_configuration, results_dir)
 			update_last_activity(activity_id, 2)
-	except Exception as e:
-		logger.error(e)
-		update_last_activity(activity_id, 0, error_message=str(e))
-		task.error_message = str(e)
-		task.save()
-
-
-	try:
-		if task.dir_file_fuzz:
+		elif stage == 'dir_file_fuzz':
 			activity_id = create_scan_activity(task, "Directory Search", 1)
 			if passive_only_flag:
 				passive_directory_fuzz(
-				task,
-				activity_id,
-				yaml_configuration,
-				results_dir,
-				domain=domain,
+					task,
+					activity_id,
+					yaml_configuration,
+					results_dir,
+					domain=domain,
 				)
-			else:				
+			else:
 				directory_fuzz(
 					task,
 					activity_id,
@@ -436,14 +540,7 @@ def initiate_scan(
 					domain=domain,
 				)
 			update_last_activity(activity_id, 2)
-	except Exception as e:
-		logger.error(e)
-		update_last_activity(activity_id, 0, error_message=str(e))
-		task.error_message = str(e)
-		task.save()
-
-	try:
-		if task.fetch_url:
+		elif stage == 'fetch_url':
 			activity_id = create_scan_activity(task, "Fetching endpoints", 1)
 			fetch_endpoints(
 				task,
@@ -453,14 +550,7 @@ def initiate_scan(
 				domain=domain,
 				)
 			update_last_activity(activity_id, 2)
-	except Exception as e:
-		logger.error(e)
-		update_last_activity(activity_id, 0, error_message=str(e))
-		task.error_message = str(e)
-		task.save()
-
-	try:
-		if task.vulnerability_scan:
+		elif stage == 'vulnerability_scan':
 			activity_id = create_scan_activity(task, "Vulnerability Scan", 1)
 			if passive_only_flag:
 				passive_vulnerability_scan(
@@ -479,14 +569,30 @@ def initiate_scan(
 					domain=domain,
 				)
 			update_last_activity(activity_id, 2)
+		update_scan_stats(task.id)
 	except Exception as e:
 		logger.error(e)
-		update_last_activity(activity_id, 0, error_message=str(e))
-		task.error_message = str(e)
-		task.save()
+		if activity_id:
+			update_last_activity(activity_id, 0, error_message=str(e))
+		# branches run concurrently, do not save a stale ScanHistory
+		ScanHistory.objects.filter(pk=task.id).update(error_message=str(e))
+	if sharded_port_scan:
+		# the chord takes the place of this task, which frees its worker slot
+		# while the shards run, the chord callback then ends the stage
+		return self.replace(sharded_port_scan)
+	return {"status": True}
 
-	activity_id = create_scan_activity(task, "Scan Completed", 2)
-	if notification and notification[0].send_scan_status_notif:
+
+@app.task
+def finalize_scan(scan_history_id, domain_id):
+	task = ScanHistory.objects.get(pk=scan_history_id)
+	if task.scan_status == ABORTED_TASK:
+		return {"status": False}
+	domain = Domain.objects.get(pk=domain_id)
+
+	create_scan_activity(task, "Scan Completed", 2)
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('*Scan Completed*\nreNgine has finished performing recon on target {}.'.format(domain.name))
 
 	'''
@@ -498,11 +604,35 @@ def initiate_scan(
 		task.scan_status = 2
 	task.stop_scan_date = timezone.now()
 	task.save()
+	update_scan_stats(task.id)
 	# cleanup results
 	# delete_scan_data(results_dir)
 	return {"status": True}
 
 
+@app.task
+def finalize_failed_scan(scan_history_id):
+	'''
+	Error callback of finalize_scan, marks a scan whose stages did not all
+	finish as failed along with its activities still running
+	'''
+	error_message = 'Scan stage did not finish'
+	ScanActivity.objects.filter(
+		scan_of__id=scan_history_id,
+		status=RUNNING_TASK).update(
+		status=FAILED_TASK,
+		error_message=error_message,
+		time=timezone.now())
+	# an aborted or already finished scan keeps its status
+	ScanHistory.objects.filter(
+		pk=scan_history_id,
+		scan_status=RUNNING_TASK).update(
+		scan_status=FAILED_TASK,
+		stop_scan_date=timezone.now())
+	update_scan_stats(scan_history_id)
+	return {"status": True}
+
+
 def skip_subdomain_scan(task, domain, results_dir):
 	# store default target as subdomain
 	'''
@@ -590,8 +720,8 @@ def subdomain_scan(
 	default_subdomain_tools = [tool.name.lower() for tool in InstalledExternalTool.objects.filter(is_default=True).filter(is_subdomain_gathering=True)]
 	custom_subdomain_tools = [tool.name.lower() for tool in InstalledExternalTool.objects.filter(is_default=False).filter(is_subdomain_gathering=True)]
 
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('Subdomain Gathering for target {} has been started'.format(domain.name))
 
 	subdomain_scan_results_file = results_dir + '/sorted_subdomain_collection.txt'
@@ -603,7 +733,7 @@ def subdomain_scan(
 		# also put all custom subdomain tools
 		custom_tools = ' '.join(tool for tool in custom_subdomain_tools)
 		if custom_tools:
-			tools = tools + ' ' + custom_subdomain_tools
+			tools = tools + ' ' + custom_tools
 	else:
 		tools = ' '.join(
 			str(tool).lower() for tool in yaml_configuration[SUBDOMAIN_DISCOVERY][USES_TOOLS])
@@ -620,110 +750,53 @@ def subdomain_scan(
 			threads = _threads
 
 
-	try:
-		for tool in tools.split(' '):
-			# fixing amass-passive and amass-active
-			if tool in tools:
-				if tool == 'amass-passive':
-					amass_command = 'amass enum -passive -d {} -o {}/from_amass.txt'.format(
-							domain.name, results_dir)
-
-					if USE_AMASS_CONFIG in yaml_configuration[SUBDOMAIN_DISCOVERY] and yaml_configuration[SUBDOMAIN_DISCOVERY][USE_AMASS_CONFIG]:
-						amass_command += ' -config /root/.config/amass.ini'
-					# Run Amass Passive
-					logging.info(amass_command)
-					process = subprocess.Popen(amass_command.split())
-					process.wait()
-
-				elif tool == 'amass-active':
-					amass_command = 'amass enum -active -d {} -o {}/from_amass_active.txt'.format(
-							domain.name, results_dir)
-
-					if USE_AMASS_CONFIG in yaml_configuration[SUBDOMAIN_DISCOVERY] and yaml_configuration[SUBDOMAIN_DISCOVERY][USE_AMASS_CONFIG]:
-						amass_command += ' -config /root/.config/amass.ini'
-
-					if AMASS_WORDLIST in yaml_configuration[SUBDOMAIN_DISCOVERY]:
-						wordlist = yaml_configuration[SUBDOMAIN_DISCOVERY][AMASS_WORDLIST]
-						if wordlist == 'default':
-							wordlist_path = '/usr/src/wordlist/best-dns-wordlist.txt'
-						else:
-							wordlist_path = '/usr/src/wordlist/' + wordlist + '.txt'
-							if not os.path.exists(wordlist_path):
-								wordlist_path = '/usr/src/' + AMASS_WORDLIST
-						amass_command = amass_command + \
-							' -brute -w {}'.format(wordlist_path)
-
-					# Run Amass Active
-					logging.info(amass_command)
-					process = subprocess.Popen(amass_command.split())
-					process.wait()
-
-				elif tool == 'assetfinder':
-					assetfinder_command = 'assetfinder --subs-only {} > {}/from_assetfinder.txt'.format(
-						domain.name, results_dir)
-
-					# Run Assetfinder
-					logging.info(assetfinder_command)
-					process = subprocess.Popen(assetfinder_command.split())
-					process.wait()
-
-				elif tool == 'sublist3r':
-					sublist3r_command = 'python3 /usr/src/github/Sublist3r/sublist3r.py -d {} -t {} -o {}/from_sublister.txt'.format(
-						domain.name, threads, results_dir)
-
-					# Run sublist3r
-					logging.info(sublist3r_command)
-					process = subprocess.Popen(sublist3r_command.split())
-					process.wait()
-
-				elif tool == 'subfinder':
-					subfinder_command = 'subfinder -d {} -t {} -o {}/from_subfinder.txt'.format(
-						domain.name, threads, results_dir)
-
-					if USE_SUBFINDER_CONFIG in yaml_configuration[SUBDOMAIN_DISCOVERY] and yaml_configuration[SUBDOMAIN_DISCOVERY][USE_SUBFINDER_CONFIG]:
-						subfinder_command += ' -config /root/.config/subfinder/config.yaml'
-
-					# Run Subfinder
-					logging.info(subfinder_command)
-					process = subprocess.Popen(subfinder_command.split())
-					process.wait()
-
-				elif tool == 'oneforall':
-					oneforall_command = 'python3 /usr/src/github/OneForAll/oneforall.py --target {} run'.format(
-						domain.name, results_dir)
-
-					# Run OneForAll
-					logging.info(oneforall_command)
-					process = subprocess.Popen(oneforall_command.split())
-					process.wait()
-
-					extract_subdomain = "cut -d',' -f6 /usr/src/github/OneForAll/results/{}.csv >> {}/from_oneforall.txt".format(
-						domain.name, results_dir)
-
-					os.system(extract_subdomain)
-
-					# remove the results from oneforall directory
-					os.system(
-						'rm -rf /usr/src/github/OneForAll/results/{}.*'.format(domain.name))
-
-			elif tool.lower() in custom_subdomain_tools:
-				# this is for all the custom tools, and tools runs based on instalaltion steps provided
-				if InstalledExternalTool.objects.filter(name__icontains=tool.lower()).exists():
-					custom_tool = InstalledExternalTool.objects.get(name__icontains=tool)
-					execution_command = custom_tool.subdomain_gathering_command
-					print(execution_command)
-					# replace syntax with actual commands and path
-					if '{TARGET}' in execution_command and '{OUTPUT}' in execution_command:
-						execution_command = execution_command.replace('{TARGET}', domain.name)
-						execution_command = execution_command.replace('{OUTPUT}', '{}/from_{}.txt'.format(results_dir, tool))
-						execution_command = execution_command.replace('{PATH}', custom_tool.github_clone_path) if '{PATH}' in execution_command else execution_command
-						logger.info('Custom tool {} running with command {}'.format(tool, execution_command))
-						process = subprocess.Popen(execution_command.split())
-						process.wait()
-					else:
-						logger.error('Sorry can not run this tool! because TARGET and OUTPUT are not available!')
-	except Exception as e:
-		logger.error(e)
+	# check for tool concurrency and per tool timeout
+	concurrency = DEFAULT_SUBDOMAIN_TOOL_CONCURRENCY
+	if TOOL_CONCURRENCY in yaml_configuration[SUBDOMAIN_DISCOVERY]:
+		_concurrency = yaml_configuration[SUBDOMAIN_DISCOVERY][TOOL_CONCURRENCY]
+		if _concurrency > 0:
+			concurrency = _concurrency
+
+	tool_timeout = yaml_configuration[SUBDOMAIN_DISCOVERY].get(TOOL_TIMEOUT)
+
+	tool_commands = []
+	for tool in tools.split(' '):
+		try:
+			command = get_subdomain_tool_command(
+				tool,
+				domain,
+				yaml_configuration,
+				results_dir,
+				threads,
+				custom_subdomain_tools)
+		except Exception as e:
+			logger.error(e)
+			continue
+		if command:
+			if isinstance(tool_timeout, dict):
+				timeout = tool_timeout.get(tool, tool_timeout.get('default'))
+			else:
+				timeout = tool_timeout
+			tool_commands.append((tool, command, timeout))
+
+	# all the tools are network bound and independent of each other
+	tool_stats = []
+	with ThreadPoolExecutor(max_workers=concurrency) as executor:
+		futures = [
+			executor.submit(run_subdomain_tool, tool, command, results_dir, domain, timeout)
+			for tool, command, timeout in tool_commands
+		]
+		for future in as_completed(futures):
+			try:
+				stats = future.result()
+			except Exception as e:
+				logger.error(e)
+				continue
+			logger.info('Subdomain tool {tool} finished with status {status} in {runtime}s, {subdomain_count} subdomains'.format(**stats))
+			tool_stats.append(stats)
+
+	with open(results_dir + '/subdomain_tools_stats.json', 'w') as stats_file:
+		json.dump(tool_stats, stats_file, indent=2)
 
 	'''
 	All tools have gathered the list of subdomains with filename
@@ -800,15 +873,15 @@ def subdomain_scan(
 				})
 				save_subdomain(subdomain_dict)
 
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		subdomains_count = Subdomain.objects.filter(scan_history=task).count()
 		send_notification('Subdomain Gathering for target {} has been completed and has discovered *{}* subdomains.'.format(domain.name, subdomains_count))
-	if notification and notification[0].send_scan_output_file:
+	if notification and notification.send_scan_output_file:
 		send_files_to_discord(results_dir + '/sorted_subdomain_collection.txt')
 
 	# check for any subdomain changes and send notif if any
-	if notification and notification[0].send_subdomain_changes_notif:
+	if notification and notification.send_subdomain_changes_notif:
 		newly_added_subdomain = get_new_added_subdomain(task.id, domain.id)
 		if newly_added_subdomain:
 			message = "**{} New Subdomains Discovered on domain {}**".format(newly_added_subdomain.count(), domain.name)
@@ -824,7 +897,7 @@ def subdomain_scan(
 			send_notification(message)
 
 	# check for interesting subdomains and send notif if any
-	if notification and notification[0].send_interesting_notif:
+	if notification and notification.send_interesting_notif:
 		interesting_subdomain = get_interesting_subdomains(task.id, domain.id)
 		print(interesting_subdomain)
 		if interesting_subdomain:
@@ -834,6 +907,132 @@ def subdomain_scan(
 			send_notification(message)
 
 
+def get_subdomain_tool_command(
+		tool,
+		domain,
+		yaml_configuration,
+		results_dir,
+		threads,
+		custom_subdomain_tools
+	):
+	'''
+	Returns the command for a subdomain gathering tool, results are written
+	into {results_dir}/from_{tool}.txt like files, None if the tool can not run
+	'''
+	if tool == 'amass-passive':
+		amass_command = 'amass enum -passive -d {} -o {}/from_amass.txt'.format(
+				domain.name, results_dir)
+
+		if USE_AMASS_CONFIG in yaml_configuration[SUBDOMAIN_DISCOVERY] and yaml_configuration[SUBDOMAIN_DISCOVERY][USE_AMASS_CONFIG]:
+			amass_command += ' -config /root/.config/amass.ini'
+		return amass_command
+
+	elif tool == 'amass-active':
+		amass_command = 'amass enum -active -d {} -o {}/from_amass_active.txt'.format(
+				domain.name, results_dir)
+
+		if USE_AMASS_CONFIG in yaml_configuration[SUBDOMAIN_DISCOVERY] and yaml_configuration[SUBDOMAIN_DISCOVERY][USE_AMASS_CONFIG]:
+			amass_command += ' -config /root/.config/amass.ini'
+
+		if AMASS_WORDLIST in yaml_configuration[SUBDOMAIN_DISCOVERY]:
+			wordlist = yaml_configuration[SUBDOMAIN_DISCOVERY][AMASS_WORDLIST]
+			if wordlist == 'default':
+				wordlist_path = '/usr/src/wordlist/best-dns-wordlist.txt'
+			else:
+				wordlist_path = '/usr/src/wordlist/' + wordlist + '.txt'
+				if not os.path.exists(wordlist_path):
+					wordlist_path = '/usr/src/' + AMASS_WORDLIST
+			amass_command = amass_command + \
+				' -brute -w {}'.format(wordlist_path)
+		return amass_command
+
+	elif tool == 'assetfinder':
+		# assetfinder writes to stdout, redirected by run_subdomain_tool
+		return 'assetfinder --subs-only {}'.format(domain.name)
+
+	elif tool == 'sublist3r':
+		return 'python3 /usr/src/github/Sublist3r/sublist3r.py -d {} -t {} -o {}/from_sublister.txt'.format(
+			domain.name, threads, results_dir)
+
+	elif tool == 'subfinder':
+		subfinder_command = 'subfinder -d {} -t {} -o {}/from_subfinder.txt'.format(
+			domain.name, threads, results_dir)
+
+		if USE_SUBFINDER_CONFIG in yaml_configuration[SUBDOMAIN_DISCOVERY] and yaml_configuration[SUBDOMAIN_DISCOVERY][USE_SUBFINDER_CONFIG]:
+			subfinder_command += ' -config /root/.config/subfinder/config.yaml'
+		return subfinder_command
+
+	elif tool == 'oneforall':
+		return 'python3 /usr/src/github/OneForAll/oneforall.py --target {} run'.format(
+			domain.name)
+
+	elif tool.lower() in custom_subdomain_tools:
+		# this is for all the custom tools, and tools runs based on instalaltion steps provided
+		if InstalledExternalTool.objects.filter(name__icontains=tool.lower()).exists():
+			custom_tool = InstalledExternalTool.objects.get(name__icontains=tool)
+			execution_command = custom_tool.subdomain_gathering_command
+			# replace syntax with actual commands and path
+			if '{TARGET}' in execution_command and '{OUTPUT}' in execution_command:
+				execution_command = execution_command.replace('{TARGET}', domain.name)
+				execution_command = execution_command.replace('{OUTPUT}', '{}/from_{}.txt'.format(results_dir, tool))
+				execution_command = execution_command.replace('{PATH}', custom_tool.github_clone_path) if '{PATH}' in execution_command else execution_command
+				logger.info('Custom tool {} running with command {}'.format(tool, execution_command))
+				return execution_command
+			else:
+				logger.error('Sorry can not run this tool! because TARGET and OUTPUT are not available!')
+
+	return None
+
+
+def run_subdomain_tool(tool, command, results_dir, domain, timeout=None):
+	'''
+	Runs a single subdomain gathering tool, killing it once timeout seconds
+	have passed. Whatever the tool has written until then is kept.
+	Returns runtime and number of subdomains found by the tool.
+	'''
+	output_file = '{}/{}'.format(
+		results_dir,
+		SUBDOMAIN_TOOL_OUTPUT_FILES.get(tool, 'from_{}.txt'.format(tool)))
+	logger.info(command)
+	status = 'success'
+	start_time = time.time()
+	stdout = open(output_file, 'w') if tool == 'assetfinder' else None
+	try:
+		process = subprocess.Popen(command.split(), stdout=stdout)
+		try:
+			process.wait(timeout=timeout)
+		except subprocess.TimeoutExpired:
+			logger.error('Subdomain tool {} timed out after {}s'.format(tool, timeout))
+			process.kill()
+			process.wait()
+			status = 'timeout'
+	finally:
+		if stdout:
+			stdout.close()
+
+	if tool == 'oneforall':
+		extract_subdomain = "cut -d',' -f6 /usr/src/github/OneForAll/results/{}.csv >> {}/from_oneforall.txt".format(
+			domain.name, results_dir)
+
+		os.system(extract_subdomain)
+
+		# remove the results from oneforall directory
+		os.system(
+			'rm -rf /usr/src/github/OneForAll/results/{}.*'.format(domain.name))
+
+	subdomain_count = 0
+	if os.path.isfile(output_file):
+		with open(output_file) as output:
+			subdomain_count = sum(1 for line in output if line.strip())
+
+	return {
+		'tool': tool,
+		'status': status,
+		'runtime': round(time.time() - start_time, 2),
+		'subdomain_count': subdomain_count,
+	}
+
+
 def get_new_added_subdomain(scan_id, domain_id):
 	scan_history = ScanHistory.objects.filter(
 		domain=domain_id).filter(
@@ -876,8 +1075,8 @@ def http_crawler(task, domain, yaml_configuration, results_dir, activity_id, thr
 	like page title, http status, etc
 	HTTP Crawler runs by default
 	'''
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('HTTP Crawler for target {} has been initiated.'.format(domain.name))
 
 	alive_file_location = results_dir + '/alive.txt'
@@ -886,7 +1085,7 @@ def http_crawler(task, domain, yaml_configuration, results_dir, activity_id, thr
 	subdomain_scan_results_file = results_dir + '/sorted_subdomain_collection.txt'
 	httpx_command = '/go/bin/httpx -status-code -content-length -title -tech-detect -cdn -ip -follow-host-redirects -random-agent -t {}'.format(threads)
 
-	proxy = get_random_proxy()
+	proxy = lease_proxy()
 
 	if proxy:
 		httpx_command += " --http-proxy {} ".format(proxy)
@@ -898,127 +1097,34 @@ def http_crawler(task, domain, yaml_configuration, results_dir, activity_id, thr
 		httpx_results_file,
 		subdomain_scan_results_file
 	)
-	logger.info(httpx_command)
-	os.system(remove_cmd_injection_chars(httpx_command))
+	batch_size = DEFAULT_INGEST_BATCH_SIZE
+	if HTTP_CRAWLER in yaml_configuration and yaml_configuration[HTTP_CRAWLER] \
+		and BATCH_SIZE in yaml_configuration[HTTP_CRAWLER]:
+		batch_size = int(yaml_configuration[HTTP_CRAWLER][BATCH_SIZE])
+
+	subdomain_map = {
+		subdomain.name: subdomain
+		for subdomain in Subdomain.objects.filter(scan_history=task)
+	}
 
 	# alive subdomains from httpx
 	alive_file = open(alive_file_location, 'w')
 
-	# writing httpx results
-	if os.path.isfile(httpx_results_file):
-		httpx_json_result = open(httpx_results_file, 'r')
-		lines = httpx_json_result.readlines()
-		for line in lines:
-			json_st = json.loads(line.strip())
-			try:
-				# fallback for older versions of httpx
-				if 'url' in json_st:
-					subdomain = Subdomain.objects.get(
-					scan_history=task, name=json_st['input'])
-				else:
-					subdomain = Subdomain.objects.get(
-						scan_history=task, name=json_st['url'].split("//")[-1])
-				'''
-				Saving Default http urls to EndPoint
-				'''
-				endpoint = EndPoint()
-				endpoint.scan_history = task
-				endpoint.target_domain = domain
-				endpoint.subdomain = subdomain
-				if 'url' in json_st:
-					endpoint.http_url = json_st['url']
-					subdomain.http_url = json_st['url']
-				if 'status_code' in json_st:
-					endpoint.http_status = json_st['status_code']
-					subdomain.http_status = json_st['status_code']
-				if 'title' in json_st:
-					endpoint.page_title = json_st['title']
-					subdomain.page_title = json_st['title']
-				if 'content_length' in json_st:
-					endpoint.content_length = json_st['content_length']
-					subdomain.content_length = json_st['content_length']
-				if 'content_type' in json_st:
-					endpoint.content_type = json_st['content_type']
-					subdomain.content_type = json_st['content_type']
-				if 'webserver' in json_st:
-					endpoint.webserver = json_st['webserver']
-					subdomain.webserver = json_st['webserver']
-				if 'time' in json_st:
-					response_time = float(
-						''.join(
-							ch for ch in json_st['time'] if not ch.isalpha()))
-					if json_st['time'][-2:] == 'ms':
-						response_time = response_time / 1000
-					endpoint.response_time = response_time
-					subdomain.response_time = response_time
-				if 'cnames' in json_st:
-					cname_list = ','.join(json_st['cnames'])
-					subdomain.cname = cname_list
-				discovered_date = timezone.now()
-				endpoint.discovered_date = discovered_date
-				subdomain.discovered_date = discovered_date
-				endpoint.is_default = True
-				endpoint.save()
-				subdomain.save()
-				if 'tech' in json_st:
-					for _tech in json_st['tech']:
-						if Technology.objects.filter(name=_tech).exists():
-							tech = Technology.objects.get(name=_tech)
-						else:
-							tech = Technology(name=_tech)
-							tech.save()
-						subdomain.technologies.add(tech)
-						endpoint.technologies.add(tech)
-				if 'a' in json_st:
-					for _ip in json_st['a']:
-						if IpAddress.objects.filter(address=_ip).exists():
-							ip = IpAddress.objects.get(address=_ip)
-						else:
-							ip = IpAddress(address=_ip)
-							if 'cdn' in json_st:
-								ip.is_cdn = json_st['cdn']
-						# add geo iso
-						subprocess_output = subprocess.getoutput(['geoiplookup {}'.format(_ip)])
-						if 'IP Address not found' not in subprocess_output and "can't resolve hostname" not in subprocess_output:
-							country_iso = subprocess_output.split(':')[1].strip().split(',')[0]
-							country_name = subprocess_output.split(':')[1].strip().split(',')[1].strip()
-							iso_object, _ = CountryISO.objects.get_or_create(
-								iso=country_iso,
-								name=country_name
-							)
-							ip.geo_iso = iso_object
-						ip.save()
-						subdomain.ip_addresses.add(ip)
-				if 'host' in json_st:
-					_ip = json_st['host']
-					if IpAddress.objects.filter(address=_ip).exists():
-						ip = IpAddress.objects.get(address=_ip)
-					else:
-						ip = IpAddress(address=_ip)
-						if 'cdn' in json_st:
-							ip.is_cdn = json_st['cdn']
-					# add geo iso
-					subprocess_output = subprocess.getoutput(['geoiplookup {}'.format(_ip)])
-					if 'IP Address not found' not in subprocess_output and "can't resolve hostname" not in subprocess_output:
-						country_iso = subprocess_output.split(':')[1].strip().split(',')[0]
-						country_name = subprocess_output.split(':')[1].strip().split(',')[1].strip()
-						iso_object, _ = CountryISO.objects.get_or_create(
-							iso=country_iso,
-							name=country_name
-						)
-						ip.geo_iso = iso_object
-					ip.save()
-				if 'status_code' in json_st:
-					sts_code = json_st.get('status_code')
-					if str(sts_code).isdigit() and int(sts_code) < 400:
-						alive_file.write(json_st['url'] + '\n')
-				subdomain.save()
-				endpoint.save()
-			except Exception as exception:
-				logging.error(exception)
-	alive_file.close()
+	# writing httpx results as httpx finds them
+	logger.info(httpx_command)
+	alive_count = 0
+	try:
+		for results in stream_command_json(remove_cmd_injection_chars(httpx_command), batch_size):
+			for url in save_httpx_results(task, domain, results, subdomain_map):
+				alive_file.write(url + '\n')
+				alive_count += 1
+			alive_file.flush()
+	finally:
+		alive_file.close()
+		# a proxy letting no subdomain through is most likely dead
+		release_proxy(proxy, success=alive_count > 0)
 
-	if notification and notification[0].send_scan_status_notif:
+	if notification and notification.send_scan_status_notif:
 		alive_count = Subdomain.objects.filter(
 			scan_history__id=task.id).values('name').distinct().filter(
 			http_status__exact=200).count()
@@ -1029,8 +1135,8 @@ def grab_screenshot(task, domain, yaml_configuration, results_dir, activity_id):
 	'''
 	This function is responsible for taking screenshots
 	'''
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('reNgine is currently gathering screenshots for {}'.format(domain.name))
 
 	output_screenshots_path = results_dir + '/screenshots'
@@ -1089,7 +1195,7 @@ def grab_screenshot(task, domain, yaml_configuration, results_dir, activity_id):
 		output_screenshots_path,
 	))
 
-	if notification and notification[0].send_scan_status_notif:
+	if notification and notification.send_scan_status_notif:
 		send_notification('reNgine has finished gathering screenshots for {}'.format(domain.name))
 
 
@@ -1103,33 +1209,21 @@ def port_scanning(
 		file_name=None,
 		subscan=None
 	):
-	# Random sleep to prevent ip and port being overwritten
-	sleep(randint(1,5))
 	'''
 	This function is responsible for running the port scan
+	A sharded port scan is not run here, its chord is returned and must
+	replace the calling task, see get_sharded_port_scan
 	'''
 	output_file_name = file_name if file_name else 'ports.json'
 	port_results_file = results_dir + '/' + output_file_name
 
 	domain_name = domain.name if domain else subdomain
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('Port Scan initiated for {}'.format(domain_name))
 
-	if domain:
-		subdomain_scan_results_file = results_dir + '/sorted_subdomain_collection.txt'
-		naabu_command = 'naabu -list {} -json -o {}'.format(
-			subdomain_scan_results_file,
-			port_results_file
-		)
-	elif subdomain:
-		naabu_command = 'naabu -host {} -o {} -json '.format(
-			subdomain,
-			port_results_file
-		)
-
 	# exclude cdn port scanning
-	naabu_command += ' -exclude-cdn '
+	naabu_options = ' -exclude-cdn '
 
 	# check the yaml_configuration and choose the ports to be scanned
 	scan_ports = '-'  # default port scan everything
@@ -1137,104 +1231,298 @@ def port_scanning(
 		# TODO:  legacy code, remove top-100 in future versions
 		all_ports = yaml_configuration[PORT_SCAN][PORTS]
 		if 'full' in all_ports:
-			naabu_command += ' -p -'
+			naabu_options += ' -p -'
 		elif 'top-100' in all_ports:
-			naabu_command += ' -top-ports 100 '
+			naabu_options += ' -top-ports 100 '
 		elif 'top-1000' in all_ports:
-			naabu_command += ' -top-ports 1000 '
+			naabu_options += ' -top-ports 1000 '
 		else:
 			scan_ports = ','.join(
 				str(port) for port in all_ports)
-			naabu_command += ' -p {} '.format(scan_ports)
+			naabu_options += ' -p {} '.format(scan_ports)
 
 	# check for exclude ports
 	if EXCLUDE_PORTS in yaml_configuration[PORT_SCAN] and yaml_configuration[PORT_SCAN][EXCLUDE_PORTS]:
 		exclude_ports = ','.join(
 			str(port) for port in yaml_configuration['port_scan']['exclude_ports'])
-		naabu_command = naabu_command + \
+		naabu_options = naabu_options + \
 			' -exclude-ports {} '.format(exclude_ports)
 
 	if NAABU_RATE in yaml_configuration[PORT_SCAN] and yaml_configuration[PORT_SCAN][NAABU_RATE] > 0:
-		naabu_command = naabu_command + \
+		naabu_options = naabu_options + \
 			' -rate {} '.format(
 				yaml_configuration[PORT_SCAN][NAABU_RATE])
 			#new format for naabu config
 	if USE_NAABU_CONFIG in yaml_configuration[PORT_SCAN] and yaml_configuration[PORT_SCAN][USE_NAABU_CONFIG]:
-		naabu_command += ' -config /root/.config/naabu/config.yaml '
+		naabu_options += ' -config /root/.config/naabu/config.yaml '
 
 	proxy = get_random_proxy()
 	if proxy:
-		naabu_command += ' -proxy "{}" '.format(proxy)
-
-	# run naabu
-	logger.info(naabu_command)
-	process = subprocess.Popen(naabu_command.split())
-	process.wait()
+		naabu_options += ' -proxy "{}" '.format(proxy)
 
-	# writing port results
+	shards = min(yaml_configuration[PORT_SCAN].get(NAABU_SHARDS, 1), NAABU_MAX_SHARDS)
 	try:
-		port_json_result = open(port_results_file, 'r')
-		lines = port_json_result.readlines()
-		for line in lines:
-			json_st = json.loads(line.strip())
-			port_number = json_st['port']
-			ip_address = json_st['ip']
-			host = json_st['host']
-
-			# see if port already exists
-			if Port.objects.filter(number__exact=port_number).exists():
-				port = Port.objects.get(number=port_number)
-			else:
-				port = Port()
-				port.number = port_number
-
-				if port_number in UNCOMMON_WEB_PORTS:
-					port.is_uncommon = True
-				port_detail = whatportis.get_ports(str(port_number))
-
-				if len(port_detail):
-					port.service_name = port_detail[0].name
-					port.description = port_detail[0].description
-
-				port.save()
-
-			if IpAddress.objects.filter(address=ip_address).exists():
-				ip = IpAddress.objects.get(address=ip_address)
-			else:
-				# create a new ip
-				ip = IpAddress()
-				ip.address = ip_address
-				ip.save()
-			ip.ports.add(port)
-			ip.save()
-
-			if subscan:
-				ip.ip_subscan_ids.add(subscan)
-				ip.save()
-
-			# if this ip does not belong to host, we also need to add to specific host
-			if not Subdomain.objects.filter(name=host, scan_history=scan_history, ip_addresses__address=ip_address).exists():
-				subdomain = Subdomain.objects.get(scan_history=scan_history, name=host)
-				subdomain.ip_addresses.add(ip)
-				subdomain.save()
-
+		if domain and shards > 1:
+			subdomain_scan_results_file = results_dir + '/sorted_subdomain_collection.txt'
+			sharded_port_scan = get_sharded_port_scan(
+				scan_history,
+				activity_id,
+				results_dir,
+				subdomain_scan_results_file,
+				port_results_file,
+				naabu_options,
+				shards,
+				domain_name)
+			if sharded_port_scan:
+				return sharded_port_scan
+		else:
+			if domain:
+				subdomain_scan_results_file = results_dir + '/sorted_subdomain_collection.txt'
+				naabu_command = 'naabu -list {} -json -o {}'.format(
+					subdomain_scan_results_file,
+					port_results_file
+				)
+			elif subdomain:
+				naabu_command = 'naabu -host {} -o {} -json '.format(
+					subdomain,
+					port_results_file
+				)
+			run_naabu(naabu_command + naabu_options, scan_history, subscan)
 	except BaseException as exception:
 		logging.error(exception)
 		if not subscan:
 			update_last_activity(activity_id, 0)
 		raise Exception(exception)
 
-	if notification and notification[0].send_scan_status_notif:
+	port_scan_completed(scan_history, results_dir, domain_name)
+
+
+def port_scan_completed(scan_history, results_dir, domain_name):
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		port_count = Port.objects.filter(
 			ports__in=IpAddress.objects.filter(
 				ip_addresses__in=Subdomain.objects.filter(
 					scan_history__id=scan_history.id))).distinct().count()
 		send_notification('reNgine has finished Port Scanning on {} and has identified {} ports.'.format(domain_name, port_count))
 
-	if notification and notification[0].send_scan_output_file:
+	if notification and notification.send_scan_output_file:
 		send_files_to_discord(results_dir + '/ports.json')
 
 
+def run_naabu(naabu_command, scan_history, subscan=None):
+	# run naabu, writing port results as naabu finds them
+	logger.info(naabu_command)
+	seen_triples = set()
+	for results in stream_command_json(remove_cmd_injection_chars(naabu_command)):
+		triples = set(
+			(json_st.get('host'), json_st['ip'], json_st['port'])
+			for json_st in results
+			if 'ip' in json_st and 'port' in json_st)
+		save_ip_port_triples(scan_history, triples - seen_triples, subscan)
+		seen_triples |= triples
+
+
+@app.task
+def run_naabu_shard(naabu_command, scan_history_id):
+	'''
+	Scans one shard of a sharded port scan, errors are returned rather than
+	raised so that the chord callback still runs
+	'''
+	scan_history = ScanHistory.objects.get(pk=scan_history_id)
+	if scan_history.scan_status == ABORTED_TASK:
+		return {"status": False}
+	try:
+		run_naabu(naabu_command, scan_history)
+	except Exception as exception:
+		logger.error(exception)
+		return {"status": False, "error": str(exception)}
+	return {"status": True}
+
+
+def get_sharded_port_scan(
+		scan_history,
+		activity_id,
+		results_dir,
+		hosts_file,
+		port_results_file,
+		naabu_options,
+		shards,
+		domain_name):
+	'''
+	Splits the host list in shards chunks, each scanned by its own naabu
+	process in a Celery group so that the chunks spread across workers.
+	Every chunk has its own host and output files. Returns the chord of the
+	chunks and finish_sharded_port_scan, which merges the outputs into
+	port_results_file and ends the stage, or None if there is no host.
+	'''
+	with open(hosts_file) as f:
+		hosts = [host.strip() for host in f if host.strip()]
+	if not hosts:
+		return None
+	chunk_size = -(-len(hosts) // shards)
+	output_base, output_extension = os.path.splitext(port_results_file)
+
+	shard_files = []
+	naabu_commands = []
+	for index, offset in enumerate(range(0, len(hosts), chunk_size)):
+		shard_hosts_file = '{}_hosts_{}.txt'.format(output_base, index)
+		shard_output_file = '{}_{}{}'.format(output_base, index, output_extension)
+		with open(shard_hosts_file, 'w') as f:
+			f.write('\n'.join(hosts[offset:offset + chunk_size]) + '\n')
+		shard_files.append((shard_hosts_file, shard_output_file))
+		naabu_commands.append('naabu -list {} -json -o {}'.format(
+			shard_hosts_file,
+			shard_output_file) + naabu_options)
+
+	logger.info('Running naabu on {} hosts in {} shards'.format(len(hosts), len(naabu_commands)))
+	# shard task ids are fixed so that aborting the scan revokes them
+	return chord(
+		group(
+			run_naabu_shard.si(naabu_command, scan_history.id).set(
+				task_id=get_scan_stage_task_id(
+					scan_history.celery_id,
+					NAABU_SHARD_STAGE.format(index)))
+			for index, naabu_command in enumerate(naabu_commands)),
+		finish_sharded_port_scan.s(
+			scan_history.id,
+			activity_id,
+			results_dir,
+			port_results_file,
+			shard_files,
+			domain_name))
+
+
+@app.task
+def finish_sharded_port_scan(
+		shard_results,
+		scan_history_id,
+		activity_id,
+		results_dir,
+		port_results_file,
+		shard_files,
+		domain_name):
+	'''
+	Chord callback of a sharded port scan, merges the outputs of the shards
+	into port_results_file and ends the port scan stage
+	'''
+	with open(port_results_file, 'w') as output_file:
+		for shard_hosts_file, shard_output_file in shard_files:
+			if os.path.isfile(shard_output_file):
+				with open(shard_output_file) as shard_output:
+					shutil.copyfileobj(shard_output, output_file)
+				os.remove(shard_output_file)
+			if os.path.isfile(shard_hosts_file):
+				os.remove(shard_hosts_file)
+
+	scan_history = ScanHistory.objects.get(pk=scan_history_id)
+	if scan_history.scan_status == ABORTED_TASK:
+		return {"status": False}
+
+	errors = [result['error'] for result in shard_results if result.get('error')]
+	if errors:
+		error_message = 'Port scan failed on {} of {} shards: {}'.format(
+			len(errors),
+			len(shard_results),
+			errors[0])
+		logger.error(error_message)
+		update_last_activity(activity_id, 0, error_message=error_message)
+		# branches run concurrently, do not save a stale ScanHistory
+		ScanHistory.objects.filter(pk=scan_history_id).update(error_message=error_message)
+	else:
+		port_scan_completed(scan_history, results_dir, domain_name)
+		update_last_activity(activity_id, 2)
+	update_scan_stats(scan_history_id)
+	return {"status": True}
+
+
+@lru_cache(maxsize=1)
+def get_port_services():
+	'''
+	Loads the whatportis service table once, returns a
+	{port number: (service name, description)} dict
+	'''
+	services = {}
+	try:
+		for service in get_whatportis_database().all():
+			if str(service.get('port')).isdigit():
+				services.setdefault(
+					int(service['port']),
+					(service.get('name'), service.get('description')))
+	except Exception as exception:
+		logger.error('Unable to load whatportis database: {}'.format(exception))
+	return services
+
+
+def build_port(port_number):
+	port = Port(number=port_number)
+	if port_number in UNCOMMON_WEB_PORTS:
+		port.is_uncommon = True
+	service = get_port_services().get(int(port_number))
+	if service:
+		port.service_name, port.description = service
+	return port
+
+
+def save_ip_port_triples(scan_history, triples, subscan=None):
+	'''
+	Persists (host, ip, port) triples found by naabu or smap: Port and
+	IpAddress are upserted in bulk, then the ip/port, ip/subscan and
+	subdomain/ip m2m rows inserted in bulk. Hosts that are not subdomains
+	of the scan are ignored.
+	'''
+	triples = set(triples)
+	if not triples:
+		return
+
+	ports = bulk_get_or_create(
+		Port,
+		'number',
+		[port for _, _, port in triples],
+		build=build_port)
+	ip_addresses = bulk_get_or_create(
+		IpAddress,
+		'address',
+		[ip for _, ip, _ in triples])
+	subdomains = dict(
+		Subdomain.objects.filter(
+			scan_history=scan_history,
+			name__in=set(host for host, _, _ in triples)).values_list('name', 'id'))
+
+	IpAddressPort = IpAddress.ports.through
+	IpAddressPort.objects.bulk_create(
+		[
+			IpAddressPort(
+				ipaddress_id=ip_addresses[ip].id,
+				port_id=ports[port].id)
+			for ip, port in set((ip, port) for _, ip, port in triples)
+			if ip in ip_addresses and port in ports
+		],
+		ignore_conflicts=True)
+
+	if subscan:
+		IpAddressSubScan = IpAddress.ip_subscan_ids.through
+		IpAddressSubScan.objects.bulk_create(
+			[
+				IpAddressSubScan(
+					ipaddress_id=ip_address.id,
+					subscan_id=subscan.id)
+				for ip_address in ip_addresses.values()
+			],
+			ignore_conflicts=True)
+
+	SubdomainIpAddress = Subdomain.ip_addresses.through
+	SubdomainIpAddress.objects.bulk_create(
+		[
+			SubdomainIpAddress(
+				subdomain_id=subdomains[host],
+				ipaddress_id=ip_addresses[ip].id)
+			for host, ip in set((host, ip) for host, ip, _ in triples)
+			if host in subdomains and ip in ip_addresses
+		],
+		ignore_conflicts=True)
+
+
 def check_waf(scan_history, results_dir):
 	'''
 	This function will check for the WAF being used in subdomains using wafw00f
@@ -1317,8 +1605,8 @@ def directory_fuzz(
 
 	domain_name = domain.name if domain else subdomain
 
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('Directory Bruteforce has been initiated for {}.'.format(domain_name))
 
 	# get wordlist
@@ -1335,6 +1623,15 @@ def directory_fuzz(
 	if domain:
 		subdomains_fuzz = Subdomain.objects.filter(
 			scan_history__id=scan_history.id).exclude(http_url__isnull=True)
+		# the DirectoryScan of a host is linked to its subdomain once its
+		# results are saved, hosts fuzzed by an interrupted run of this
+		# stage are skipped so that a new run resumes with the others
+		completed_count = subdomains_fuzz.filter(
+			directories__isnull=False).distinct().count()
+		subdomains_fuzz = subdomains_fuzz.exclude(directories__isnull=False)
+		if completed_count:
+			logger.info('Resuming directory fuzz, {} hosts already completed'.format(
+				completed_count))
 	else:
 		subdomains_fuzz = Subdomain.objects.filter(
 			name=subdomain).filter(
@@ -1421,95 +1718,134 @@ def directory_fuzz(
 	if CUSTOM_HEADER in yaml_configuration and yaml_configuration[CUSTOM_HEADER]:
 		ffuf_command += ' -H "{}"'.format(yaml_configuration[CUSTOM_HEADER])
 
-	for subdomain in subdomains_fuzz:
-		command = None
-		# delete any existing dirs.json
-		if os.path.isfile(dirs_results):
-			os.system('rm -rf {}'.format(dirs_results))
+	parallelism = yaml_configuration[DIR_FILE_FUZZ].get(
+		FFUF_PARALLELISM, DEFAULT_FFUF_PARALLELISM)
+	parallelism = max(1, min(parallelism, len(subdomains_fuzz)))
+
+	# the request rate is split evenly between the parallel ffuf processes,
+	# each one keeps its share until it exits
+	rate = yaml_configuration[DIR_FILE_FUZZ].get(FFUF_RATE, 0)
+	if rate > 0:
+		ffuf_command = ' {} -rate {} '.format(
+			ffuf_command,
+			max(1, rate // parallelism)
+		)
+
+	def run_ffuf(subdomain):
+		dirs_output = '{}_{}.json'.format(
+			os.path.splitext(dirs_results)[0],
+			subdomain.name)
+		# delete any existing output of this host
+		if os.path.isfile(dirs_output):
+			os.remove(dirs_output)
 
 		if subdomain.http_url:
 			http_url = subdomain.http_url + 'FUZZ' if subdomain.http_url[-1:] == '/' else subdomain.http_url + '/FUZZ'
 		else:
-			http_url = subdomain
+			http_url = subdomain.name
+
+		command = ffuf_command
 
 		# proxy
-		proxy = get_random_proxy()
+		proxy = lease_proxy()
 		if proxy:
-			ffuf_command = '{} -x {} '.format(
-				ffuf_command,
+			command = '{} -x {} '.format(
+				command,
 				proxy
 			)
 
 		command = '{} -u {} -o {} -of json'.format(
-			ffuf_command,
+			command,
 			http_url,
-			dirs_results
+			dirs_output
 		)
 
 		logger.info(command)
-		os.system(remove_cmd_injection_chars(command))
-		
-		try:
-			if os.path.isfile(dirs_results):
-				with open(dirs_results, "r") as json_file:
-					json_string = json.loads(json_file.read())
-					subdomain = Subdomain.objects.get(
-							scan_history__id=scan_history.id, http_url=subdomain.http_url)
-					# TODO: URL Models to be created here
-					# Create a directory Scan model
-					directory_scan = DirectoryScan()
-					directory_scan.scanned_date = timezone.now()
-					directory_scan.command_line = json_string['commandline']
-					directory_scan.save()
-
-					for result in json_string['results']:
-						# check if directory already exists else create a new one
-						if DirectoryFile.objects.filter(
-							name=result['input']['FUZZ'],
-							length__exact=result['length'],
-							lines__exact=result['lines'],
-							http_status__exact=result['status'],
-							words__exact=result['words'],
-							url=result['url'],
-							content_type=result['content-type'],
-						).exists():
-							file = DirectoryFile.objects.get(
-								name=result['input']['FUZZ'],
-								length__exact=result['length'],
-								lines__exact=result['lines'],
-								http_status__exact=result['status'],
-								words__exact=result['words'],
-								url=result['url'],
-								content_type=result['content-type'],
-							)
-						else:
-							file = DirectoryFile()
-							file.name=result['input']['FUZZ']
-							file.length=result['length']
-							file.lines=result['lines']
-							file.http_status=result['status']
-							file.words=result['words']
-							file.url=result['url']
-							file.content_type=result['content-type']
-							file.save()
-
-						directory_scan.directory_files.add(file)
-
-					if subscan:
-						directory_scan.dir_subscan_ids.add(subscan)
-
-					subdomain.directories.add(directory_scan)
-
-		except Exception as exception:
-			logging.error(exception)
-			if not subscan:
-				update_last_activity(activity_id, 0)
-			raise Exception(exception)
+		return_code = os.system(remove_cmd_injection_chars(command))
+		release_proxy(proxy, success=return_code == 0)
+		return dirs_output
+
+	logger.info('Running ffuf on {} hosts with {} workers'.format(
+		len(subdomains_fuzz), parallelism))
+
+	# ffuf runs in the pool, results are saved from this thread only
+	with ThreadPoolExecutor(max_workers=parallelism) as executor:
+		futures = {
+			executor.submit(run_ffuf, subdomain): subdomain
+			for subdomain in subdomains_fuzz
+		}
+		for future in as_completed(futures):
+			subdomain = futures[future]
+			try:
+				dirs_output = future.result()
+				if os.path.isfile(dirs_output):
+					with open(dirs_output, "r") as json_file:
+						json_string = json.loads(json_file.read())
+					save_ffuf_results(scan_history, subdomain, json_string, subscan)
+			except Exception as exception:
+				logging.error(exception)
+				for pending in futures:
+					pending.cancel()
+				if not subscan:
+					update_last_activity(activity_id, 0)
+				raise Exception(exception)
 
-	if notification and notification[0].send_scan_status_notif:
+	if notification and notification.send_scan_status_notif:
 		send_notification('Directory Bruteforce has been completed for {}.'.format(domain_name))
 
 
+def save_ffuf_results(scan_history, subdomain, json_string, subscan=None):
+	'''
+		Saves the ffuf json output of one host as a DirectoryScan of the subdomain.
+		Files are keyed on their fingerprint, a result already stored by any
+		earlier scan is linked rather than inserted again.
+	'''
+	# TODO: URL Models to be created here
+	# Create a directory Scan model
+	directory_scan = DirectoryScan()
+	directory_scan.scanned_date = timezone.now()
+	directory_scan.command_line = json_string['commandline']
+	directory_scan.save()
+
+	files = {}
+	for result in json_string['results']:
+		file = DirectoryFile(
+			name=result['input']['FUZZ'],
+			length=result['length'],
+			lines=result['lines'],
+			http_status=result['status'],
+			words=result['words'],
+			url=result['url'],
+			content_type=result['content-type'],
+		)
+		file.fingerprint = DirectoryFile.get_fingerprint(
+			file.name,
+			file.length,
+			file.lines,
+			file.http_status,
+			file.words,
+			file.url,
+			file.content_type)
+		files[file.fingerprint] = file
+
+	fingerprints = list(files)
+	Through = DirectoryScan.directory_files.through
+	for index in range(0, len(fingerprints), DEFAULT_INGEST_BATCH_SIZE):
+		directory_files = bulk_get_or_create(
+			DirectoryFile,
+			'fingerprint',
+			fingerprints[index:index + DEFAULT_INGEST_BATCH_SIZE],
+			build=files.get)
+		Through.objects.bulk_create([
+			Through(directoryscan_id=directory_scan.id, directoryfile_id=file.id)
+			for file in directory_files.values()
+		], ignore_conflicts=True)
+
+	if subscan:
+		directory_scan.dir_subscan_ids.add(subscan)
+
+	subdomain.directories.add(directory_scan)
+
 def fetch_endpoints(
 		scan_history,
 		activity_id,
@@ -1534,11 +1870,11 @@ def fetch_endpoints(
 		scan_history.save()
 
 	logger.info('Initiated Endpoint Fetching')
-	domain_name = domain.name if domain else subdomain
+	domain_name = domain.name if domain else subdomain.name
 	output_file_name = file_name if file_name else 'all_urls.txt'
 
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('reNgine is currently gathering endpoints for {}.'.format(domain_name))
 
 	# check yaml settings
@@ -1553,13 +1889,12 @@ def fetch_endpoints(
 	else:
 		scan_type = 'normal'
 
-	valid_url_of_domain_regex = "\'https?://([a-z0-9]+[.])*{}.*\'".format(domain_name)
-
-	alive_subdomains_path = results_dir + '/' + output_file_name
+	alive_subdomains_path = results_dir + '/alive.txt'
 	sorted_subdomains_path = results_dir + '/sorted_subdomain_collection.txt'
 
+	tool_commands = []
 	for tool in tools.split(' '):
-		if tool == 'gau' or tool == 'hakrawler' or tool == 'waybackurls':
+		if tool in ['gau', 'gauplus', 'hakrawler', 'waybackurls']:
 			if subdomain:
 				subdomain_url = subdomain.http_url if subdomain.http_url else 'https://' + subdomain.name
 				input_target = 'echo {}'.format(subdomain_url)
@@ -1568,74 +1903,28 @@ def fetch_endpoints(
 			else:
 				input_target = 'echo {}'.format(domain_name)
 
-		if tool == 'gauplus':
-			logger.info('Running Gau')
-			gauplus_command = '{} | gau --random-agent | grep -Eo {} > {}/urls_gau.txt'.format(
-				input_target,
-				valid_url_of_domain_regex,
-				results_dir
-			)
-			logger.info(gau_command)
-			os.system(gau_command)
+		if tool in ['gau', 'gauplus']:
+			tool_commands.append('{} | gau --random-agent'.format(input_target))
 
 		elif tool == 'hakrawler':
-			logger.info('Running hakrawler')
-			hakrawler_command = '{} | hakrawler -subs -u | grep -Eo {} > {}/urls_hakrawler.txt'.format(
-				input_target,
-				valid_url_of_domain_regex,
-				results_dir
-			)
-			logger.info(hakrawler_command)
-			os.system(hakrawler_command)
+			tool_commands.append('{} | hakrawler -subs -u'.format(input_target))
 
 		elif tool == 'waybackurls':
-			logger.info('Running waybackurls')
-			waybackurls_command = '{} | waybackurls | grep -Eo {} > {}/urls_waybackurls.txt'.format(
-				input_target,
-				valid_url_of_domain_regex,
-				results_dir
-			)
-			logger.info(waybackurls_command)
-			os.system(waybackurls_command)
+			tool_commands.append('{} | waybackurls'.format(input_target))
 
 		elif tool == 'gospider':
 			if 'global_overides' in yaml_configuration and yaml_configuration['global_overides'].get('passive_only', False):
 				logger.info('Skipping gospider - Passive Overides: True')
 			else:
-				logger.info('Running gospider')
 				if subdomain:
 					subdomain_url = subdomain.http_url if subdomain.http_url else 'https://' + subdomain.name
 					gospider_command = 'gospider -s {}'.format(subdomain_url)
 				elif scan_type == 'deep' and domain:
-					gospider_command = 'gospider -S '.format(alive_subdomains_path)
+					gospider_command = 'gospider -S {}'.format(alive_subdomains_path)
 				else:
 					gospider_command = 'gospider -s https://{} '.format(domain_name)
-
-					gospider_command += ' --js -t 100 -d 2 --sitemap --robots -w -r | grep -Eo {} > {}/urls_gospider.txt'.format(
-						valid_url_of_domain_regex,
-						results_dir
-					)
-					logger.info(gospider_command)
-					os.system(gospider_command)
-
-	# run cleanup of urls
-	os.system('cat {0}/urls* > {0}/final_urls.txt'.format(results_dir))
-	os.system('rm -rf {}/url*'.format(results_dir))
-	# sorting and unique urls
-	logger.info("Sort and Unique")
-	if domain:
-		os.system('cat {0}/alive.txt >> {0}/final_urls.txt'.format(results_dir))
-	os.system('sort -u {0}/final_urls.txt -o {0}/{1}'.format(results_dir, output_file_name))
-
-	if IGNORE_FILE_EXTENSION in yaml_configuration[FETCH_URL]:
-		ignore_extension = '|'.join(
-			yaml_configuration[FETCH_URL][IGNORE_FILE_EXTENSION])
-		logger.info('Ignore extensions ' + ignore_extension)
-		os.system(
-			'cat {0}/{2} | grep -Eiv "\\.({1}).*" > {0}/temp_urls.txt'.format(
-				results_dir, ignore_extension, output_file_name))
-		os.system(
-			'rm {0}/{1} && mv {0}/temp_urls.txt {0}/{1}'.format(results_dir, output_file_name))
+				tool_commands.append(
+					gospider_command + ' --js -t 100 -d 2 --sitemap --robots -w -r')
 
 	'''
 	Store all the endpoints and then run the httpx
@@ -1646,50 +1935,64 @@ def fetch_endpoints(
 	elif subdomain:
 		domain_obj = subdomain.target_domain
 
+	ignore_extension_regex = None
+	if IGNORE_FILE_EXTENSION in yaml_configuration[FETCH_URL]:
+		ignore_extension = '|'.join(
+			re.escape(str(extension)) for extension in yaml_configuration[FETCH_URL][IGNORE_FILE_EXTENSION])
+		logger.info('Ignore extensions ' + ignore_extension)
+		ignore_extension_regex = re.compile(r'\.({})'.format(ignore_extension), re.IGNORECASE)
+
+	# tool output is read as it is printed, the urls in scope, unique and
+	# not ignored are written to the httpx input and saved in batches
+	if domain and os.path.isfile(alive_subdomains_path):
+		tool_commands.append('cat {}'.format(alive_subdomains_path))
+	lines = (line for command in tool_commands for line in stream_command_lines(command))
+	urls = unique_urls(
+		scope_urls(lines, get_url_scope_regex(domain_name), ignore_extension_regex))
+
+	# urls only differing by their parameter values are probed a few times
+	urls_per_shape = yaml_configuration[FETCH_URL].get(URLS_PER_SHAPE, DEFAULT_URLS_PER_SHAPE)
+	shape_counts = {}
+	urls = canonical_urls(urls, urls_per_shape, shape_counts)
+
+	endpoint_final_url = results_dir + '/{}'.format(output_file_name)
+	url_count = 0
 	try:
-		endpoint_final_url = results_dir + '/{}'.format(output_file_name)
-		if not os.path.isfile(endpoint_final_url):
-			return
-
-		with open(endpoint_final_url) as endpoint_list:
-			for url in endpoint_list:
-				http_url = url.rstrip('\n')
-				if not EndPoint.objects.filter(scan_history=scan_history, http_url=http_url).exists():
-					_subdomain = get_subdomain_from_url(http_url)
-					if Subdomain.objects.filter(
-							scan_history=scan_history).filter(
-							name=_subdomain).exists():
-						subdomain = Subdomain.objects.get(
-							scan_history=scan_history, name=_subdomain)
-					else:
-						'''
-							gau or gosppider can gather interesting endpoints which
-							when parsed can give subdomains that were not existent from
-							subdomain scan. so storing them
-						'''
-						logger.error(
-							'Subdomain {} not found, adding...'.format(_subdomain))
-						subdomain_dict = DottedDict({
-							'scan_history': scan_history,
-							'target_domain': domain_obj,
-							'name': _subdomain,
-						})
-						subdomain = save_subdomain(subdomain_dict)
-					endpoint_dict = DottedDict({
-						'scan_history': scan_history,
-						'target_domain': domain_obj,
-						'subdomain': subdomain,
-						'http_url': http_url,
-						'subscan': subscan
-					})
-					save_endpoint(endpoint_dict)
+		with open(endpoint_final_url, 'w') as endpoint_list:
+			batch = []
+			for http_url in urls:
+				endpoint_list.write(http_url + '\n')
+				batch.append(http_url)
+				if len(batch) >= DEFAULT_INGEST_BATCH_SIZE:
+					save_fetched_urls(scan_history, domain_obj, batch, subscan)
+					url_count += len(batch)
+					batch = []
+			if batch:
+				save_fetched_urls(scan_history, domain_obj, batch, subscan)
+				url_count += len(batch)
 	except Exception as e:
 		logger.error(e)
 		if not subscan:
 			update_last_activity(activity_id, 0)
 		raise Exception(e)
-
-	if notification and notification[0].send_scan_output_file:
+	logger.info('{} unique urls gathered'.format(url_count))
+
+	collapsed_shapes = sorted(
+		(
+			{'shape': shape, 'count': count, 'kept': urls_per_shape}
+			for shape, count in shape_counts.items()
+			if urls_per_shape and count > urls_per_shape
+		),
+		key=lambda shape: shape['count'],
+		reverse=True)
+	if collapsed_shapes:
+		logger.info('{} urls collapsed into {} url shapes'.format(
+			sum(shape['count'] - shape['kept'] for shape in collapsed_shapes),
+			len(collapsed_shapes)))
+	with open(results_dir + '/url_shapes.json', 'w') as shapes_file:
+		json.dump(collapsed_shapes, shapes_file, indent=2)
+
+	if notification and notification.send_scan_output_file:
 		send_files_to_discord(results_dir + '/{}'.format(output_file_name))
 
 	'''
@@ -1703,93 +2006,29 @@ def fetch_endpoints(
 
 	httpx_command = '/go/bin/httpx -l {0}/{1} -status-code -content-length -ip -cdn -title -tech-detect -json -follow-redirects -random-agent -o {0}/final_httpx_urls.json'.format(results_dir, output_file_name)
 
-	proxy = get_random_proxy()
+	proxy = lease_proxy()
 	if proxy:
 		httpx_command += " --http-proxy {} ".format(proxy)
 
 	if CUSTOM_HEADER in yaml_configuration and yaml_configuration[CUSTOM_HEADER]:
 		httpx_command += ' -H "{}" '.format(yaml_configuration[CUSTOM_HEADER])
 
+	# probed urls are saved in batches as httpx prints them
 	logger.info(httpx_command)
-	os.system(remove_cmd_injection_chars(httpx_command))
-
-	url_results_file = results_dir + '/final_httpx_urls.json'
+	probed_count = 0
 	try:
-		if os.path.isfile(url_results_file):
-			urls_json_result = open(url_results_file, 'r')
-			lines = urls_json_result.readlines()
-			for line in lines:
-				json_st = json.loads(line.strip())
-				http_url = json_st['url']
-				_subdomain = get_subdomain_from_url(http_url)
-
-				if Subdomain.objects.filter(
-						scan_history=scan_history).filter(
-						name=_subdomain).exists():
-					subdomain_obj = Subdomain.objects.get(
-						scan_history=scan_history, name=_subdomain)
-				else:
-					subdomain_dict = DottedDict({
-						'scan_history': scan_history,
-						'target_domain': domain,
-						'name': _subdomain,
-					})
-					subdomain_obj = save_subdomain(subdomain_dict)
-
-				if EndPoint.objects.filter(
-						scan_history=scan_history).filter(
-						http_url=http_url).exists():
-
-					endpoint = EndPoint.objects.get(
-						scan_history=scan_history, http_url=http_url)
-				else:
-					endpoint = EndPoint()
-					endpoint_dict = DottedDict({
-						'scan_history': scan_history,
-						'target_domain': domain,
-						'http_url': http_url,
-						'subdomain': subdomain_obj
-					})
-					endpoint = save_endpoint(endpoint_dict)
-
-				if 'title' in json_st:
-					endpoint.page_title = json_st['title']
-				if 'webserver' in json_st:
-					endpoint.webserver = json_st['webserver']
-				if 'content_length' in json_st:
-					endpoint.content_length = json_st['content_length']
-				if 'content_type' in json_st:
-					endpoint.content_type = json_st['content_type']
-				if 'status_code' in json_st:
-					endpoint.http_status = json_st['status_code']
-				if 'time' in json_st:
-					response_time = float(''.join(ch for ch in json_st['time'] if not ch.isalpha()))
-					if json_st['time'][-2:] == 'ms':
-						response_time = response_time / 1000
-					endpoint.response_time = response_time
-				endpoint.save()
-				if 'tech' in json_st:
-					for _tech in json_st['tech']:
-						if Technology.objects.filter(name=_tech).exists():
-							tech = Technology.objects.get(name=_tech)
-						else:
-							tech = Technology(name=_tech)
-							tech.save()
-						endpoint.technologies.add(tech)
-						# get subdomain object
-						subdomain = Subdomain.objects.get(
-							scan_history=scan_history,
-							name=_subdomain
-						)
-						subdomain.technologies.add(tech)
-						subdomain.save()
+		for results in stream_command_json(remove_cmd_injection_chars(httpx_command)):
+			probed_count += save_fetched_httpx_results(scan_history, domain_obj, results, subscan)
 	except Exception as exception:
 		logging.error(exception)
 		if not subscan:
 			update_last_activity(activity_id, 0)
 		raise Exception(exception)
+	finally:
+		# a proxy letting no url through is most likely dead
+		release_proxy(proxy, success=probed_count > 0)
 
-	if notification and notification[0].send_scan_status_notif:
+	if notification and notification.send_scan_status_notif:
 		endpoint_count = EndPoint.objects.filter(
 			scan_history__id=scan_history.id).values('http_url').distinct().count()
 		endpoint_alive_count = EndPoint.objects.filter(
@@ -1801,55 +2040,28 @@ def fetch_endpoints(
 		))
 
 
-	# once endpoint is saved, run gf patterns TODO: run threads
+	# once endpoint is saved, match the gf patterns in a single pass
 	if GF_PATTERNS in yaml_configuration[FETCH_URL]:
-		for pattern in yaml_configuration[FETCH_URL][GF_PATTERNS]:
-			# TODO: js var is causing issues, removing for now
-			if pattern != 'jsvar':
-				logger.info('Running GF for {}'.format(pattern))
-				gf_output_file_path = '{0}/gf_patterns_{1}.txt'.format(
-					results_dir, pattern)
-				gf_command = 'cat {0}/{3} | gf {1} | grep -Eo {4} >> {2} '.format(
-					results_dir,
-					pattern,
-					gf_output_file_path,
-					output_file_name,
-					valid_url_of_domain_regex
-				)
-				logger.info(gf_command)
-				os.system(gf_command)
-				if os.path.exists(gf_output_file_path):
-					with open(gf_output_file_path) as gf_output:
-						for line in gf_output:
-							url = line.rstrip('\n')
-							try:
-								endpoint = EndPoint.objects.get(
-									scan_history=scan_history, http_url=url)
-								earlier_pattern = endpoint.matched_gf_patterns
-								new_pattern = earlier_pattern + ',' + pattern if earlier_pattern else pattern
-								endpoint.matched_gf_patterns = new_pattern
-							except Exception as e:
-								# add the url in db
-								logger.error(e)
-								logger.info('Adding URL ' + url)
-								endpoint = EndPoint()
-								endpoint.http_url = url
-								endpoint.target_domain = domain
-								endpoint.scan_history = scan_history
-								try:
-									_subdomain = Subdomain.objects.get(
-										scan_history=scan_history,
-										name=get_subdomain_from_url(url)
-									)
-									endpoint.subdomain = _subdomain
-								except Exception as e:
-									continue
-								endpoint.matched_gf_patterns = pattern
-							finally:
-								endpoint.save()
-
-					os.system('rm -rf {}'.format(gf_output_file_path))
-
+		# TODO: js var is causing issues, removing for now
+		gf_patterns = load_gf_patterns(tuple(
+			pattern for pattern in yaml_configuration[FETCH_URL][GF_PATTERNS]
+			if pattern != 'jsvar'))
+		logger.info('Running GF for {}'.format(', '.join(gf_patterns)))
+		try:
+			with open(endpoint_final_url) as endpoint_list:
+				batch = {}
+				for url, patterns in match_gf_patterns(endpoint_list, gf_patterns):
+					batch[url] = patterns
+					if len(batch) >= DEFAULT_INGEST_BATCH_SIZE:
+						save_gf_matches(scan_history, domain_obj, batch)
+						batch = {}
+				if batch:
+					save_gf_matches(scan_history, domain_obj, batch)
+		except Exception as exception:
+			logging.error(exception)
+			if not subscan:
+				update_last_activity(activity_id, 0)
+			raise Exception(exception)
 
 def vulnerability_scan(
 		scan_history,
@@ -1862,8 +2074,8 @@ def vulnerability_scan(
 		subscan=None
 	):
 	logger.info('Initiating Vulnerability Scan')
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		if domain:
 			send_notification('Vulnerability scan has been initiated for {}.'.format(domain.name))
 		elif subdomain:
@@ -1941,6 +2153,12 @@ def vulnerability_scan(
 		# Update nuclei command with concurrent
 		nuclei_command = nuclei_command + ' -c ' + str(concurrency)
 
+	# number of hosts analyzed in parallel per template
+	if NUCLEI_BULK_SIZE in yaml_configuration[VULNERABILITY_SCAN] and yaml_configuration[
+			VULNERABILITY_SCAN][NUCLEI_BULK_SIZE] > 0:
+		bulk_size = yaml_configuration[VULNERABILITY_SCAN][NUCLEI_BULK_SIZE]
+		nuclei_command = nuclei_command + ' -bs ' + str(bulk_size)
+
 	if RATE_LIMIT in yaml_configuration[VULNERABILITY_SCAN] and yaml_configuration[
 			VULNERABILITY_SCAN][RATE_LIMIT] > 0:
 		rate_limit = yaml_configuration[VULNERABILITY_SCAN][RATE_LIMIT]
@@ -1970,194 +2188,54 @@ def vulnerability_scan(
 		severity = _severity.replace(" ", "")
 	else:
 		severity = "critical, high, medium, low, info, unknown"
+	severities = [element.strip() for element in severity.split(',') if element.strip()]
+
+	# single pass runs nuclei once for all severities, templates are loaded
+	# and every host requested once instead of once per severity
+	if yaml_configuration[VULNERABILITY_SCAN].get(NUCLEI_SINGLE_PASS, True):
+		severity_passes = [','.join(severities)]
+	else:
+		severity_passes = severities
 
-	# update nuclei templates before running scan
-	logger.info('Updating Nuclei Templates!')
-	os.system('nuclei -update-templates')
+	update_nuclei_templates(yaml_configuration)
 
-	for _severity in severity.split(","):
+	severity_counts = {}
+	for _severity in severity_passes:
 		# delete any existing vulnerability.json file
 		if os.path.isfile(vulnerability_result_path):
 			os.system('rm {}'.format(vulnerability_result_path))
 		# run nuclei
 		final_nuclei_command = nuclei_command + ' -severity ' + _severity
 
-		proxy = get_random_proxy()
+		proxy = lease_proxy()
 		if proxy:
 			final_nuclei_command += " -proxy {} ".format(proxy)
 
 		logger.info('Running Nuclei Scanner!')
 		logger.info(final_nuclei_command)
-		os.system(remove_cmd_injection_chars(final_nuclei_command))
 
 		try:
-			if os.path.isfile(vulnerability_result_path):
-				urls_json_result = open(vulnerability_result_path, 'r')
-				lines = urls_json_result.readlines()
-				for line in lines:
-					json_st = json.loads(line.strip())
-					host = json_st['host']
-					_subdomain = get_subdomain_from_url(host)
-					try:
-						subdomain = Subdomain.objects.get(
-							name=_subdomain, scan_history=scan_history)
-						vulnerability = Vulnerability()
-						vulnerability.subdomain = subdomain
-						vulnerability.scan_history = scan_history
-						vulnerability.target_domain = domain
-
-						if EndPoint.objects.filter(scan_history=scan_history).filter(target_domain=domain).filter(http_url=host).exists():
-							endpoint = EndPoint.objects.get(
-								scan_history=scan_history,
-								target_domain=domain,
-								http_url=host
-							)
-						else:
-							logger.info('Creating Endpoint...')
-							endpoint_dict = DottedDict({
-								'scan_history': scan_history,
-								'target_domain': domain,
-								'http_url': host,
-								'subdomain': subdomain
-							})
-							endpoint = save_endpoint(endpoint_dict)
-							logger.info('Endpoint {} created!'.format(host))
-
-						vulnerability.endpoint = endpoint
-						vulnerability.template = json_st['template']
-						vulnerability.template_url = json_st['template-url']
-						vulnerability.template_id = json_st['template-id']
-
-						if 'name' in json_st['info']:
-							vulnerability.name = json_st['info']['name']
-						if 'severity' in json_st['info']:
-							if json_st['info']['severity'] == 'info':
-								severity = 0
-							elif json_st['info']['severity'] == 'low':
-								severity = 1
-							elif json_st['info']['severity'] == 'medium':
-								severity = 2
-							elif json_st['info']['severity'] == 'high':
-								severity = 3
-							elif json_st['info']['severity'] == 'critical':
-								severity = 4
-							elif json_st['info']['severity'] == 'unknown':
-								severity = -1
-							else:
-								severity = 0
-						else:
-							severity = 0
-						vulnerability.severity = severity
-
-						if 'description' in json_st['info']:
-							vulnerability.description = json_st['info']['description']
-
-						if 'matcher-name' in json_st:
-							vulnerability.matcher_name = json_st['matcher-name']
-
-						if 'matched-at' in json_st:
-							vulnerability.http_url = json_st['matched-at']
-							# also save matched at as url endpoint
-							if not EndPoint.objects.filter(scan_history=scan_history).filter(target_domain=domain).filter(http_url=json_st['matched-at']).exists():
-								logger.info('Creating Endpoint...')
-								endpoint_dict = DottedDict({
-									'scan_history': scan_history,
-									'target_domain': domain,
-									'http_url': json_st['matched-at'],
-									'subdomain': subdomain
-								})
-								save_endpoint(endpoint_dict)
-								logger.info('Endpoint {} created!'.format(json_st['matched-at']))
-
-						if 'curl-command' in json_st:
-							vulnerability.curl_command = json_st['curl-command']
-
-						if 'extracted-results' in json_st:
-							vulnerability.extracted_results = json_st['extracted-results']
-
-						vulnerability.type = json_st['type']
-						vulnerability.discovered_date = timezone.now()
-						vulnerability.open_status = True
-						vulnerability.save()
-
-						if 'tags' in json_st['info'] and json_st['info']['tags']:
-							for tag in json_st['info']['tags']:
-								if VulnerabilityTags.objects.filter(name=tag).exists():
-									tag = VulnerabilityTags.objects.get(name=tag)
-								else:
-									tag = VulnerabilityTags(name=tag)
-									tag.save()
-								vulnerability.tags.add(tag)
-
-						if 'classification' in json_st['info'] and 'cve-id' in json_st['info']['classification'] and json_st['info']['classification']['cve-id']:
-							for cve in json_st['info']['classification']['cve-id']:
-								if CveId.objects.filter(name=cve).exists():
-									cve_obj = CveId.objects.get(name=cve)
-								else:
-									cve_obj = CveId(name=cve)
-									cve_obj.save()
-								vulnerability.cve_ids.add(cve_obj)
-
-						if 'classification' in json_st['info'] and 'cwe-id' in json_st['info']['classification'] and json_st['info']['classification']['cwe-id']:
-							for cwe in json_st['info']['classification']['cwe-id']:
-								if CweId.objects.filter(name=cwe).exists():
-									cwe_obj = CweId.objects.get(name=cwe)
-								else:
-									cwe_obj = CweId(name=cwe)
-									cwe_obj.save()
-								vulnerability.cwe_ids.add(cwe_obj)
-
-						if 'classification' in json_st['info']:
-							if 'cvss-metrics' in json_st['info']['classification']:
-								vulnerability.cvss_metrics = json_st['info']['classification']['cvss-metrics']
-							if 'cvss-score' in json_st['info']['classification']:
-								vulnerability.cvss_score = json_st['info']['classification']['cvss-score']
-
-						if 'reference' in json_st['info'] and json_st['info']['reference']:
-							for ref_url in json_st['info']['reference']:
-								if VulnerabilityReference.objects.filter(url=ref_url).exists():
-									reference = VulnerabilityReference.objects.get(url=ref_url)
-								else:
-									reference = VulnerabilityReference(url=ref_url)
-									reference.save()
-								vulnerability.references.add(reference)
-
-						vulnerability.save()
-
-						if subscan:
-							vulnerability.vuln_subscan_ids.add(subscan)
-							vulnerability.save()
-
-						# send notification for all vulnerabilities except info
-						if  json_st['info']['severity'] != "info" and notification and notification[0].send_vuln_notif:
-							message = "*Alert: Vulnerability Identified*"
-							message += "\n\n"
-							message += "A *{}* severity vulnerability has been identified.".format(json_st['info']['severity'])
-							message += "\nVulnerability Name: {}".format(json_st['info']['name'])
-							message += "\nVulnerable URL: {}".format(json_st['host'])
-							send_notification(message)
-
-						# send report to hackerone
-						if Hackerone.objects.all().exists() and json_st['info']['severity'] != 'info' and json_st['info']['severity'] \
-							!= 'low' and vulnerability.target_domain.h1_team_handle:
-							hackerone = Hackerone.objects.all()[0]
-
-							if hackerone.send_critical and json_st['info']['severity'] == 'critical':
-								send_hackerone_report(vulnerability.id)
-							elif hackerone.send_high and json_st['info']['severity'] == 'high':
-								send_hackerone_report(vulnerability.id)
-							elif hackerone.send_medium and json_st['info']['severity'] == 'medium':
-								send_hackerone_report(vulnerability.id)
-					except ObjectDoesNotExist:
-						logger.error('Object not found')
-
+			# findings are saved while nuclei is still running
+			for results in stream_command_json(remove_cmd_injection_chars(final_nuclei_command)):
+				# route findings by severity, nuclei may report severities
+				# that were not asked for in templates without one
+				results = [
+					json_st for json_st in results
+					if (json_st.get('info') or {}).get('severity', 'info') in severities]
+				for vulnerability in save_nuclei_results(scan_history, domain, results, subscan):
+					severity_name = NUCLEI_REVERSE_SEVERITY_MAP.get(vulnerability.severity)
+					severity_counts[severity_name] = severity_counts.get(severity_name, 0) + 1
+			release_proxy(proxy)
 		except Exception as exception:
 			logging.error(exception)
+			release_proxy(proxy, success=False)
 			if not subscan:
 				update_last_activity(activity_id, 0)
 			raise Exception(exception)
 
-	if notification and notification[0].send_scan_status_notif:
+	logger.info('Nuclei findings by severity: {}'.format(severity_counts))
+
+	if notification and notification.send_scan_status_notif:
 		info_count = Vulnerability.objects.filter(
 			scan_history__id=scan_history.id, severity=0).count()
 		low_count = Vulnerability.objects.filter(
@@ -2211,6 +2289,175 @@ def update_last_activity(id, activity_status, error_message=None):
 		time=timezone.now())
 
 
+@app.task
+def generate_report(scan_history_id, report_type, report_path):
+	'''
+		Renders the pdf report of a scan into report_path, views only
+		enqueue this job and serve the file once it exists.
+		Failures are recorded in report_path.failed.
+	'''
+	html_path = report_path + '.html'
+	tmp_path = report_path + '.tmp'
+	try:
+		scan_history = ScanHistory.objects.get(pk=scan_history_id)
+		context = get_report_context(scan_history, report_type)
+		write_report_html(context, html_path)
+		HTML(filename=html_path).write_pdf(tmp_path)
+		os.replace(tmp_path, report_path)
+	except Exception as exception:
+		logger.exception(exception)
+		with open(report_path + '.failed', 'w') as failed_file:
+			failed_file.write(str(exception))
+	finally:
+		for path in (html_path, tmp_path, report_path + '.pending'):
+			if os.path.isfile(path):
+				os.remove(path)
+
+
+def get_report_context(scan_history, report_type):
+	primary_color = '#FFB74D'
+	secondary_color = '#212121'
+
+	if report_type == 'recon':
+		show_recon = True
+		show_vuln = False
+		report_name = 'Reconnaissance Report'
+	elif report_type == 'vulnerability':
+		show_recon = False
+		show_vuln = True
+		report_name = 'Vulnerability Report'
+	else:
+		# default
+		show_recon = True
+		show_vuln = True
+		report_name = 'Full Scan Report'
+
+	unique_vulnerabilities = Vulnerability.objects.filter(
+		scan_history=scan_history).values('name', 'severity').annotate(
+		count=Count('name')).order_by('-severity', '-count')
+	all_vulnerabilities = Vulnerability.objects.filter(
+		scan_history=scan_history)
+	subdomains = Subdomain.objects.filter(scan_history=scan_history)
+	subdomain_alive_count = subdomains.values('name').distinct().filter(
+		http_status__exact=200).count()
+	interesting_subdomains = get_interesting_subdomains(
+		scan_history=scan_history.id)
+	ip_addresses = IpAddress.objects.filter(
+		ip_addresses__scan_history=scan_history).distinct()
+
+	# subdomains, ip addresses and vulnerabilities are only counted here,
+	# their rows are rendered chunk by chunk by write_report_html
+	context = {
+		'scan_object': scan_history,
+		'unique_vulnerabilities': unique_vulnerabilities,
+		'all_vulnerabilities': all_vulnerabilities,
+		'subdomain_alive_count': subdomain_alive_count,
+		'interesting_subdomains': interesting_subdomains,
+		'ip_addresses': ip_addresses,
+		'show_recon': show_recon,
+		'show_vuln': show_vuln,
+		'report_name': report_name,
+	}
+
+	# get report related config
+	report = VulnerabilityReportSetting.objects.first()
+	if report:
+		context['company_name'] = report.company_name
+		context['company_address'] = report.company_address
+		context['company_email'] = report.company_email
+		context['company_website'] = report.company_website
+		context['show_rengine_banner'] = report.show_rengine_banner
+		context['show_footer'] = report.show_footer
+		context['footer_text'] = report.footer_text
+		context['show_executive_summary'] = report.show_executive_summary
+
+		primary_color = report.primary_color
+		secondary_color = report.secondary_color
+
+		description = report.executive_summary_description or ''
+		severity_counts = all_vulnerabilities.aggregate(
+			critical_count=Count('id', filter=Q(severity=4)),
+			high_count=Count('id', filter=Q(severity=3)),
+			medium_count=Count('id', filter=Q(severity=2)),
+			low_count=Count('id', filter=Q(severity=1)),
+			info_count=Count('id', filter=Q(severity=0)),
+			unknown_count=Count('id', filter=Q(severity=-1)),
+			vulnerability_count=Count('id'))
+
+		# replace executive_summary_description with template syntax!
+		description = description.replace('{scan_date}', scan_history.start_scan_date.strftime('%d %B, %Y'))
+		description = description.replace('{company_name}', report.company_name or '')
+		description = description.replace('{target_name}', scan_history.domain.name)
+		if scan_history.domain.description:
+			description = description.replace('{target_description}', scan_history.domain.description)
+		description = description.replace('{subdomain_count}', str(subdomains.count()))
+		for key, count in severity_counts.items():
+			description = description.replace('{' + key + '}', str(count))
+
+		# convert to html
+		context['executive_summary_description'] = markdown.markdown(description)
+
+	context['primary_color'] = primary_color
+	context['secondary_color'] = secondary_color
+	return context
+
+
+def write_report_html(context, html_path):
+	'''
+		Writes the report html to html_path. The main template only holds
+		placeholders for the per subdomain, ip and vulnerability sections,
+		those are rendered REPORT_CHUNK_SIZE rows at a time, so the job
+		never holds more than a chunk of rows and of html in memory.
+	'''
+	html = get_template('report/template.html').render(context)
+	with open(html_path, 'w') as html_file:
+		# re.split alternates static html and captured section names
+		for index, section in enumerate(re.split(REPORT_CHUNK_PATTERN, html)):
+			if index % 2 == 0:
+				html_file.write(section)
+				continue
+			for chunk in render_report_chunks(section, context['scan_object']):
+				html_file.write(chunk)
+
+
+def render_report_chunks(section, scan_history):
+	template = get_template('report/_{}.html'.format(section))
+
+	if section == 'vulnerabilities':
+		# chunks are cut on vulnerability names so that the regroup of the
+		# template sees every finding of a name at once
+		names = list(dict.fromkeys(
+			Vulnerability.objects.filter(
+				scan_history=scan_history).order_by(
+				'-severity', 'name').values_list('name', flat=True)))
+		for index in range(0, len(names), REPORT_CHUNK_SIZE):
+			vulnerabilities = Vulnerability.objects.filter(
+				scan_history=scan_history,
+				name__in=names[index:index + REPORT_CHUNK_SIZE]).order_by(
+				'-severity', 'name', 'http_url').prefetch_related(
+				'cve_ids', 'cwe_ids', 'references')
+			yield template.render({'vulnerabilities': vulnerabilities})
+		return
+
+	if section == 'ip_addresses':
+		rows = IpAddress.objects.filter(
+			ip_addresses__scan_history=scan_history).distinct().order_by(
+			'id').prefetch_related('ports')
+		context_name = 'ip_addresses'
+	else:
+		rows = Subdomain.objects.filter(
+			scan_history=scan_history).order_by('-content_length', 'id')
+		if section == 'recon_findings':
+			rows = rows.prefetch_related('ip_addresses__ports')
+		context_name = 'subdomains'
+
+	for offset in range(0, rows.count(), REPORT_CHUNK_SIZE):
+		yield template.render({
+			context_name: rows[offset:offset + REPORT_CHUNK_SIZE],
+			'offset': offset,
+		})
+
+
 def delete_scan_data(results_dir):
 	# remove all txt,html,json files
 	os.system('find {} -name "*.txt" -type f -delete'.format(results_dir))
@@ -2245,6 +2492,8 @@ def save_subdomain(subdomain_dict):
 	if 'content_length' in subdomain_dict:
 		subdomain.content_length = subdomain_dict.get('content_length')
 
+	subdomain.is_interesting = get_interesting_matcher()(
+		subdomain.name, subdomain.page_title, subdomain.http_status)
 	subdomain.save()
 	return subdomain
 
@@ -2263,6 +2512,8 @@ def save_endpoint(endpoint_dict):
 	endpoint.http_status = endpoint_dict.get('http_status') if 'http_status' in endpoint_dict else 0
 	endpoint.content_length = endpoint_dict.get('content_length') if 'content_length' in endpoint_dict else 0
 	endpoint.is_default = endpoint_dict.get('is_default') if 'is_default' in endpoint_dict else False
+	endpoint.is_interesting = get_interesting_matcher()(
+		endpoint.http_url, endpoint.page_title, endpoint.http_status)
 	endpoint.save()
 
 	if endpoint_dict.get('subscan'):
@@ -2272,9 +2523,856 @@ def save_endpoint(endpoint_dict):
 	return endpoint
 
 
+def stream_command_json(command, batch_size=DEFAULT_INGEST_BATCH_SIZE, flush_interval=DEFAULT_STREAM_FLUSH_INTERVAL):
+	'''
+	Runs a tool printing JSON lines on stdout and yields the parsed results
+	in micro batches while the tool is still running, a batch is yielded once
+	it reaches batch_size or flush_interval seconds have passed, so that the
+	results are saved even if the scan is stopped before the tool exits.
+	'''
+	process = subprocess.Popen(
+		command,
+		shell=True,
+		stdout=subprocess.PIPE,
+		universal_newlines=True)
+	lines = queue.Queue()
+
+	def read_stdout():
+		for line in process.stdout:
+			lines.put(line)
+		lines.put(None)
+
+	reader = threading.Thread(target=read_stdout, daemon=True)
+	reader.start()
+
+	try:
+		batch = []
+		last_flush = time.time()
+		while True:
+			try:
+				line = lines.get(timeout=flush_interval)
+			except queue.Empty:
+				line = ''
+			if line is None:
+				break
+			line = line.strip()
+			if line:
+				try:
+					batch.append(json.loads(line))
+				except ValueError:
+					# not a result, tools may print banners on stdout
+					logger.info(line)
+			if batch and (len(batch) >= batch_size or time.time() - last_flush >= flush_interval):
+				yield batch
+				batch = []
+				last_flush = time.time()
+
+		if batch:
+			yield batch
+	finally:
+		# the consumer may raise or stop iterating before the tool exits,
+		# do not leave the tool running
+		if process.poll() is None:
+			process.kill()
+		process.wait()
+
+
+def stream_command_lines(command):
+	'''
+	Runs a tool and yields the lines it prints on stdout while it is running
+	'''
+	logger.info(command)
+	process = subprocess.Popen(
+		command,
+		shell=True,
+		stdout=subprocess.PIPE,
+		universal_newlines=True,
+		errors='replace')
+	try:
+		for line in process.stdout:
+			yield line
+	finally:
+		if process.poll() is None:
+			process.kill()
+		process.wait()
+
+
+def get_url_scope_regex(domain_name):
+	'''
+	Returns the compiled regex matching the urls of domain_name and of its
+	subdomains in a line of tool output
+	'''
+	return re.compile(
+		r'https?://(?:[a-z0-9_-]+\.)*{}(?![a-z0-9.-])[^\s"\'<>]*'.format(re.escape(domain_name)),
+		re.IGNORECASE)
+
+
+def normalize_url(url):
+	'''
+	Lowercases the scheme and host of url and drops its fragment
+	'''
+	url = url.split('#', 1)[0]
+	scheme, _, rest = url.partition('://')
+	host, slash, path = rest.partition('/')
+	return '{}://{}{}{}'.format(scheme.lower(), host.lower(), slash, path)
+
+
+def scope_urls(lines, scope_regex, ignore_regex=None):
+	'''
+	Yields the normalized urls matched by scope_regex in lines, skipping
+	those matched by ignore_regex
+	'''
+	for line in lines:
+		for match in scope_regex.finditer(line):
+			url = normalize_url(match.group())
+			if ignore_regex and ignore_regex.search(url):
+				continue
+			yield url
+
+
+def unique_urls(urls):
+	'''
+	Yields the urls not seen before. Only an 8 bytes digest of each url is
+	kept, so that millions of urls can be deduplicated in a few hundred MB.
+	'''
+	seen = set()
+	for url in urls:
+		digest = hashlib.blake2b(url.encode(), digest_size=8).digest()
+		if digest in seen:
+			continue
+		seen.add(digest)
+		yield url
+
+
+@lru_cache(maxsize=None)
+def get_url_path_templates():
+	return [
+		(re.compile(pattern, re.IGNORECASE), placeholder)
+		for pattern, placeholder in URL_PATH_TEMPLATES
+	]
+
+
+def get_url_shape(url):
+	'''
+	Returns the host, path template and sorted parameter names of url,
+	/item/12?id=1&b=2 and /item/13?b=3&id=4 have the same shape
+	'''
+	url, _, query = url.partition('?')
+	scheme, _, rest = url.partition('://')
+	host, _, path = rest.partition('/')
+	segments = []
+	for segment in path.split('/'):
+		for regex, placeholder in get_url_path_templates():
+			if regex.match(segment):
+				segment = placeholder
+				break
+		segments.append(segment)
+	params = sorted(set(
+		param.split('=', 1)[0] for param in query.split('&') if param))
+	return '{}/{}?{}'.format(host, '/'.join(segments), '&'.join(params))
+
+
+def canonical_urls(urls, urls_per_shape, shape_counts):
+	'''
+	Yields at most urls_per_shape urls of each url shape, shape_counts is
+	filled with the number of urls seen for each shape
+	'''
+	for url in urls:
+		shape = get_url_shape(url)
+		shape_counts[shape] = shape_counts.get(shape, 0) + 1
+		if not urls_per_shape or shape_counts[shape] <= urls_per_shape:
+			yield url
+
+def save_fetched_urls(scan_history, domain, urls, subscan=None):
+	'''
+	Saves a batch of urls gathered by fetch_endpoints, subdomains not found
+	by the subdomain scan are added, endpoints are created in bulk
+	'''
+	subdomain_names = set(get_subdomain_from_url(url) for url in urls)
+	subdomain_map = {
+		subdomain.name: subdomain
+		for subdomain in Subdomain.objects.filter(
+			scan_history=scan_history,
+			name__in=subdomain_names)
+	}
+	for name in subdomain_names - subdomain_map.keys():
+		'''
+			gau or gosppider can gather interesting endpoints which
+			when parsed can give subdomains that were not existent from
+			subdomain scan. so storing them
+		'''
+		logger.error('Subdomain {} not found, adding...'.format(name))
+		subdomain_map[name] = save_subdomain(DottedDict({
+			'scan_history': scan_history,
+			'target_domain': domain,
+			'name': name,
+		}))
+	return resolve_endpoints(scan_history, domain, urls, subdomain_map, subscan)
+
+@lru_cache(maxsize=None)
+def load_gf_patterns(names):
+	'''
+	Returns a {name: compiled regex} map of the gf pattern definitions of
+	names, read once per worker from GF_PATTERNS_DIRECTORY
+	'''
+	gf_patterns = {}
+	for name in names:
+		try:
+			with open('{}/{}.json'.format(GF_PATTERNS_DIRECTORY, name)) as pattern_file:
+				definition = json.load(pattern_file)
+			patterns = definition.get('patterns') or [definition['pattern']]
+			flags = re.IGNORECASE if 'i' in definition.get('flags', '') else 0
+			gf_patterns[name] = re.compile('|'.join(
+				'(?:{})'.format(pattern) for pattern in patterns), flags)
+		except Exception as e:
+			logger.error('Unable to load gf pattern {}: {}'.format(name, e))
+	return gf_patterns
+
+
+def match_gf_patterns(urls, gf_patterns):
+	'''
+	Yields each url matching gf patterns with the sorted names of all the
+	patterns it matches
+	'''
+	for url in urls:
+		url = url.strip()
+		patterns = [
+			name for name, regex in sorted(gf_patterns.items())
+			if regex.search(url)
+		]
+		if url and patterns:
+			yield url, patterns
+
+
+def save_gf_matches(scan_history, domain, matches):
+	'''
+	Adds the matched gf patterns of a {url: patterns} batch to their
+	endpoints with one bulk_update
+	'''
+	subdomain_map = {
+		subdomain.name: subdomain
+		for subdomain in Subdomain.objects.filter(
+			scan_history=scan_history,
+			name__in=set(get_subdomain_from_url(url) for url in matches))
+	}
+	endpoints = resolve_endpoints(
+		scan_history,
+		domain,
+		[url for url in matches if get_subdomain_from_url(url) in subdomain_map],
+		subdomain_map)
+	for url, endpoint in endpoints.items():
+		patterns = set(filter(None, (endpoint.matched_gf_patterns or '').split(',')))
+		endpoint.matched_gf_patterns = ','.join(sorted(patterns.union(matches[url])))
+	EndPoint.objects.bulk_update(endpoints.values(), ['matched_gf_patterns'])
+
+def bulk_get_or_create(model, field, values, build=None):
+	'''
+	Returns a {value: object} map for lookup models keyed on a single column
+	such as Technology.name or IpAddress.address. Existing rows are fetched
+	with one query and the missing ones inserted with one bulk_create.
+	build, if given, is called with a value to construct the unsaved object.
+	'''
+	values = set(value for value in values if value)
+	if not values:
+		return {}
+	lookup = '{}__in'.format(field)
+	objects = {
+		getattr(obj, field): obj
+		for obj in model.objects.filter(**{lookup: values}).order_by('-id')
+	}
+	missing = [value for value in values if value not in objects]
+	if missing:
+		model.objects.bulk_create(
+			[build(value) if build else model(**{field: value}) for value in missing],
+			ignore_conflicts=True)
+		# ignore_conflicts does not return primary keys, fetch them back
+		for obj in model.objects.filter(**{lookup: missing}).order_by('-id'):
+			objects[getattr(obj, field)] = obj
+	return objects
+
+
+def update_nuclei_templates(yaml_configuration):
+	'''
+	Updates the nuclei templates at most once per template_update_interval
+	hours. The update runs behind a file lock: scans and subscans starting
+	meanwhile do not wait for it and use the templates already on disk.
+	'''
+	interval = yaml_configuration[VULNERABILITY_SCAN].get(
+		NUCLEI_TEMPLATE_UPDATE_INTERVAL,
+		DEFAULT_NUCLEI_TEMPLATE_UPDATE_INTERVAL)
+
+	def get_recent_update():
+		return NucleiTemplateUpdate.objects.filter(
+			update_date__gte=timezone.now() - timedelta(hours=interval)).order_by(
+			'-update_date').first()
+
+	recent_update = get_recent_update()
+	if recent_update:
+		logger.info('Using nuclei templates {} updated on {}'.format(
+			recent_update.version, recent_update.update_date))
+		return
+
+	# only wait for the lock when there are no templates to scan with yet
+	templates_exist = os.path.isdir(NUCLEI_TEMPLATES_PATH)
+	with open(NUCLEI_TEMPLATE_UPDATE_LOCK, 'w') as lock_file:
+		try:
+			fcntl.flock(
+				lock_file,
+				fcntl.LOCK_EX | fcntl.LOCK_NB if templates_exist else fcntl.LOCK_EX)
+		except BlockingIOError:
+			logger.info('Nuclei templates are being updated, using the current ones')
+			return
+
+		# another worker may have updated while we were waiting
+		if get_recent_update():
+			return
+
+		logger.info('Updating Nuclei Templates!')
+		return_code = os.system('nuclei -update-templates')
+		NucleiTemplateUpdate.objects.create(
+			version=get_nuclei_templates_version(),
+			update_date=timezone.now(),
+			is_successful=return_code == 0)
+
+
+def get_nuclei_templates_version():
+	output = subprocess.getoutput('nuclei -templates-version')
+	version = re.search(r'v?\d+\.\d+\.\d+', output)
+	return version.group(0) if version else None
+
+
+def resolve_endpoints(scan_history, domain, urls, subdomain_map, subscan=None):
+	'''
+	Returns a {url: EndPoint} map for urls, creating the missing endpoints
+	in bulk. Existing endpoints are matched on the md5 of their url, which
+	is what endpoint_scan_url_md5_idx indexes.
+	subdomain_map is a {name: Subdomain} map used for the new endpoints.
+	'''
+	urls = set(url for url in urls if url)
+	if not urls:
+		return {}
+	endpoints = {}
+	existing = EndPoint.objects.annotate(
+		url_md5=MD5('http_url')).filter(
+		scan_history=scan_history,
+		target_domain=domain,
+		url_md5__in=[hashlib.md5(url.encode()).hexdigest() for url in urls])
+	for endpoint in existing.order_by('id'):
+		endpoints.setdefault(endpoint.http_url, endpoint)
+
+	is_interesting = get_interesting_matcher()
+	discovered_date = timezone.now()
+	new_endpoints = []
+	for url in urls - endpoints.keys():
+		endpoint = EndPoint(
+			scan_history=scan_history,
+			target_domain=domain,
+			subdomain=subdomain_map.get(get_subdomain_from_url(url)),
+			http_url=url,
+			discovered_date=discovered_date,
+			response_time=0,
+			http_status=0,
+			content_length=0,
+			is_default=False,
+			is_interesting=is_interesting(url))
+		new_endpoints.append(endpoint)
+		endpoints[url] = endpoint
+	if new_endpoints:
+		logger.info('Creating {} endpoints'.format(len(new_endpoints)))
+		EndPoint.objects.bulk_create(new_endpoints)
+		if subscan:
+			EndPoint.endpoint_subscan_ids.through.objects.bulk_create(
+				[
+					EndPoint.endpoint_subscan_ids.through(
+						endpoint_id=endpoint.id,
+						subscan_id=subscan.id)
+					for endpoint in new_endpoints
+				],
+				ignore_conflicts=True)
+	return endpoints
+
+
+def save_nuclei_results(scan_history, domain, results, subscan=None):
+	'''
+	Persists a batch of nuclei json lines with a fixed number of queries:
+	subdomains and endpoints are resolved for the whole batch, tags, CVEs,
+	CWEs and references upserted in bulk, vulnerabilities and their m2m
+	rows bulk created. Notifications and HackerOne reports are sent by
+	background tasks. Returns the list of created vulnerabilities.
+	'''
+	findings = []
+	for json_st in results:
+		if 'host' in json_st and 'info' in json_st:
+			findings.append(json_st)
+	if not findings:
+		return []
+
+	subdomain_names = set(get_subdomain_from_url(json_st['host']) for json_st in findings)
+	subdomain_map = {
+		subdomain.name: subdomain
+		for subdomain in Subdomain.objects.filter(
+			scan_history=scan_history,
+			name__in=subdomain_names)
+	}
+	skipped = len(findings)
+	findings = [
+		json_st for json_st in findings
+		if get_subdomain_from_url(json_st['host']) in subdomain_map]
+	skipped -= len(findings)
+	if skipped:
+		logger.error('Skipped {} findings of unknown subdomains'.format(skipped))
+	if not findings:
+		return []
+
+	# matched-at urls are also saved as endpoints
+	endpoints = resolve_endpoints(
+		scan_history,
+		domain,
+		[json_st['host'] for json_st in findings] +
+		[json_st.get('matched-at') for json_st in findings],
+		subdomain_map,
+		subscan)
+
+	def get_classification(json_st, key):
+		classification = json_st['info'].get('classification') or {}
+		return classification.get(key) or []
+
+	tags = bulk_get_or_create(
+		VulnerabilityTags,
+		'name',
+		[tag for json_st in findings for tag in json_st['info'].get('tags') or []])
+	cve_ids = bulk_get_or_create(
+		CveId,
+		'name',
+		[cve for json_st in findings for cve in get_classification(json_st, 'cve-id')])
+	cwe_ids = bulk_get_or_create(
+		CweId,
+		'name',
+		[cwe for json_st in findings for cwe in get_classification(json_st, 'cwe-id')])
+	references = bulk_get_or_create(
+		VulnerabilityReference,
+		'url',
+		[url for json_st in findings for url in json_st['info'].get('reference') or []])
+
+	discovered_date = timezone.now()
+	vulnerabilities = []
+	for json_st in findings:
+		info = json_st['info']
+		classification = info.get('classification') or {}
+		vulnerability = Vulnerability(
+			scan_history=scan_history,
+			target_domain=domain,
+			subdomain=subdomain_map[get_subdomain_from_url(json_st['host'])],
+			endpoint=endpoints[json_st['host']],
+			template=json_st.get('template') or '',
+			template_url=json_st.get('template-url'),
+			template_id=json_st.get('template-id'),
+			name=info.get('name') or '',
+			severity=NUCLEI_SEVERITY_MAP.get(info.get('severity'), 0),
+			description=info.get('description'),
+			matcher_name=json_st.get('matcher-name'),
+			http_url=json_st.get('matched-at'),
+			curl_command=json_st.get('curl-command'),
+			extracted_results=json_st.get('extracted-results'),
+			cvss_metrics=classification.get('cvss-metrics'),
+			cvss_score=classification.get('cvss-score'),
+			type=json_st.get('type'),
+			discovered_date=discovered_date,
+			open_status=True)
+		vulnerabilities.append(vulnerability)
+	Vulnerability.objects.bulk_create(vulnerabilities)
+
+	through_rows = {
+		Vulnerability.tags.through: [],
+		Vulnerability.cve_ids.through: [],
+		Vulnerability.cwe_ids.through: [],
+		Vulnerability.references.through: [],
+		Vulnerability.vuln_subscan_ids.through: [],
+	}
+	for vulnerability, json_st in zip(vulnerabilities, findings):
+		info = json_st['info']
+		for tag in info.get('tags') or []:
+			if tag in tags:
+				through_rows[Vulnerability.tags.through].append(
+					Vulnerability.tags.through(
+						vulnerability_id=vulnerability.id,
+						vulnerabilitytags_id=tags[tag].id))
+		for cve in get_classification(json_st, 'cve-id'):
+			if cve in cve_ids:
+				through_rows[Vulnerability.cve_ids.through].append(
+					Vulnerability.cve_ids.through(
+						vulnerability_id=vulnerability.id,
+						cveid_id=cve_ids[cve].id))
+		for cwe in get_classification(json_st, 'cwe-id'):
+			if cwe in cwe_ids:
+				through_rows[Vulnerability.cwe_ids.through].append(
+					Vulnerability.cwe_ids.through(
+						vulnerability_id=vulnerability.id,
+						cweid_id=cwe_ids[cwe].id))
+		for url in info.get('reference') or []:
+			if url in references:
+				through_rows[Vulnerability.references.through].append(
+					Vulnerability.references.through(
+						vulnerability_id=vulnerability.id,
+						vulnerabilityreference_id=references[url].id))
+		if subscan:
+			through_rows[Vulnerability.vuln_subscan_ids.through].append(
+				Vulnerability.vuln_subscan_ids.through(
+					vulnerability_id=vulnerability.id,
+					subscan_id=subscan.id))
+	for through, rows in through_rows.items():
+		if rows:
+			through.objects.bulk_create(rows, ignore_conflicts=True)
+
+	# send notification for all vulnerabilities except info
+	notification = get_notification_settings()
+	if notification and notification.send_vuln_notif:
+		notified = [
+			vulnerability.id for vulnerability in vulnerabilities
+			if vulnerability.severity != 0]
+		if notified:
+			send_vulnerability_notifications.delay(notified)
+
+	# send report to hackerone
+	hackerone = get_hackerone_settings()
+	if hackerone and domain.h1_team_handle:
+		reported_severities = []
+		if hackerone.send_critical:
+			reported_severities.append(4)
+		if hackerone.send_high:
+			reported_severities.append(3)
+		if hackerone.send_medium:
+			reported_severities.append(2)
+		reported = [
+			vulnerability.id for vulnerability in vulnerabilities
+			if vulnerability.severity in reported_severities]
+		if reported:
+			send_hackerone_reports.delay(reported)
+
+	return vulnerabilities
+
+
+@app.task
+def send_vulnerability_notifications(vulnerability_ids):
+	for vulnerability in Vulnerability.objects.filter(
+			id__in=vulnerability_ids).select_related('endpoint'):
+		message = "*Alert: Vulnerability Identified*"
+		message += "\n\n"
+		message += "A *{}* severity vulnerability has been identified.".format(
+			NUCLEI_REVERSE_SEVERITY_MAP.get(vulnerability.severity))
+		message += "\nVulnerability Name: {}".format(vulnerability.name)
+		message += "\nVulnerable URL: {}".format(
+			vulnerability.endpoint.http_url if vulnerability.endpoint else vulnerability.http_url)
+		send_notification(
+			message,
+			digest_key='scan_{}_vulnerabilities'.format(vulnerability.scan_history_id))
+
+
+@app.task(bind=True, max_retries=NOTIFICATION_MAX_RETRIES)
+def send_notification_message(self, channel, message):
+	'''
+	Sends message to a notification channel, from the notification queue.
+	Messages over the channel rate limit are queued again, failed messages
+	are retried with an exponential backoff.
+	'''
+	if not acquire_notification_slot(channel):
+		send_notification_message.apply_async(args=[channel, message], countdown=1)
+		return
+	try:
+		response = post_notification(channel, message)
+	except requests.RequestException as exception:
+		raise self.retry(exc=exception, countdown=2 ** self.request.retries)
+	if response is None:
+		return
+	if response.status_code == 429 or response.status_code >= 500:
+		countdown = 2 ** self.request.retries
+		if response.headers.get('Retry-After', '').isdigit():
+			countdown = int(response.headers['Retry-After'])
+		raise self.retry(
+			exc=Exception('{} replied {}'.format(channel, response.status_code)),
+			countdown=countdown)
+	if not response.ok:
+		logger.error('Unable to send {} notification: {} {}'.format(
+			channel, response.status_code, response.text))
+
+
+@app.task
+def check_proxies():
+	'''
+	Periodic health check of the configured proxies, probe results update
+	the latency and error rate used to weight the proxy rotation
+	'''
+	if not settings.PROXY_CHECK_URL:
+		return
+	proxies = get_proxy_list()
+	if not proxies:
+		return
+	with ThreadPoolExecutor(max_workers=min(PROXY_CHECK_CONCURRENCY, len(proxies))) as executor:
+		healthy = sum(executor.map(probe_proxy, proxies))
+	logger.info('{} of {} proxies are healthy'.format(healthy, len(proxies)))
+
+
+@app.task
+def flush_notification_digest(digest_key):
+	'''
+	Sends the messages coalesced for digest_key during the digest window
+	'''
+	key = 'notification_digest:{}'.format(digest_key)
+	pipeline = get_redis_connection().pipeline()
+	pipeline.lrange(key, 0, -1)
+	pipeline.delete(key)
+	messages, _ = pipeline.execute()
+	for message in get_digest_messages([message.decode() for message in messages]):
+		send_notification(message)
+
+
+@app.task
+def send_hackerone_reports(vulnerability_ids):
+	for vulnerability_id in vulnerability_ids:
+		try:
+			send_hackerone_report(vulnerability_id)
+		except Exception as exception:
+			logger.error(exception)
+
+
+def save_httpx_results(task, domain, results, subdomain_map):
+	'''
+	Persists a batch of httpx json lines with a fixed number of queries:
+	EndPoints are bulk created, Subdomains bulk updated, Technology and
+	IpAddress upserted and the m2m through rows inserted in bulk.
+	subdomain_map is the {name: Subdomain} map of the scan.
+	Returns the list of alive urls (http status < 400) of the batch.
+	'''
+	discovered_date = timezone.now()
+	is_interesting = get_interesting_matcher()
+	endpoints = []
+	subdomains = {}
+	tech_names = []
+	ip_cdn = {}
+	subdomain_ips = []
+	alive_urls = []
+
+	for json_st in results:
+		try:
+			# fallback for older versions of httpx
+			if 'input' in json_st:
+				subdomain = subdomain_map.get(json_st['input'])
+			else:
+				subdomain = subdomain_map.get(json_st['url'].split("//")[-1])
+			if not subdomain:
+				continue
+			'''
+			Saving Default http urls to EndPoint
+			'''
+			endpoint = EndPoint()
+			endpoint.scan_history = task
+			endpoint.target_domain = domain
+			endpoint.subdomain = subdomain
+			if 'url' in json_st:
+				endpoint.http_url = json_st['url']
+				subdomain.http_url = json_st['url']
+			if 'status_code' in json_st:
+				endpoint.http_status = json_st['status_code']
+				subdomain.http_status = json_st['status_code']
+			if 'title' in json_st:
+				endpoint.page_title = json_st['title']
+				subdomain.page_title = json_st['title']
+			if 'content_length' in json_st:
+				endpoint.content_length = json_st['content_length']
+				subdomain.content_length = json_st['content_length']
+			if 'content_type' in json_st:
+				endpoint.content_type = json_st['content_type']
+				subdomain.content_type = json_st['content_type']
+			if 'webserver' in json_st:
+				endpoint.webserver = json_st['webserver']
+				subdomain.webserver = json_st['webserver']
+			if 'time' in json_st:
+				response_time = get_httpx_response_time(json_st['time'])
+				endpoint.response_time = response_time
+				subdomain.response_time = response_time
+			if 'cnames' in json_st:
+				subdomain.cname = ','.join(json_st['cnames'])
+			endpoint.discovered_date = discovered_date
+			subdomain.discovered_date = discovered_date
+			endpoint.is_default = True
+			endpoint.is_interesting = is_interesting(
+				endpoint.http_url, endpoint.page_title, endpoint.http_status)
+			subdomain.is_interesting = is_interesting(
+				subdomain.name, subdomain.page_title, subdomain.http_status)
+		except Exception as exception:
+			logger.error(exception)
+			continue
+
+		endpoints.append(endpoint)
+		subdomains[subdomain.id] = subdomain
+		tech_names.append((endpoint, json_st.get('tech') or []))
+		for _ip in json_st.get('a') or []:
+			ip_cdn.setdefault(_ip, json_st.get('cdn', False))
+			subdomain_ips.append((subdomain.id, _ip))
+		if json_st.get('host'):
+			ip_cdn.setdefault(json_st['host'], json_st.get('cdn', False))
+
+		if 'status_code' in json_st:
+			sts_code = json_st.get('status_code')
+			if str(sts_code).isdigit() and int(sts_code) < 400:
+				alive_urls.append(json_st['url'])
+
+	if not endpoints:
+		return alive_urls
+
+	EndPoint.objects.bulk_create(endpoints)
+	Subdomain.objects.bulk_update(
+		subdomains.values(),
+		[
+			'http_url',
+			'http_status',
+			'page_title',
+			'content_length',
+			'content_type',
+			'webserver',
+			'response_time',
+			'cname',
+			'discovered_date',
+			'is_interesting',
+		])
+
+	save_httpx_technologies(tech_names)
+
+	ip_addresses = bulk_get_or_create(
+		IpAddress,
+		'address',
+		ip_cdn.keys(),
+		build=lambda address: IpAddress(address=address, is_cdn=ip_cdn[address]))
+	# add geo iso
+	countries = geoip_lookup_many(ip_addresses.keys())
+	country_isos = get_country_isos(set(countries.values()))
+	updated_ips = []
+	for address, ip in ip_addresses.items():
+		iso_object = country_isos.get(countries.get(address))
+		if iso_object and ip.geo_iso_id != iso_object.id:
+			ip.geo_iso = iso_object
+			updated_ips.append(ip)
+	if updated_ips:
+		IpAddress.objects.bulk_update(updated_ips, ['geo_iso'])
+
+	SubdomainIpAddress = Subdomain.ip_addresses.through
+	SubdomainIpAddress.objects.bulk_create(
+		[
+			SubdomainIpAddress(
+				subdomain_id=subdomain_id,
+				ipaddress_id=ip_addresses[address].id)
+			for subdomain_id, address in subdomain_ips
+			if address in ip_addresses
+		],
+		ignore_conflicts=True)
+
+	return alive_urls
+
+
+def save_fetched_httpx_results(scan_history, domain, results, subscan=None):
+	'''
+	Persists a batch of httpx json lines probing the urls gathered by
+	fetch_endpoints with a fixed number of queries: endpoints are resolved
+	for the whole batch, updated with one bulk_update and their
+	technologies upserted. Returns the number of probed urls of the batch.
+	'''
+	results = [json_st for json_st in results if json_st.get('url')]
+	if not results:
+		return 0
+	endpoints = save_fetched_urls(
+		scan_history,
+		domain,
+		[json_st['url'] for json_st in results],
+		subscan)
+
+	is_interesting = get_interesting_matcher()
+	updated_endpoints = {}
+	tech_names = []
+	for json_st in results:
+		endpoint = endpoints[json_st['url']]
+		try:
+			if 'title' in json_st:
+				endpoint.page_title = json_st['title']
+			if 'webserver' in json_st:
+				endpoint.webserver = json_st['webserver']
+			if 'content_length' in json_st:
+				endpoint.content_length = json_st['content_length']
+			if 'content_type' in json_st:
+				endpoint.content_type = json_st['content_type']
+			if 'status_code' in json_st:
+				endpoint.http_status = json_st['status_code']
+			if 'time' in json_st:
+				endpoint.response_time = get_httpx_response_time(json_st['time'])
+			endpoint.is_interesting = is_interesting(
+				endpoint.http_url, endpoint.page_title, endpoint.http_status)
+		except Exception as exception:
+			logger.error(exception)
+			continue
+		updated_endpoints[endpoint.id] = endpoint
+		tech_names.append((endpoint, json_st.get('tech') or []))
+
+	EndPoint.objects.bulk_update(
+		updated_endpoints.values(),
+		[
+			'page_title',
+			'webserver',
+			'content_length',
+			'content_type',
+			'http_status',
+			'response_time',
+			'is_interesting',
+		])
+	save_httpx_technologies(tech_names)
+	return len(results)
+
+
+def save_httpx_technologies(tech_names):
+	'''
+	Upserts the technologies detected by httpx and links them to the
+	endpoints and their subdomains in bulk.
+	tech_names is a list of (EndPoint, [technology name]) tuples.
+	'''
+	technologies = bulk_get_or_create(
+		Technology,
+		'name',
+		[name for _, names in tech_names for name in names])
+	if not technologies:
+		return
+	SubdomainTechnology = Subdomain.technologies.through
+	EndPointTechnology = EndPoint.technologies.through
+	SubdomainTechnology.objects.bulk_create(
+		[
+			SubdomainTechnology(
+				subdomain_id=endpoint.subdomain_id,
+				technology_id=technologies[name].id)
+			for endpoint, names in tech_names for name in names
+			if name in technologies and endpoint.subdomain_id
+		],
+		ignore_conflicts=True)
+	EndPointTechnology.objects.bulk_create(
+		[
+			EndPointTechnology(
+				endpoint_id=endpoint.id,
+				technology_id=technologies[name].id)
+			for endpoint, names in tech_names for name in names
+			if name in technologies
+		],
+		ignore_conflicts=True)
+
+
+def get_httpx_response_time(time):
+	'''
+	Returns the httpx response time, such as 120.5ms or 1.2s, in seconds
+	'''
+	response_time = float(''.join(ch for ch in time if not ch.isalpha()))
+	if time[-2:] == 'ms':
+		response_time = response_time / 1000
+	return response_time
+
+
 def perform_osint(scan_history, domain, yaml_configuration, results_dir):
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('reNgine has initiated OSINT on target {}'.format(domain.name))
 
 	if 'discover' in yaml_configuration[OSINT]:
@@ -2283,7 +3381,7 @@ def perform_osint(scan_history, domain, yaml_configuration, results_dir):
 	if 'dork' in yaml_configuration[OSINT]:
 		dorking(scan_history, yaml_configuration)
 
-	if notification and notification[0].send_scan_status_notif:
+	if notification and notification.send_scan_status_notif:
 		send_notification('reNgine has completed performing OSINT on target {}'.format(domain.name))
 
 
@@ -2632,8 +3730,8 @@ def get_and_save_employees(scan_history, results_dir):
 	theHarvester_location = '/usr/src/github/theHarvester'
 
 	# update proxies.yaml
-	if Proxy.objects.all().exists():
-		proxy = Proxy.objects.all()[0]
+	proxy = get_proxy_settings()
+	if proxy:
 		if proxy.use_proxy:
 			proxy_list = proxy.proxies.splitlines()
 			yaml_data = {'http' : proxy_list}
@@ -2841,8 +3939,6 @@ def passive_port_scanning(
 	print("Debug: Initiating Passive Port Scan")
 	logger.info("Skipping naabu | Using SMAP scan - Global Overide Passive = True")  
 	# Call your function or method for port scanning here
-	# Random sleep to prevent ip and port being overwritten
-	sleep(randint(1,5))
 	'''
 	This function is responsible for running the port scan
 	'''
@@ -2850,8 +3946,8 @@ def passive_port_scanning(
 	port_results_file = results_dir + '/' + output_file_name
 
 	domain_name = domain.name if domain else subdomain
-	notification = Notification.objects.all()
-	if notification and notification[0].send_scan_status_notif:
+	notification = get_notification_settings()
+	if notification and notification.send_scan_status_notif:
 		send_notification('Port Scan initiated for {}'.format(domain_name))
 
 	# SMAP command
@@ -2886,48 +3982,16 @@ def passive_port_scanning(
 		with open(port_results_file, 'r') as f:
 			smap_results = json.load(f)
 
-		for result in smap_results:
-			ip_address = result['ip']
-			host = result['user_hostname']
-			for port_info in result['ports']:
-				port_number = port_info['port']
-
-				# see if port already exists
-				if Port.objects.filter(number__exact=port_number).exists():
-					port = Port.objects.get(number=port_number)
-				else:
-					port = Port()
-					port.number = port_number
-
-					if port_number in UNCOMMON_WEB_PORTS:
-						port.is_uncommon = True
-					port_detail = whatportis.get_ports(str(port_number))
-					debug_port = len(port_detail)
-					if len(port_detail):
-						port.service_name = port_detail[0].name
-						port.description = port_detail[0].description
-					port.save()
-
-
-				if IpAddress.objects.filter(address=ip_address).exists():
-					ip = IpAddress.objects.get(address=ip_address)
-				else:
-					# create a new ip
-					ip = IpAddress()
-					ip.address = ip_address
-					ip.save()
-				ip.ports.add(port)
-				ip.save()
-
-				if subscan:
-					ip.ip_subscan_ids.add(subscan)
-					ip.save()
-
-				# if this ip does not belong to host, we also need to add to specific host
-				if not Subdomain.objects.filter(name=host, scan_history=scan_history, ip_addresses__address=ip_address).exists():
-					subdomain = Subdomain.objects.get(scan_history=scan_history, name=host)
-					subdomain.ip_addresses.add(ip)
-					subdomain.save()
+		triples = set(
+			(result.get('user_hostname'), result['ip'], port_info['port'])
+			for result in smap_results
+			for port_info in result.get('ports') or [])
+		triples = list(triples)
+		for index in range(0, len(triples), DEFAULT_INGEST_BATCH_SIZE):
+			save_ip_port_triples(
+				scan_history,
+				triples[index:index + DEFAULT_INGEST_BATCH_SIZE],
+				subscan)
 	except BaseException as exception:
 		logging.error(exception)
 		if not subscan:
@@ -9,3 +9,4 @@ admin.site.register(InterestingLookupModel)
 admin.site.register(Notification)
 admin.site.register(VulnerabilityReportSetting)
 admin.site.register(InstalledExternalTool)
+admin.site.register(NucleiTemplateUpdate)
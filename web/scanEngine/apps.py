@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ScanengineConfig(AppConfig):
     name = 'scanEngine'
+
+    def ready(self):
+        # connect the InterestingLookupModel cache invalidation
+        import scanEngine.signals
@@ -0,0 +1,104 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:20
+
+from django.db import migrations
+from django.db.backends.utils import truncate_name
+
+
+APP_LABEL = 'scanEngine'
+
+# db_table set in the models' Meta without a migration, (model, table)
+TABLES = [
+    ('configuration', 'scanengine_configuration'),
+    ('enginetype', 'scanengine_enginetype'),
+    ('hackerone', 'scanengine_hackerone'),
+    ('installedexternaltool', 'scanengine_installedexternaltool'),
+    ('interestinglookupmodel', 'scanengine_interestinglookupmodel'),
+    ('notification', 'scanengine_notification'),
+    ('proxy', 'scanengine_proxy'),
+    ('vulnerabilityreportsetting', 'scanengine_vulnerabilityreportsetting'),
+    ('wordlist', 'scanengine_wordlist'),
+]
+
+
+def alter_db_tables(apps, schema_editor, reverse=False):
+    '''
+    Renames the tables of TABLES and of their many-to-many fields, unless
+    they already were. Instances generating their own migrations on start
+    have renamed them in a local migration already.
+    '''
+    existing = set(schema_editor.connection.introspection.table_names())
+    max_length = schema_editor.connection.ops.max_name_length()
+
+    def alter_db_table(model, old_table, new_table):
+        if reverse:
+            old_table, new_table = new_table, old_table
+        if old_table in existing and new_table not in existing:
+            schema_editor.alter_db_table(model, old_table, new_table)
+
+    for model_name, table in TABLES:
+        model = apps.get_model(APP_LABEL, model_name)
+        alter_db_table(model, model._meta.db_table, table)
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                alter_db_table(
+                    through,
+                    through._meta.db_table,
+                    truncate_name('{}_{}'.format(table, field.name), max_length))
+
+
+def unalter_db_tables(apps, schema_editor):
+    alter_db_tables(apps, schema_editor, reverse=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanEngine', '0003_enginetype_waf_detection'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(alter_db_tables, unalter_db_tables),
+            ],
+            state_operations=[
+                migrations.AlterModelTable(
+                    name='configuration',
+                    table='scanengine_configuration',
+                ),
+                migrations.AlterModelTable(
+                    name='enginetype',
+                    table='scanengine_enginetype',
+                ),
+                migrations.AlterModelTable(
+                    name='hackerone',
+                    table='scanengine_hackerone',
+                ),
+                migrations.AlterModelTable(
+                    name='installedexternaltool',
+                    table='scanengine_installedexternaltool',
+                ),
+                migrations.AlterModelTable(
+                    name='interestinglookupmodel',
+                    table='scanengine_interestinglookupmodel',
+                ),
+                migrations.AlterModelTable(
+                    name='notification',
+                    table='scanengine_notification',
+                ),
+                migrations.AlterModelTable(
+                    name='proxy',
+                    table='scanengine_proxy',
+                ),
+                migrations.AlterModelTable(
+                    name='vulnerabilityreportsetting',
+                    table='scanengine_vulnerabilityreportsetting',
+                ),
+                migrations.AlterModelTable(
+                    name='wordlist',
+                    table='scanengine_wordlist',
+                ),
+            ],
+        ),
+    ]
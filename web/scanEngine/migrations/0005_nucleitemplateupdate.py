@@ -0,0 +1,25 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanEngine', '0004_alter_db_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NucleiTemplateUpdate',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('version', models.CharField(blank=True, max_length=100, null=True)),
+                ('update_date', models.DateTimeField()),
+                ('is_successful', models.BooleanField(default=True)),
+            ],
+            options={
+                'db_table': 'scanengine_nucleitemplateupdate',
+            },
+        ),
+    ]
@@ -157,3 +157,16 @@ class InstalledExternalTool(models.Model):
         
     def __str__(self):
         return self.name
+
+
+class NucleiTemplateUpdate(models.Model):
+    id = models.AutoField(primary_key=True)
+    version = models.CharField(max_length=100, null=True, blank=True)
+    update_date = models.DateTimeField()
+    is_successful = models.BooleanField(default=True)
+
+    class Meta:
+        db_table = "scanengine_nucleitemplateupdate"
+
+    def __str__(self):
+        return str(self.version)
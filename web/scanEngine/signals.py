@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from reNgine.definitions import INTERESTING_LOOKUP_CACHE_KEY, SETTINGS_CACHE_KEY
+from scanEngine.models import InterestingLookupModel, Notification, Proxy, Hackerone
+
+
+@receiver(post_save, sender=InterestingLookupModel)
+@receiver(post_delete, sender=InterestingLookupModel)
+def interesting_lookup_changed(sender, **kwargs):
+    '''
+    Drops the cached lookup settings and recomputes the is_interesting flag
+    of the existing subdomains and endpoints
+    '''
+    from reNgine.tasks import refresh_interesting_flags
+    cache.delete(INTERESTING_LOOKUP_CACHE_KEY)
+    transaction.on_commit(refresh_interesting_flags.delay)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+@receiver(post_save, sender=Proxy)
+@receiver(post_delete, sender=Proxy)
+@receiver(post_save, sender=Hackerone)
+@receiver(post_delete, sender=Hackerone)
+def settings_changed(sender, **kwargs):
+    '''
+    Drops the cached settings of the saved singleton model, once committed
+    so that no worker caches the previous row again in the meantime
+    '''
+    key = SETTINGS_CACHE_KEY.format(sender._meta.db_table)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,82 @@
+import hashlib
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import MD5
+
+from startScan.models import *
+
+
+class Command(BaseCommand):
+	help = 'Prints the query plans of the hot lookup queries, use --save before and --compare after a migration'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--scan-id', type=int, help='Scan to take the sample values from, latest scan by default')
+		parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE, executes the queries')
+		parser.add_argument('--save', help='Write the plans to this json file')
+		parser.add_argument('--compare', help='Print the plans next to the ones saved in this json file')
+
+	def handle(self, *args, **options):
+		if options['scan_id']:
+			scan = ScanHistory.objects.filter(id=options['scan_id']).first()
+		else:
+			scan = ScanHistory.objects.order_by('-id').first()
+		if not scan:
+			raise CommandError('No scan found to take sample values from')
+
+		plans = {}
+		for name, queryset in self.get_queries(scan):
+			plans[name] = queryset.explain(analyze=options['analyze'])
+
+		previous_plans = {}
+		if options['compare']:
+			with open(options['compare']) as plans_file:
+				previous_plans = json.load(plans_file)
+
+		for name, plan in plans.items():
+			self.stdout.write(self.style.MIGRATE_HEADING(name))
+			if name in previous_plans:
+				self.stdout.write(self.style.WARNING('before:'))
+				self.stdout.write(previous_plans[name])
+				self.stdout.write(self.style.SUCCESS('after:'))
+			self.stdout.write(plan + '\n')
+
+		if options['save']:
+			with open(options['save'], 'w') as plans_file:
+				json.dump(plans, plans_file, indent=2)
+			self.stdout.write('Plans saved to {}'.format(options['save']))
+
+	def get_queries(self, scan):
+		subdomain = Subdomain.objects.filter(scan_history=scan).first()
+		endpoint = EndPoint.objects.filter(scan_history=scan).first()
+		ip = IpAddress.objects.filter(ip_addresses__scan_history=scan).first()
+		technology = Technology.objects.first()
+		cve = CveId.objects.first()
+		tag = VulnerabilityTags.objects.first()
+
+		subdomain_name = subdomain.name if subdomain else ''
+		http_url = endpoint.http_url if endpoint else ''
+
+		return [
+			('Subdomain(scan_history, name)', Subdomain.objects.filter(
+				scan_history=scan,
+				name=subdomain_name)),
+			('EndPoint(scan_history, md5(http_url))', EndPoint.objects.annotate(
+				url_hash=MD5('http_url')).filter(
+				scan_history=scan,
+				url_hash=hashlib.md5(http_url.encode()).hexdigest())),
+			('Vulnerability(scan_history, severity)', Vulnerability.objects.filter(
+				scan_history=scan,
+				severity=4)),
+			('ScanActivity(scan_of, time)', ScanActivity.objects.filter(
+				scan_of=scan).order_by('-time')),
+			('IpAddress.address', IpAddress.objects.filter(
+				address=ip.address if ip else '')),
+			('Port.number', Port.objects.filter(number=80)),
+			('Technology.name', Technology.objects.filter(
+				name=technology.name if technology else '')),
+			('CveId.name', CveId.objects.filter(
+				name=cve.name if cve else '')),
+			('VulnerabilityTags.name', VulnerabilityTags.objects.filter(
+				name=tag.name if tag else '')),
+		]
@@ -0,0 +1,164 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:12
+
+from django.db import migrations
+from django.db.backends.utils import truncate_name
+
+
+APP_LABEL = 'startScan'
+
+# db_table set in the models' Meta without a migration, (model, table)
+TABLES = [
+    ('countryiso', 'startscan_countryiso'),
+    ('cveid', 'startscan_cveid'),
+    ('cweid', 'startscan_cweid'),
+    ('directoryfile', 'startscan_directoryfile'),
+    ('directoryscan', 'startscan_directoryscan'),
+    ('dork', 'startscan_dork'),
+    ('email', 'startscan_email'),
+    ('employee', 'startscan_employee'),
+    ('endpoint', 'startscan_endpoint'),
+    ('ipaddress', 'startscan_ipaddress'),
+    ('metafinderdocument', 'startscan_metafinderdocument'),
+    ('port', 'startscan_port'),
+    ('scanactivity', 'startscan_scanactivity'),
+    ('scanhistory', 'startscan_scanhistory'),
+    ('subdomain', 'startscan_subdomain'),
+    ('subscan', 'startscan_subscan'),
+    ('technology', 'startscan_technology'),
+    ('vulnerability', 'startscan_vulnerability'),
+    ('vulnerabilityreference', 'startscan_vulnerabilityreference'),
+    ('vulnerabilitytags', 'startscan_vulnerabilitytags'),
+    ('waf', 'startscan_waf'),
+]
+
+
+def alter_db_tables(apps, schema_editor, reverse=False):
+    '''
+    Renames the tables of TABLES and of their many-to-many fields, unless
+    they already were. Instances generating their own migrations on start
+    have renamed them in a local migration already.
+    '''
+    existing = set(schema_editor.connection.introspection.table_names())
+    max_length = schema_editor.connection.ops.max_name_length()
+
+    def alter_db_table(model, old_table, new_table):
+        if reverse:
+            old_table, new_table = new_table, old_table
+        if old_table in existing and new_table not in existing:
+            schema_editor.alter_db_table(model, old_table, new_table)
+
+    for model_name, table in TABLES:
+        model = apps.get_model(APP_LABEL, model_name)
+        alter_db_table(model, model._meta.db_table, table)
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                alter_db_table(
+                    through,
+                    through._meta.db_table,
+                    truncate_name('{}_{}'.format(table, field.name), max_length))
+
+
+def unalter_db_tables(apps, schema_editor):
+    alter_db_tables(apps, schema_editor, reverse=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0030_auto_20220718_1830'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(alter_db_tables, unalter_db_tables),
+            ],
+            state_operations=[
+                migrations.AlterModelTable(
+                    name='countryiso',
+                    table='startscan_countryiso',
+                ),
+                migrations.AlterModelTable(
+                    name='cveid',
+                    table='startscan_cveid',
+                ),
+                migrations.AlterModelTable(
+                    name='cweid',
+                    table='startscan_cweid',
+                ),
+                migrations.AlterModelTable(
+                    name='directoryfile',
+                    table='startscan_directoryfile',
+                ),
+                migrations.AlterModelTable(
+                    name='directoryscan',
+                    table='startscan_directoryscan',
+                ),
+                migrations.AlterModelTable(
+                    name='dork',
+                    table='startscan_dork',
+                ),
+                migrations.AlterModelTable(
+                    name='email',
+                    table='startscan_email',
+                ),
+                migrations.AlterModelTable(
+                    name='employee',
+                    table='startscan_employee',
+                ),
+                migrations.AlterModelTable(
+                    name='endpoint',
+                    table='startscan_endpoint',
+                ),
+                migrations.AlterModelTable(
+                    name='ipaddress',
+                    table='startscan_ipaddress',
+                ),
+                migrations.AlterModelTable(
+                    name='metafinderdocument',
+                    table='startscan_metafinderdocument',
+                ),
+                migrations.AlterModelTable(
+                    name='port',
+                    table='startscan_port',
+                ),
+                migrations.AlterModelTable(
+                    name='scanactivity',
+                    table='startscan_scanactivity',
+                ),
+                migrations.AlterModelTable(
+                    name='scanhistory',
+                    table='startscan_scanhistory',
+                ),
+                migrations.AlterModelTable(
+                    name='subdomain',
+                    table='startscan_subdomain',
+                ),
+                migrations.AlterModelTable(
+                    name='subscan',
+                    table='startscan_subscan',
+                ),
+                migrations.AlterModelTable(
+                    name='technology',
+                    table='startscan_technology',
+                ),
+                migrations.AlterModelTable(
+                    name='vulnerability',
+                    table='startscan_vulnerability',
+                ),
+                migrations.AlterModelTable(
+                    name='vulnerabilityreference',
+                    table='startscan_vulnerabilityreference',
+                ),
+                migrations.AlterModelTable(
+                    name='vulnerabilitytags',
+                    table='startscan_vulnerabilitytags',
+                ),
+                migrations.AlterModelTable(
+                    name='waf',
+                    table='startscan_waf',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,145 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:11
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.text
+
+
+APP_LABEL = 'startScan'
+
+# lookup tables becoming unique, (model, fields)
+UNIQUE_LOOKUPS = [
+    ('CveId', ['name']),
+    ('CweId', ['name']),
+    ('IpAddress', ['address']),
+    ('Port', ['number']),
+    ('Technology', ['name']),
+    ('VulnerabilityTags', ['name']),
+    ('CountryISO', ['iso', 'name']),
+]
+
+
+def merge_duplicates(apps, schema_editor, model_name, fields):
+    '''
+    Merges rows sharing the same values of fields into the row with the
+    lowest id, repointing foreign keys and m2m rows, so that the unique
+    constraints below can be created on existing databases.
+    '''
+    model = apps.get_model(APP_LABEL, model_name)
+    table = schema_editor.quote_name(model._meta.db_table)
+    columns = ', '.join(
+        schema_editor.quote_name(model._meta.get_field(field).column)
+        for field in fields)
+    not_null = ' AND '.join(
+        '{} IS NOT NULL'.format(schema_editor.quote_name(model._meta.get_field(field).column))
+        for field in fields)
+    duplicates = '''
+        SELECT id, keep_id FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY {columns}) AS keep_id
+            FROM {table} WHERE {not_null}
+        ) grouped WHERE id <> keep_id
+    '''.format(columns=columns, table=table, not_null=not_null)
+
+    with schema_editor.connection.cursor() as cursor:
+        for related_model in apps.get_models():
+            for field in related_model._meta.local_fields:
+                if field.is_relation and field.remote_field.model == model:
+                    cursor.execute(
+                        'UPDATE {rel} SET {col} = d.keep_id FROM ({dups}) d WHERE {rel}.{col} = d.id'.format(
+                            rel=schema_editor.quote_name(related_model._meta.db_table),
+                            col=schema_editor.quote_name(field.column),
+                            dups=duplicates))
+            for field in related_model._meta.local_many_to_many:
+                through = field.remote_field.through
+                if not through._meta.auto_created:
+                    continue
+                through_fields = [f for f in through._meta.local_fields if f.is_relation]
+                for through_field in through_fields:
+                    if through_field.remote_field.model != model:
+                        continue
+                    other_field = [f for f in through_fields if f is not through_field][0]
+                    params = dict(
+                        rel=schema_editor.quote_name(through._meta.db_table),
+                        col=schema_editor.quote_name(through_field.column),
+                        other=schema_editor.quote_name(other_field.column),
+                        dups=duplicates)
+                    cursor.execute(
+                        '''INSERT INTO {rel} ({other}, {col})
+                        SELECT DISTINCT {rel}.{other}, d.keep_id FROM {rel} JOIN ({dups}) d ON {rel}.{col} = d.id
+                        ON CONFLICT DO NOTHING'''.format(**params))
+                    cursor.execute(
+                        'DELETE FROM {rel} USING ({dups}) d WHERE {rel}.{col} = d.id'.format(**params))
+        cursor.execute(
+            'DELETE FROM {table} USING ({dups}) d WHERE {table}.id = d.id'.format(
+                table=table,
+                dups=duplicates))
+
+
+def merge_all_duplicates(apps, schema_editor):
+    for model_name, fields in UNIQUE_LOOKUPS:
+        merge_duplicates(apps, schema_editor, model_name, fields)
+
+
+class Migration(migrations.Migration):
+
+    # the duplicate merge must be committed before the unique constraints
+    # are created, postgres refuses to alter tables with pending trigger events
+    atomic = False
+
+    dependencies = [
+        ('startScan', '0031_alter_db_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_all_duplicates, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='cveid',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='cweid',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='ipaddress',
+            name='address',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='port',
+            name='number',
+            field=models.IntegerField(default=0, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='technology',
+            name='name',
+            field=models.CharField(blank=True, max_length=500, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='vulnerabilitytags',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='endpoint',
+            index=models.Index(django.db.models.expressions.F('scan_history'), django.db.models.functions.text.MD5('http_url'), name='endpoint_scan_url_md5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scanactivity',
+            index=models.Index(fields=['scan_of', 'time'], name='activity_scan_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subdomain',
+            index=models.Index(fields=['scan_history', 'name'], name='subdomain_scan_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vulnerability',
+            index=models.Index(fields=['scan_history', 'severity'], name='vuln_scan_severity_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='countryiso',
+            constraint=models.UniqueConstraint(fields=('iso', 'name'), name='unique_country_iso'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:17
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def get_lookup_query(apps, url_field):
+    '''
+    Interesting lookup of reNgine.common_func at the time of this migration
+    '''
+    InterestingLookupModel = apps.get_model('scanEngine', 'InterestingLookupModel')
+    default_lookup = InterestingLookupModel.objects.filter(id=1).first()
+    custom_lookup = InterestingLookupModel.objects.filter(
+        custom_type=True).order_by('-id').first()
+
+    keywords = []
+    for lookup_model in (default_lookup, custom_lookup):
+        if lookup_model and lookup_model.keywords:
+            keywords += [key.strip() for key in lookup_model.keywords.split(',')]
+
+    url_lookup_query = Q()
+    page_title_lookup_query = Q()
+    for key in filter(None, keywords):
+        if not custom_lookup or custom_lookup.url_lookup:
+            url_lookup_query |= Q(**{url_field + '__icontains': key})
+        if not custom_lookup or custom_lookup.title_lookup:
+            page_title_lookup_query |= Q(page_title__iregex='\\y{}\\y'.format(key))
+
+    query = url_lookup_query | page_title_lookup_query
+    if query and custom_lookup and custom_lookup.condition_200_http_lookup:
+        query &= Q(http_status__exact=200)
+    return query
+
+
+def flag_interesting(apps, schema_editor):
+    for model_name, url_field in (('Subdomain', 'name'), ('EndPoint', 'http_url')):
+        query = get_lookup_query(apps, url_field)
+        if query:
+            model = apps.get_model('startScan', model_name)
+            model.objects.filter(query).update(is_interesting=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanEngine', '0004_alter_db_tables'),
+        ('startScan', '0032_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='endpoint',
+            name='is_interesting',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='subdomain',
+            name='is_interesting',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_interesting, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='endpoint',
+            index=models.Index(fields=['scan_history', 'is_interesting'], name='endpoint_interesting_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subdomain',
+            index=models.Index(fields=['scan_history', 'is_interesting'], name='subdomain_interesting_idx'),
+        ),
+    ]
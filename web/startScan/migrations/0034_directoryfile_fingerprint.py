@@ -0,0 +1,87 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:26
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def get_fingerprint(name, length, lines, http_status, words, url, content_type):
+    '''
+    DirectoryFile.get_fingerprint at the time of this migration
+    '''
+    return hashlib.md5(json.dumps(
+        [name, length, lines, http_status, words, url, content_type]
+    ).encode()).hexdigest()
+
+
+def fingerprint_directory_files(apps, schema_editor):
+    '''
+    Fingerprints the existing files and merges the duplicates into the first
+    file of each fingerprint, so that the unique index can be created
+    '''
+    DirectoryFile = apps.get_model('startScan', 'DirectoryFile')
+    DirectoryScan = apps.get_model('startScan', 'DirectoryScan')
+    Through = DirectoryScan.directory_files.through
+
+    fingerprints = {}
+    duplicates = {}
+    files = []
+    for file in DirectoryFile.objects.order_by('id').iterator(chunk_size=BATCH_SIZE):
+        fingerprint = get_fingerprint(
+            file.name,
+            file.length,
+            file.lines,
+            file.http_status,
+            file.words,
+            file.url,
+            file.content_type)
+        if fingerprint in fingerprints:
+            duplicates[file.id] = fingerprints[fingerprint]
+            continue
+        fingerprints[fingerprint] = file.id
+        file.fingerprint = fingerprint
+        files.append(file)
+        if len(files) >= BATCH_SIZE:
+            DirectoryFile.objects.bulk_update(files, ['fingerprint'])
+            files = []
+    DirectoryFile.objects.bulk_update(files, ['fingerprint'])
+
+    duplicate_ids = list(duplicates)
+    for offset in range(0, len(duplicate_ids), BATCH_SIZE):
+        chunk = duplicate_ids[offset:offset + BATCH_SIZE]
+        Through.objects.bulk_create([
+            Through(
+                directoryscan_id=row.directoryscan_id,
+                directoryfile_id=duplicates[row.directoryfile_id])
+            for row in Through.objects.filter(directoryfile_id__in=chunk)
+        ], ignore_conflicts=True)
+        DirectoryFile.objects.filter(id__in=chunk).delete()
+
+
+class Migration(migrations.Migration):
+
+    # the merge must be committed before the unique index is created,
+    # postgres refuses to alter tables with pending trigger events
+    atomic = False
+
+    dependencies = [
+        ('startScan', '0033_interesting_flag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directoryfile',
+            name='fingerprint',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.RunPython(fingerprint_directory_files, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='directoryfile',
+            name='fingerprint',
+            field=models.CharField(max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:05
+
+from django.db import migrations
+
+
+def merge_duplicate_references(apps, schema_editor):
+    '''
+    Merges the references sharing the same url into the one with the lowest
+    id, so that the unique index below can be created on existing databases
+    '''
+    Vulnerability = apps.get_model('startScan', 'Vulnerability')
+    through = Vulnerability.references.through
+    duplicates = '''
+        SELECT id, keep_id FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY url) AS keep_id
+            FROM startscan_vulnerabilityreference
+        ) grouped WHERE id <> keep_id
+    '''
+    params = dict(
+        rel=schema_editor.quote_name(through._meta.db_table),
+        dups=duplicates)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            '''INSERT INTO {rel} (vulnerability_id, vulnerabilityreference_id)
+            SELECT DISTINCT {rel}.vulnerability_id, d.keep_id FROM {rel}
+            JOIN ({dups}) d ON {rel}.vulnerabilityreference_id = d.id
+            ON CONFLICT DO NOTHING'''.format(**params))
+        cursor.execute(
+            'DELETE FROM {rel} USING ({dups}) d WHERE {rel}.vulnerabilityreference_id = d.id'.format(**params))
+        cursor.execute(
+            'DELETE FROM startscan_vulnerabilityreference USING ({dups}) d '
+            'WHERE startscan_vulnerabilityreference.id = d.id'.format(dups=duplicates))
+
+
+class Migration(migrations.Migration):
+
+    # the duplicate merge must be committed before the unique index is
+    # created, postgres refuses to alter tables with pending trigger events
+    atomic = False
+
+    dependencies = [
+        ('startScan', '0034_directoryfile_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_references, migrations.RunPython.noop, atomic=True),
+        # urls may be longer than a btree index row, the md5 of the url is
+        # indexed instead. Django 3.2 constraints cannot hold expressions,
+        # the index is not part of the model state.
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX vuln_reference_url_md5_uniq '
+            'ON startscan_vulnerabilityreference (md5(url))',
+            'DROP INDEX vuln_reference_url_md5_uniq'),
+    ]
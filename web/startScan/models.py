@@ -1,7 +1,10 @@
 import datetime
+import hashlib
+import json
 
 from django.db import models
-from django.db.models import JSONField
+from django.db.models import JSONField, F
+from django.db.models.functions import MD5
 from django.core.serializers import serialize
 from django.http import JsonResponse
 from django.utils import timezone
@@ -172,9 +175,15 @@ class Subdomain(models.Model):
 	ip_addresses = models.ManyToManyField('IPAddress', related_name='ip_addresses', blank=True)
 	directories = models.ManyToManyField('DirectoryScan', related_name='directories', blank=True)
 	waf = models.ManyToManyField('Waf', related_name='waf', blank=True)
+	# matched against the interesting lookup keywords when saved
+	is_interesting = models.BooleanField(default=False)
 
 	class Meta:
 		db_table = "startscan_subdomain"
+		indexes = [
+			models.Index(fields=['scan_history', 'name'], name='subdomain_scan_name_idx'),
+			models.Index(fields=['scan_history', 'is_interesting'], name='subdomain_interesting_idx'),
+		]
 
 	
 	def __str__(self):
@@ -312,9 +321,16 @@ class EndPoint(models.Model):
 	technologies = models.ManyToManyField('Technology', related_name='technology')
 	# used for subscans
 	endpoint_subscan_ids = models.ManyToManyField('SubScan', related_name='endpoint_subscan_ids', blank=True)
+	# matched against the interesting lookup keywords when saved
+	is_interesting = models.BooleanField(default=False)
 
 	class Meta:
 		db_table = "startscan_endpoint"
+		indexes = [
+			# http_url is too long for a btree index, index its md5 instead
+			models.Index(F('scan_history'), MD5('http_url'), name='endpoint_scan_url_md5_idx'),
+			models.Index(fields=['scan_history', 'is_interesting'], name='endpoint_interesting_idx'),
+		]
 		
 	def __str__(self):
 		return self.http_url
@@ -322,7 +338,7 @@ class EndPoint(models.Model):
 
 class VulnerabilityTags(models.Model):
 	id = models.AutoField(primary_key=True)
-	name = models.CharField(max_length=100)
+	name = models.CharField(max_length=100, unique=True)
 
 	class Meta:
 		db_table = "startscan_vulnerabilitytags"
@@ -333,6 +349,7 @@ class VulnerabilityTags(models.Model):
 
 class VulnerabilityReference(models.Model):
 	id = models.AutoField(primary_key=True)
+	# unique on md5(url), see migration 0035_vulnerabilityreference_unique_url
 	url = models.CharField(max_length=5000)
 
 	class Meta:
@@ -344,7 +361,7 @@ class VulnerabilityReference(models.Model):
 
 class CveId(models.Model):
 	id = models.AutoField(primary_key=True)
-	name = models.CharField(max_length=100)
+	name = models.CharField(max_length=100, unique=True)
 
 	class Meta:
 		db_table = "startscan_cveid"
@@ -355,7 +372,7 @@ class CveId(models.Model):
 
 class CweId(models.Model):
 	id = models.AutoField(primary_key=True)
-	name = models.CharField(max_length=100)
+	name = models.CharField(max_length=100, unique=True)
 
 	class Meta:
 		db_table = "startscan_cweid"
@@ -409,6 +426,9 @@ class Vulnerability(models.Model):
 
 	class Meta:
 		db_table = "startscan_vulnerability"
+		indexes = [
+			models.Index(fields=['scan_history', 'severity'], name='vuln_scan_severity_idx'),
+		]
 
 	def __str__(self):
 		return self.name
@@ -427,6 +447,9 @@ class ScanActivity(models.Model):
 
 	class Meta:
 		db_table = "startscan_scanactivity"
+		indexes = [
+			models.Index(fields=['scan_of', 'time'], name='activity_scan_time_idx'),
+		]
 		
 	def __str__(self):
 		return str(self.title)
@@ -446,7 +469,7 @@ class Waf(models.Model):
 
 class Technology(models.Model):
 	id = models.AutoField(primary_key=True)
-	name = models.CharField(max_length=500, blank=True, null=True)
+	name = models.CharField(max_length=500, blank=True, null=True, unique=True)
 
 	class Meta:
 		db_table = "startscan_technology"
@@ -462,6 +485,9 @@ class CountryISO(models.Model):
 
 	class Meta:
 		db_table = "startscan_countryiso"
+		constraints = [
+			models.UniqueConstraint(fields=['iso', 'name'], name='unique_country_iso'),
+		]
 		
 	def __str__(self):
 		return str(self.name)
@@ -469,7 +495,7 @@ class CountryISO(models.Model):
 
 class IpAddress(models.Model):
 	id = models.AutoField(primary_key=True)
-	address = models.CharField(max_length=100, blank=True, null=True)
+	address = models.CharField(max_length=100, blank=True, null=True, unique=True)
 	is_cdn = models.BooleanField(default=False)
 	ports = models.ManyToManyField('Port', related_name='ports')
 	geo_iso = models.ForeignKey(
@@ -486,7 +512,7 @@ class IpAddress(models.Model):
 
 class Port(models.Model):
 	id = models.AutoField(primary_key=True)
-	number = models.IntegerField(default=0)
+	number = models.IntegerField(default=0, unique=True)
 	service_name = models.CharField(max_length=100, blank=True, null=True)
 	description = models.CharField(max_length=1000, blank=True, null=True)
 	is_uncommon = models.BooleanField(default=False)
@@ -507,6 +533,8 @@ class DirectoryFile(models.Model):
 	name = models.CharField(max_length=500, blank=True, null=True)
 	url = models.CharField(max_length=5000, blank=True, null=True)
 	content_type = models.CharField(max_length=100, blank=True, null=True)
+	# md5 of the fields above, a ffuf result is stored only once
+	fingerprint = models.CharField(max_length=32, unique=True, null=True)
 
 	class Meta:
 		db_table = "startscan_directoryfile"
@@ -514,6 +542,23 @@ class DirectoryFile(models.Model):
 	def __str__(self):
 		return str(self.name)
 
+	@staticmethod
+	def get_fingerprint(name, length, lines, http_status, words, url, content_type):
+		return hashlib.md5(json.dumps(
+			[name, length, lines, http_status, words, url, content_type]
+		).encode()).hexdigest()
+
+	def save(self, *args, **kwargs):
+		self.fingerprint = self.get_fingerprint(
+			self.name,
+			self.length,
+			self.lines,
+			self.http_status,
+			self.words,
+			self.url,
+			self.content_type)
+		super().save(*args, **kwargs)
+
 
 class DirectoryScan(models.Model):
 	id = models.AutoField(primary_key=True)
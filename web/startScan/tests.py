@@ -1,3 +1,244 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from reNgine.common_func import get_report_path, is_report_cacheable
+from reNgine.tasks import directory_fuzz, finalize_failed_scan
+from scanEngine.models import EngineType, InterestingLookupModel
+from startScan.models import *
+from targetApp.models import Domain
+
+
+class ListQueryCountTestCase(TestCase):
+	'''
+	The subdomain and scan history listings must be served with a fixed
+	number of queries, whatever the number of rows being serialized
+	'''
+
+	def setUp(self):
+		self.user = User.objects.create_user('tester', password='tester')
+		# log in through the login view, the user_logged_in receiver needs
+		# the request of a real login
+		response = self.client.post(
+			reverse('login'),
+			{'username': 'tester', 'password': 'tester'})
+		self.assertEqual(response.status_code, 302)
+		InterestingLookupModel.objects.update_or_create(
+			id=1,
+			defaults={'keywords': 'admin, staging', 'custom_type': False})
+		self.engine = EngineType.objects.create(
+			engine_name='test',
+			subdomain_discovery=True,
+			dir_file_fuzz=False,
+			port_scan=True,
+			fetch_url=False,
+			yaml_configuration='')
+		self.domain = Domain.objects.create(
+			name='example.com',
+			insert_date=timezone.now())
+		self.technology = Technology.objects.create(name='nginx')
+		self.port = Port.objects.create(number=443, service_name='https')
+
+	def create_scan(self, subdomain_count):
+		scan = ScanHistory.objects.create(
+			start_scan_date=timezone.now(),
+			scan_status=2,
+			domain=self.domain,
+			scan_type=self.engine)
+		for i in range(subdomain_count):
+			subdomain = Subdomain.objects.create(
+				scan_history=scan,
+				target_domain=self.domain,
+				name='admin{}.example.com'.format(i),
+				http_status=200)
+			ip = IpAddress.objects.create(address='10.0.{}.{}'.format(scan.id, i))
+			ip.ports.add(self.port)
+			subdomain.ip_addresses.add(ip)
+			subdomain.technologies.add(self.technology)
+			directory_scan = DirectoryScan.objects.create(
+				command_line='ffuf',
+				scanned_date=timezone.now())
+			directory_scan.directory_files.add(DirectoryFile.objects.create(
+				name='admin',
+				url='https://{}/admin?scan={}'.format(subdomain.name, scan.id),
+				http_status=200))
+			subdomain.directories.add(directory_scan)
+			endpoint = EndPoint.objects.create(
+				scan_history=scan,
+				target_domain=self.domain,
+				subdomain=subdomain,
+				http_url='https://{}/'.format(subdomain.name))
+			for severity in range(5):
+				Vulnerability.objects.create(
+					scan_history=scan,
+					target_domain=self.domain,
+					subdomain=subdomain,
+					endpoint=endpoint,
+					template='test',
+					name='test',
+					severity=severity)
+		return scan
+
+	def assert_query_count(self, url, num):
+		with self.assertNumQueries(num):
+			response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+
+	def test_subdomain_datatable_query_count(self):
+		scan = self.create_scan(20)
+		self.assert_query_count(
+			'/api/listDatatableSubdomain/?scan_id={}&format=datatables'.format(scan.id),
+			11)
+
+	def test_list_subdomains_query_count(self):
+		scan = self.create_scan(20)
+		self.assert_query_count('/api/querySubdomains/?scan_id={}'.format(scan.id), 11)
+
+	def test_list_scan_history_query_count(self):
+		for _ in range(5):
+			self.create_scan(2)
+		self.assert_query_count('/api/listScanHistory/', 8)
+
+
+class ReportPathTestCase(TestCase):
+	'''
+	A generated report is served again only while the results of the scan
+	it was rendered from are unchanged
+	'''
+
+	def setUp(self):
+		self.domain = Domain.objects.create(
+			name='example.com',
+			insert_date=timezone.now())
+		self.scan = ScanHistory.objects.create(
+			start_scan_date=timezone.now(),
+			stop_scan_date=timezone.now(),
+			scan_status=2,
+			domain=self.domain,
+			scan_type=EngineType.objects.create(
+				engine_name='test',
+				subdomain_discovery=True,
+				dir_file_fuzz=False,
+				port_scan=False,
+				fetch_url=False,
+				yaml_configuration=''))
+		self.subdomain = Subdomain.objects.create(
+			scan_history=self.scan,
+			target_domain=self.domain,
+			name='admin.example.com')
+		self.vulnerability = Vulnerability.objects.create(
+			scan_history=self.scan,
+			target_domain=self.domain,
+			subdomain=self.subdomain,
+			template='test',
+			name='test',
+			severity=2)
+
+	def test_vulnerability_status_changes_report_path(self):
+		report_path = get_report_path(self.scan, 'full')
+		self.assertEqual(report_path, get_report_path(self.scan, 'full'))
+		self.vulnerability.open_status = False
+		self.vulnerability.save()
+		self.assertNotEqual(report_path, get_report_path(self.scan, 'full'))
+
+	def test_new_results_change_report_path(self):
+		report_path = get_report_path(self.scan, 'full')
+		Subdomain.objects.create(
+			scan_history=self.scan,
+			target_domain=self.domain,
+			name='staging.example.com')
+		self.assertNotEqual(report_path, get_report_path(self.scan, 'full'))
+
+	def test_unfinished_scan_report_is_not_cacheable(self):
+		self.assertTrue(is_report_cacheable(self.scan))
+		self.scan.stop_scan_date = None
+		self.scan.scan_status = 1
+		self.assertFalse(is_report_cacheable(self.scan))
+
+
+class FinalizeFailedScanTestCase(TestCase):
+	'''
+	A scan whose stages did not all finish must not stay running
+	'''
+
+	def setUp(self):
+		self.scan = ScanHistory.objects.create(
+			start_scan_date=timezone.now(),
+			scan_status=1,
+			domain=Domain.objects.create(
+				name='example.com',
+				insert_date=timezone.now()),
+			scan_type=EngineType.objects.create(
+				engine_name='test',
+				subdomain_discovery=True,
+				dir_file_fuzz=False,
+				port_scan=True,
+				fetch_url=False,
+				yaml_configuration=''))
+		self.activity = ScanActivity.objects.create(
+			scan_of=self.scan,
+			title='Port Scanning',
+			time=timezone.now(),
+			status=1)
+
+	def test_running_scan_is_failed(self):
+		finalize_failed_scan(self.scan.id)
+		self.scan.refresh_from_db()
+		self.activity.refresh_from_db()
+		self.assertEqual(self.scan.scan_status, 0)
+		self.assertIsNotNone(self.scan.stop_scan_date)
+		self.assertEqual(self.activity.status, 0)
+
+	def test_aborted_scan_keeps_its_status(self):
+		self.scan.scan_status = 3
+		self.scan.save()
+		finalize_failed_scan(self.scan.id)
+		self.scan.refresh_from_db()
+		self.assertEqual(self.scan.scan_status, 3)
+
+
+class DirectoryFuzzResumeTestCase(TestCase):
+	'''
+	Hosts whose directory fuzz results are saved in the scan are not fuzzed
+	again when the stage runs again
+	'''
+
+	def setUp(self):
+		domain = Domain.objects.create(
+			name='example.com',
+			insert_date=timezone.now())
+		self.scan = ScanHistory.objects.create(
+			start_scan_date=timezone.now(),
+			scan_status=1,
+			domain=domain,
+			scan_type=EngineType.objects.create(
+				engine_name='test',
+				subdomain_discovery=True,
+				dir_file_fuzz=True,
+				port_scan=False,
+				fetch_url=False,
+				yaml_configuration=''))
+		self.domain = domain
+		for name in ('admin.example.com', 'staging.example.com'):
+			Subdomain.objects.create(
+				scan_history=self.scan,
+				target_domain=domain,
+				name=name,
+				http_url='https://{}/'.format(name))
+		directory_scan = DirectoryScan.objects.create(scanned_date=timezone.now())
+		Subdomain.objects.get(name='admin.example.com').directories.add(directory_scan)
 
-# Create your tests here.
+	def test_completed_hosts_are_skipped(self):
+		with mock.patch('reNgine.tasks.os.system', return_value=0) as system:
+			directory_fuzz(
+				self.scan,
+				None,
+				{'dir_file_fuzz': {}},
+				'/tmp',
+				domain=self.domain)
+		commands = [call.args[0] for call in system.call_args_list]
+		self.assertEqual(len(commands), 1)
+		self.assertIn('staging.example.com', commands[0])
@@ -23,6 +23,14 @@ urlpatterns = [
         'create_report/<int:id>',
         views.create_report,
         name='create_report'),
+    path(
+        'report_status/<int:id>',
+        views.report_status,
+        name='report_status'),
+    path(
+        'download_report/<int:id>',
+        views.download_report,
+        name='download_report'),
     path(
         'all/subdomains',
         views.all_subdomains,
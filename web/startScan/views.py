@@ -3,16 +3,12 @@ import logging
 import requests
 import itertools
 import tempfile
-import markdown
 
 from datetime import datetime
 
-from django.template.loader import get_template
-from weasyprint import HTML
-
 from django.shortcuts import render, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseRedirect, HttpResponse
+from django.http import JsonResponse, HttpResponseRedirect, HttpResponse, FileResponse, Http404
 from django.urls import reverse
 from django_celery_beat.models import PeriodicTask, IntervalSchedule, ClockedSchedule
 from django.utils import timezone
@@ -23,7 +19,7 @@ from django.db.models import Count
 from startScan.models import *
 from targetApp.models import *
 from scanEngine.models import EngineType, Configuration
-from reNgine.tasks import initiate_scan, create_scan_activity
+from reNgine.tasks import initiate_scan, create_scan_activity, get_scan_task_ids, generate_report
 from reNgine.celery import app
 
 from reNgine.common_func import *
@@ -306,17 +302,13 @@ def stop_scan(request, id):
     if request.method == "POST":
         scan_history = get_object_or_404(ScanHistory, celery_id=id)
         # stop the celery task
-        app.control.revoke(id, terminate=True, signal='SIGKILL')
+        app.control.revoke(
+            get_scan_task_ids(id), terminate=True, signal='SIGKILL')
         scan_history.scan_status = 3
         scan_history.save()
-        try:
-            last_activity = ScanActivity.objects.filter(
-                scan_of=scan_history).order_by('-pk')[0]
-            last_activity.status = 0
-            last_activity.time = timezone.now()
-            last_activity.save()
-        except Exception as e:
-            print(e)
+        ScanActivity.objects.filter(
+            scan_of=scan_history,
+            status=1).update(status=0, time=timezone.now())
         create_scan_activity(scan_history, "Scan aborted", 0)
         messageData = {'status': 'true'}
         messages.add_message(
@@ -643,96 +635,56 @@ def customize_report(request, id):
 
 
 def create_report(request, id):
-    primary_color = '#FFB74D'
-    secondary_color = '#212121'
-
-    # get report type
-    report_type = request.GET['report_type'] if 'report_type' in request.GET  else 'full'
-
-    if report_type == 'recon':
-        show_recon = True
-        show_vuln = False
-        report_name = 'Reconnaissance Report'
-    elif report_type == 'vulnerability':
-        show_recon = False
-        show_vuln = True
-        report_name = 'Vulnerability Report'
-    else:
-        # default
-        show_recon = True
-        show_vuln = True
-        report_name = 'Full Scan Report'
-
-    scan_object = ScanHistory.objects.get(id=id)
-    unique_vulnerabilities = Vulnerability.objects.filter(scan_history=scan_object).values("name", "severity").annotate(count=Count('name')).order_by('-severity', '-count')
-    all_vulnerabilities = Vulnerability.objects.filter(scan_history=scan_object).order_by('-severity')
-    subdomains = Subdomain.objects.filter(scan_history=scan_object).order_by('-content_length')
-    subdomain_alive_count = Subdomain.objects.filter(
-        scan_history__id=id).values('name').distinct().filter(
-        http_status__exact=200).count()
-    interesting_subdomains = get_interesting_subdomains(scan_history=id)
-    ip_addresses = IpAddress.objects.filter(
-        ip_addresses__in=Subdomain.objects.filter(
-            scan_history__id=id)).distinct()
-
-    data = {
-        'scan_object': scan_object,
-        'unique_vulnerabilities': unique_vulnerabilities,
-        'all_vulnerabilities': all_vulnerabilities,
-        'subdomain_alive_count': subdomain_alive_count,
-        'interesting_subdomains': interesting_subdomains,
-        'subdomains': subdomains,
-        'ip_addresses': ip_addresses,
-        'show_recon': show_recon,
-        'show_vuln': show_vuln,
-        'report_name': report_name,
-    }
-
-    # get report related config
-    if VulnerabilityReportSetting.objects.all().exists():
-        report = VulnerabilityReportSetting.objects.all()[0]
-        data['company_name'] = report.company_name
-        data['company_address'] = report.company_address
-        data['company_email'] = report.company_email
-        data['company_website'] = report.company_website
-        data['show_rengine_banner'] = report.show_rengine_banner
-        data['show_footer'] = report.show_footer
-        data['footer_text'] = report.footer_text
-        data['show_executive_summary'] = report.show_executive_summary
-
-        primary_color = report.primary_color
-        secondary_color = report.secondary_color
-
-        description = report.executive_summary_description
-
-        # replace executive_summary_description with template syntax!
-        description = description.replace('{scan_date}', scan_object.start_scan_date.strftime('%d %B, %Y'))
-        description = description.replace('{company_name}', report.company_name)
-        description = description.replace('{target_name}', scan_object.domain.name)
-        if scan_object.domain.description:
-            description = description.replace('{target_description}', scan_object.domain.description)
-        description = description.replace('{subdomain_count}', str(subdomains.count()))
-        description = description.replace('{vulnerability_count}', str(all_vulnerabilities.count()))
-        description = description.replace('{critical_count}', str(all_vulnerabilities.filter(severity=4).count()))
-        description = description.replace('{high_count}', str(all_vulnerabilities.filter(severity=3).count()))
-        description = description.replace('{medium_count}', str(all_vulnerabilities.filter(severity=2).count()))
-        description = description.replace('{low_count}', str(all_vulnerabilities.filter(severity=1).count()))
-        description = description.replace('{info_count}', str(all_vulnerabilities.filter(severity=0).count()))
-        description = description.replace('{unknown_count}', str(all_vulnerabilities.filter(severity=-1).count()))
-
-        # convert to html
-        data['executive_summary_description'] = markdown.markdown(description)
-
-    data['primary_color'] = primary_color
-    data['secondary_color'] = secondary_color
-
-    template = get_template('report/template.html')
-    html = template.render(data)
-    pdf = HTML(string=html).write_pdf()
-
-    if 'download' in request.GET:
-        response = HttpResponse(pdf, content_type='application/octet-stream')
-    else:
-        response = HttpResponse(pdf, content_type='application/pdf')
-
-    return response
+    '''
+    Starts the pdf report job of the scan unless the report for the current
+    report settings is already generated or being generated. Reports of
+    unfinished scans are not reused.
+    '''
+    scan_object = get_object_or_404(ScanHistory, id=id)
+    report_type = get_report_type(request)
+    report_path = get_report_path(scan_object, report_type)
+    status = get_report_status(report_path)
+    if status == 'completed' and not is_report_cacheable(scan_object):
+        try:
+            os.remove(report_path)
+        except FileNotFoundError:
+            pass
+        status = None
+    if status in (None, 'failed') and claim_report_job(report_path):
+        generate_report.delay(scan_object.id, report_type, report_path)
+        status = 'running'
+    return get_report_response(scan_object, report_type, status)
+
+
+def report_status(request, id):
+    scan_object = get_object_or_404(ScanHistory, id=id)
+    report_type = get_report_type(request)
+    status = get_report_status(get_report_path(scan_object, report_type))
+    return get_report_response(scan_object, report_type, status)
+
+
+def download_report(request, id):
+    scan_object = get_object_or_404(ScanHistory, id=id)
+    report_type = get_report_type(request)
+    report_path = get_report_path(scan_object, report_type)
+    if get_report_status(report_path) != 'completed':
+        raise Http404('Report has not been generated yet')
+    return FileResponse(
+        open(report_path, 'rb'),
+        as_attachment='download' in request.GET,
+        filename='{}.pdf'.format(scan_object.domain.name),
+        content_type='application/pdf')
+
+
+def get_report_type(request):
+    report_type = request.GET.get('report_type', 'full')
+    return report_type if report_type in REPORT_TYPES else 'full'
+
+
+def get_report_response(scan_object, report_type, status):
+    query = '?report_type={}'.format(report_type)
+    return JsonResponse({
+        'status': status,
+        'status_url': reverse('report_status', args=[scan_object.id]) + query,
+        'download_url': reverse('download_report', args=[scan_object.id]) + query,
+    })
@@ -0,0 +1,154 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:12
+
+from django.db import migrations
+from django.db.backends.utils import truncate_name
+
+
+APP_LABEL = 'targetApp'
+
+# db_table set in the models' Meta without a migration, (model, table)
+TABLES = [
+    ('associateddomain', 'targetapp_associateddomain'),
+    ('domain', 'targetapp_domain'),
+    ('domainaddress', 'targetapp_domainaddress'),
+    ('domaincity', 'targetapp_domaincity'),
+    ('domaincountry', 'targetapp_domaincountry'),
+    ('domainemail', 'targetapp_domainemail'),
+    ('domainfax', 'targetapp_domainfax'),
+    ('domaininfo', 'targetapp_domaininfo'),
+    ('domainphone', 'targetapp_domainphone'),
+    ('domainregistername', 'targetapp_domainregistername'),
+    ('domainregisterorganization', 'targetapp_domainregisterorganization'),
+    ('domainregistrar', 'targetapp_domainregistrar'),
+    ('domainregistrarid', 'targetapp_domainregistrarid'),
+    ('domainstate', 'targetapp_domainstate'),
+    ('domainwhoisstatus', 'targetapp_domainwhoisstatus'),
+    ('domainzipcode', 'targetapp_domainzipcode'),
+    ('nameservers', 'targetapp_nameservers'),
+    ('organization', 'targetapp_organization'),
+    ('relatedtld', 'targetapp_relatedtld'),
+]
+
+
+def alter_db_tables(apps, schema_editor, reverse=False):
+    '''
+    Renames the tables of TABLES and of their many-to-many fields, unless
+    they already were. Instances generating their own migrations on start
+    have renamed them in a local migration already.
+    '''
+    existing = set(schema_editor.connection.introspection.table_names())
+    max_length = schema_editor.connection.ops.max_name_length()
+
+    def alter_db_table(model, old_table, new_table):
+        if reverse:
+            old_table, new_table = new_table, old_table
+        if old_table in existing and new_table not in existing:
+            schema_editor.alter_db_table(model, old_table, new_table)
+
+    for model_name, table in TABLES:
+        model = apps.get_model(APP_LABEL, model_name)
+        alter_db_table(model, model._meta.db_table, table)
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                alter_db_table(
+                    through,
+                    through._meta.db_table,
+                    truncate_name('{}_{}'.format(table, field.name), max_length))
+
+
+def unalter_db_tables(apps, schema_editor):
+    alter_db_tables(apps, schema_editor, reverse=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('targetApp', '0023_auto_20220617_0554'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(alter_db_tables, unalter_db_tables),
+            ],
+            state_operations=[
+                migrations.AlterModelTable(
+                    name='associateddomain',
+                    table='targetapp_associateddomain',
+                ),
+                migrations.AlterModelTable(
+                    name='domain',
+                    table='targetapp_domain',
+                ),
+                migrations.AlterModelTable(
+                    name='domainaddress',
+                    table='targetapp_domainaddress',
+                ),
+                migrations.AlterModelTable(
+                    name='domaincity',
+                    table='targetapp_domaincity',
+                ),
+                migrations.AlterModelTable(
+                    name='domaincountry',
+                    table='targetapp_domaincountry',
+                ),
+                migrations.AlterModelTable(
+                    name='domainemail',
+                    table='targetapp_domainemail',
+                ),
+                migrations.AlterModelTable(
+                    name='domainfax',
+                    table='targetapp_domainfax',
+                ),
+                migrations.AlterModelTable(
+                    name='domaininfo',
+                    table='targetapp_domaininfo',
+                ),
+                migrations.AlterModelTable(
+                    name='domainphone',
+                    table='targetapp_domainphone',
+                ),
+                migrations.AlterModelTable(
+                    name='domainregistername',
+                    table='targetapp_domainregistername',
+                ),
+                migrations.AlterModelTable(
+                    name='domainregisterorganization',
+                    table='targetapp_domainregisterorganization',
+                ),
+                migrations.AlterModelTable(
+                    name='domainregistrar',
+                    table='targetapp_domainregistrar',
+                ),
+                migrations.AlterModelTable(
+                    name='domainregistrarid',
+                    table='targetapp_domainregistrarid',
+                ),
+                migrations.AlterModelTable(
+                    name='domainstate',
+                    table='targetapp_domainstate',
+                ),
+                migrations.AlterModelTable(
+                    name='domainwhoisstatus',
+                    table='targetapp_domainwhoisstatus',
+                ),
+                migrations.AlterModelTable(
+                    name='domainzipcode',
+                    table='targetapp_domainzipcode',
+                ),
+                migrations.AlterModelTable(
+                    name='nameservers',
+                    table='targetapp_nameservers',
+                ),
+                migrations.AlterModelTable(
+                    name='organization',
+                    table='targetapp_organization',
+                ),
+                migrations.AlterModelTable(
+                    name='relatedtld',
+                    table='targetapp_relatedtld',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,170 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:11
+
+from django.db import migrations, models
+
+
+APP_LABEL = 'targetApp'
+
+# lookup tables becoming unique, (model, fields)
+UNIQUE_LOOKUPS = [
+    ('NameServers', ['name']),
+    ('DomainRegistrar', ['name']),
+    ('DomainRegisterName', ['name']),
+    ('DomainRegisterOrganization', ['name']),
+    ('DomainAddress', ['name']),
+    ('DomainCity', ['name']),
+    ('DomainState', ['name']),
+    ('DomainZipCode', ['name']),
+    ('DomainCountry', ['name']),
+    ('DomainEmail', ['name']),
+    ('DomainPhone', ['name']),
+    ('DomainFax', ['name']),
+    ('DomainRegistrarID', ['name']),
+    ('DomainWhoisStatus', ['status']),
+]
+
+
+def merge_duplicates(apps, schema_editor, model_name, fields):
+    '''
+    Merges rows sharing the same values of fields into the row with the
+    lowest id, repointing foreign keys and m2m rows, so that the unique
+    constraints below can be created on existing databases.
+    '''
+    model = apps.get_model(APP_LABEL, model_name)
+    table = schema_editor.quote_name(model._meta.db_table)
+    columns = ', '.join(
+        schema_editor.quote_name(model._meta.get_field(field).column)
+        for field in fields)
+    not_null = ' AND '.join(
+        '{} IS NOT NULL'.format(schema_editor.quote_name(model._meta.get_field(field).column))
+        for field in fields)
+    duplicates = '''
+        SELECT id, keep_id FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY {columns}) AS keep_id
+            FROM {table} WHERE {not_null}
+        ) grouped WHERE id <> keep_id
+    '''.format(columns=columns, table=table, not_null=not_null)
+
+    with schema_editor.connection.cursor() as cursor:
+        for related_model in apps.get_models():
+            for field in related_model._meta.local_fields:
+                if field.is_relation and field.remote_field.model == model:
+                    cursor.execute(
+                        'UPDATE {rel} SET {col} = d.keep_id FROM ({dups}) d WHERE {rel}.{col} = d.id'.format(
+                            rel=schema_editor.quote_name(related_model._meta.db_table),
+                            col=schema_editor.quote_name(field.column),
+                            dups=duplicates))
+            for field in related_model._meta.local_many_to_many:
+                through = field.remote_field.through
+                if not through._meta.auto_created:
+                    continue
+                through_fields = [f for f in through._meta.local_fields if f.is_relation]
+                for through_field in through_fields:
+                    if through_field.remote_field.model != model:
+                        continue
+                    other_field = [f for f in through_fields if f is not through_field][0]
+                    params = dict(
+                        rel=schema_editor.quote_name(through._meta.db_table),
+                        col=schema_editor.quote_name(through_field.column),
+                        other=schema_editor.quote_name(other_field.column),
+                        dups=duplicates)
+                    cursor.execute(
+                        '''INSERT INTO {rel} ({other}, {col})
+                        SELECT DISTINCT {rel}.{other}, d.keep_id FROM {rel} JOIN ({dups}) d ON {rel}.{col} = d.id
+                        ON CONFLICT DO NOTHING'''.format(**params))
+                    cursor.execute(
+                        'DELETE FROM {rel} USING ({dups}) d WHERE {rel}.{col} = d.id'.format(**params))
+        cursor.execute(
+            'DELETE FROM {table} USING ({dups}) d WHERE {table}.id = d.id'.format(
+                table=table,
+                dups=duplicates))
+
+
+def merge_all_duplicates(apps, schema_editor):
+    for model_name, fields in UNIQUE_LOOKUPS:
+        merge_duplicates(apps, schema_editor, model_name, fields)
+
+
+class Migration(migrations.Migration):
+
+    # the duplicate merge must be committed before the unique constraints
+    # are created, postgres refuses to alter tables with pending trigger events
+    atomic = False
+
+    dependencies = [
+        ('targetApp', '0024_alter_db_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_all_duplicates, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='domainaddress',
+            name='name',
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domaincity',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domaincountry',
+            name='name',
+            field=models.CharField(max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainemail',
+            name='name',
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainfax',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainphone',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainregistername',
+            name='name',
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainregisterorganization',
+            name='name',
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainregistrar',
+            name='name',
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainregistrarid',
+            name='name',
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainstate',
+            name='name',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainwhoisstatus',
+            name='status',
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='domainzipcode',
+            name='name',
+            field=models.CharField(max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='nameservers',
+            name='name',
+            field=models.CharField(blank=True, max_length=500, null=True, unique=True),
+        ),
+    ]
@@ -30,7 +30,7 @@ class RelatedTLD(models.Model):
 
 class NameServers(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=500, null=True, blank=True)
+    name = models.CharField(max_length=500, null=True, blank=True, unique=True)
 
     class Meta:
         db_table = "targetapp_nameservers"
@@ -41,7 +41,7 @@ class NameServers(models.Model):
 
 class DomainRegistrar(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=500)
+    name = models.CharField(max_length=500, unique=True)
 
     class Meta:
         db_table = "targetapp_domainregistrar"
@@ -52,7 +52,7 @@ class DomainRegistrar(models.Model):
 
 class DomainRegisterName(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=500)
+    name = models.CharField(max_length=500, unique=True)
 
     class Meta:
         db_table = "targetapp_domainregistername"
@@ -63,7 +63,7 @@ class DomainRegisterName(models.Model):
 
 class DomainRegisterOrganization(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=500)
+    name = models.CharField(max_length=500, unique=True)
 
     class Meta:
         db_table = "targetapp_domainregisterorganization"
@@ -74,7 +74,7 @@ class DomainRegisterOrganization(models.Model):
 
 class DomainAddress(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=500)
+    name = models.CharField(max_length=500, unique=True)
 
     class Meta:
         db_table = "targetapp_domainaddress"
@@ -85,7 +85,7 @@ class DomainAddress(models.Model):
 
 class DomainCity(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
 
     class Meta:
         db_table = "targetapp_domaincity"
@@ -96,7 +96,7 @@ class DomainCity(models.Model):
 
 class DomainState(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=50)
+    name = models.CharField(max_length=50, unique=True)
 
     class Meta:
         db_table = "targetapp_domainstate"
@@ -107,7 +107,7 @@ class DomainState(models.Model):
 
 class DomainZipCode(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=20)
+    name = models.CharField(max_length=20, unique=True)
 
     class Meta:
         db_table = "targetapp_domainzipcode"
@@ -118,7 +118,7 @@ class DomainZipCode(models.Model):
 
 class DomainCountry(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=20)
+    name = models.CharField(max_length=20, unique=True)
 
     class Meta:
         db_table = "targetapp_domaincountry"
@@ -129,7 +129,7 @@ class DomainCountry(models.Model):
 
 class DomainEmail(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=500)
+    name = models.CharField(max_length=500, unique=True)
 
     class Meta:
         db_table = "targetapp_domainemail"
@@ -140,7 +140,7 @@ class DomainEmail(models.Model):
 
 class DomainPhone(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
 
     class Meta:
         db_table = "targetapp_domainphone"
@@ -151,7 +151,7 @@ class DomainPhone(models.Model):
 
 class DomainFax(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
 
     class Meta:
         db_table = "targetapp_domainfax"
@@ -162,7 +162,7 @@ class DomainFax(models.Model):
 
 class DomainWhoisStatus(models.Model):
     id = models.AutoField(primary_key=True)
-    status = models.CharField(max_length=500)
+    status = models.CharField(max_length=500, unique=True)
 
     class Meta:
         db_table = "targetapp_domainwhoisstatus"
@@ -173,7 +173,7 @@ class DomainWhoisStatus(models.Model):
 
 class DomainRegistrarID(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=500)
+    name = models.CharField(max_length=500, unique=True)
 
     class Meta:
         db_table = "targetapp_domainregistrarid"
@@ -28,6 +28,10 @@ urlpatterns = [
         'list/target',
         views.list_target,
         name='list_target'),
+    path(
+        'import/status/<str:import_id>',
+        views.target_import_status,
+        name='target_import_status'),
     path(
         'list/organization',
         views.list_organization,
@@ -3,7 +3,7 @@ import csv
 import io
 import os
 import requests
-import threading
+import uuid
 
 from datetime import timedelta
 from operator import and_, or_
@@ -22,6 +22,7 @@ from startScan.models import *
 from scanEngine.models import *
 from targetApp.forms import *
 from reNgine.common_func import *
+from reNgine.tasks import import_targets_file
 
 
 
@@ -43,89 +44,50 @@ def add_target(request):
                 add_target_form.cleaned_data['name'] +
                 ' added successfully')
             if 'fetch_whois_checkbox' in request.POST and request.POST['fetch_whois_checkbox'] == 'on':
-                thread = threading.Thread(
-                    target=get_whois,
-                    args=[add_target_form.cleaned_data['name'], True, False]
-                )
-                thread.setDaemon(True)
-                thread.start()
+                enqueue_whois_enrichment([add_target_form.cleaned_data['name']])
             return http.HttpResponseRedirect(reverse('list_target'))
         if 'add-ip-target' in request.POST:
             domains = request.POST.getlist('resolved_ip_domains')
             description = request.POST['targetDescription'] if 'targetDescription' in request.POST else ''
             ip_address_cidr = request.POST['ip_address'] if 'ip_address' in request.POST else ''
             h1_team_handle = request.POST['targetH1TeamHandle'] if 'targetH1TeamHandle' in request.POST else None
-            added_target_count = 0
-            for domain in domains:
-                if not Domain.objects.filter(
-                        name=domain).exists() and validators.domain(domain):
-                    Domain.objects.create(
-                        name=domain,
-                        description=description,
-                        h1_team_handle=h1_team_handle,
-                        ip_address_cidr=ip_address_cidr,
-                        insert_date=timezone.now())
-                    added_target_count += 1
-            if added_target_count:
-                messages.add_message(request, messages.SUCCESS, str(
-                    added_target_count) + ' targets added successfully!')
-                return http.HttpResponseRedirect(reverse('list_target'))
-            else:
-                messages.add_message(
-                    request,
-                    messages.ERROR,
-                    'Oops! Could not import any targets, either targets already exists or is not a valid target.')
-                return http.HttpResponseRedirect(reverse('add_target'))
+            added_target_count = import_target_lines(
+                request,
+                domains,
+                description=description,
+                h1_team_handle=h1_team_handle,
+                ip_address_cidr=ip_address_cidr)
+            return get_import_redirect(
+                request,
+                added_target_count,
+                'Oops! Could not import any targets, either targets already exists or is not a valid target.')
         elif 'add-multiple-targets' in request.POST:
             bulk_targets = [target.rstrip()
                             for target in request.POST['addTargets'].split('\n')]
             bulk_targets = [target for target in bulk_targets if target]
             description = request.POST['targetDescription'] if 'targetDescription' in request.POST else ''
             h1_team_handle = request.POST['targetH1TeamHandle'] if 'targetH1TeamHandle' in request.POST else None
-            target_count = 0
-            for target in bulk_targets:
-                if not Domain.objects.filter(
-                        name=target).exists() and validators.domain(target):
-                    Domain.objects.create(
-                        name=target.rstrip("\n"),
-                        description=description,
-                        h1_team_handle=h1_team_handle,
-                        insert_date=timezone.now())
-                    target_count += 1
-            if target_count:
-                messages.add_message(request, messages.SUCCESS, str(
-                    target_count) + ' targets added successfully!')
-                return http.HttpResponseRedirect(reverse('list_target'))
-            else:
-                messages.add_message(
-                    request,
-                    messages.ERROR,
-                    'Oops! Could not import any targets, either targets already exists or is not a valid target.')
-                return http.HttpResponseRedirect(reverse('add_target'))
+            target_count = import_target_lines(
+                request,
+                bulk_targets,
+                description=description,
+                h1_team_handle=h1_team_handle)
+            return get_import_redirect(
+                request,
+                target_count,
+                'Oops! Could not import any targets, either targets already exists or is not a valid target.')
         elif 'import-txt-target' in request.POST or 'import-csv-target' in request.POST:
             if 'txtFile' in request.FILES:
                 txt_file = request.FILES['txtFile']
                 if txt_file.content_type == 'text/plain':
-                    target_count = 0
                     txt_content = txt_file.read().decode('UTF-8')
-                    io_string = io.StringIO(txt_content)
-                    for target in io_string:
-                        target_domain = target.rstrip("\n").rstrip("\r")
-                        if not Domain.objects.filter(
-                                name=target_domain).exists() and validators.domain(target_domain):
-                            Domain.objects.create(
-                                name=target_domain,
-                                insert_date=timezone.now())
-                            target_count += 1
-                    if target_count:
-                        messages.add_message(request, messages.SUCCESS, str(
-                            target_count) + ' targets added successfully!')
-                    else:
-                        messages.add_message(
-                            request,
-                            messages.ERROR,
-                            'Error importing targets, either targets already exist or CSV file is not valid.')
-                        return http.HttpResponseRedirect(reverse('add_target'))
+                    target_count = import_target_lines(
+                        request,
+                        txt_content.splitlines())
+                    return get_import_redirect(
+                        request,
+                        target_count,
+                        'Error importing targets, either targets already exist or CSV file is not valid.')
                 else:
                     messages.add_message(
                         request, messages.ERROR, 'Invalid File type!')
@@ -133,29 +95,15 @@ def add_target(request):
             elif 'csvFile' in request.FILES:
                 csv_file = request.FILES['csvFile']
                 if csv_file.content_type == 'text/csv' or csv_file.name.split('.')[1]:
-                    target_count = 0
                     csv_content = csv_file.read().decode('UTF-8')
-                    io_string = io.StringIO(csv_content)
-                    for column in csv.reader(io_string, delimiter=','):
-                        target_domain = column[0]
-                        description = None if len(column) == 1 else column[1]
-                        if not Domain.objects.filter(
-                                name=target_domain).exists() and validators.domain(
-                                target_domain):
-                            Domain.objects.create(
-                                name=target_domain,
-                                description=description,
-                                insert_date=timezone.now())
-                            target_count += 1
-                    if target_count:
-                        messages.add_message(request, messages.SUCCESS, str(
-                            target_count) + ' targets added successfully!')
-                    else:
-                        messages.add_message(
-                            request,
-                            messages.ERROR,
-                            'Error importing targets, either targets already exist or CSV file is not valid.')
-                        return http.HttpResponseRedirect(reverse('add_target'))
+                    target_count = import_target_lines(
+                        request,
+                        csv_content.splitlines(),
+                        file_type='csv')
+                    return get_import_redirect(
+                        request,
+                        target_count,
+                        'Error importing targets, either targets already exist or CSV file is not valid.')
                 else:
                     messages.add_message(
                         request, messages.ERROR, 'Invalid File type!')
@@ -167,6 +115,62 @@ def add_target(request):
         'form': add_target_form}
     return render(request, 'target/add.html', context)
 
+def import_target_lines(
+        request,
+        lines,
+        file_type='txt',
+        description=None,
+        h1_team_handle=None,
+        ip_address_cidr=None):
+    '''
+    Imports the targets of a txt or csv target list and returns the number
+    of targets added. Lists of more than TARGET_IMPORT_BACKGROUND_THRESHOLD
+    lines are imported by a background job and None is returned.
+    '''
+    if len(lines) <= TARGET_IMPORT_BACKGROUND_THRESHOLD:
+        return import_targets(
+            read_target_rows(lines, file_type),
+            description=description,
+            h1_team_handle=h1_team_handle,
+            ip_address_cidr=ip_address_cidr)['added']
+
+    import_id = uuid.uuid4().hex
+    os.makedirs(TARGET_IMPORT_DIRECTORY, exist_ok=True)
+    file_path = '{}/{}.{}'.format(TARGET_IMPORT_DIRECTORY, import_id, file_type)
+    with open(file_path, 'w') as target_file:
+        target_file.write('\n'.join(lines))
+    set_target_import_progress(import_id, status='pending', total=len(lines))
+    import_targets_file.delay(
+        file_path,
+        file_type,
+        import_id,
+        description=description,
+        h1_team_handle=h1_team_handle,
+        ip_address_cidr=ip_address_cidr)
+    messages.add_message(
+        request,
+        messages.INFO,
+        mark_safe('{} targets are being imported in the background, <a href="{}">check the progress</a>.'.format(
+            len(lines),
+            reverse('target_import_status', kwargs={'import_id': import_id}))))
+    return None
+
+def get_import_redirect(request, target_count, error_message):
+    if target_count is None:
+        return http.HttpResponseRedirect(reverse('list_target'))
+    if target_count:
+        messages.add_message(request, messages.SUCCESS, str(
+            target_count) + ' targets added successfully!')
+        return http.HttpResponseRedirect(reverse('list_target'))
+    messages.add_message(request, messages.ERROR, error_message)
+    return http.HttpResponseRedirect(reverse('add_target'))
+
+def target_import_status(request, import_id):
+    progress = get_target_import_progress(import_id)
+    if not progress:
+        raise http.Http404('Unknown target import')
+    return http.JsonResponse(progress)
+
 def list_target(request):
     context = {
         'list_target_li': 'active',